@@ -7,8 +7,16 @@ Supports predication, packet start/end bits, and little-endian encoding
 
 import re
 import sys
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
+# Add project root to path for imports
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from common.mem_image import Segment, SEG_TEXT, SEG_DATA, write_image
+
 # Instruction format categorization
 R_TYPE = {'add', 'sub', 'mul', 'div', 'and', 'xor', 'or', 'slt', 'sltu',
           'addf', 'subf', 'mulf', 'divf', 'sll', 'srl', 'sra'}
@@ -430,6 +438,18 @@ class Assembler:
         self.first_pass(lines)
         machine_code = self.second_pass()
         
+        # Binary image: one segment per run of consecutive addresses, org gaps are kept
+        if format == 'img':
+            segments = []
+            for (addr, _, _), code in zip(self.instructions, machine_code):
+                word = int(code, 2).to_bytes(4, 'little')
+                if segments and segments[-1].end == addr:
+                    segments[-1].data += word
+                else:
+                    segments.append(Segment(addr=addr, data=bytearray(word), flags=SEG_TEXT | SEG_DATA))
+            write_image(output_file, segments)
+            return
+
         # Write output
         with open(output_file, 'w') as f:
             if format == 'bin':
@@ -444,7 +464,7 @@ class Assembler:
 def main():
     if len(sys.argv) < 3:
         print("Usage: python assembler.py <input.s> <output.bin> [format] [opcode_file]")
-        print("  format: 'bin' (default) or 'hex'")
+        print("  format: 'bin' (default), 'hex' or 'img' (binary image, see common/mem_image.py)")
         print("  opcode_file: path to opcodes file (default: 'opcodes.txt')")
         sys.exit(1)
     
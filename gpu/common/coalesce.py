@@ -0,0 +1,117 @@
+"""
+Memory coalescing for warp-wide accesses, shared by the emulator and the simulator.
+
+A warp access (one address per lane plus the mask of active lanes) becomes the
+minimal set of aligned segment transactions that covers every byte the active
+lanes touch. Each touched `segment`-byte block is one transaction; it shrinks to
+the aligned half holding all of its used bytes, down to `min_segment` bytes:
+
+    Coalescer(segment=128, min_segment=32).coalesce(pc, addrs, mask, size=4)
+    -> [(segment address, segment bytes, lane mask), ...]    ascending addresses
+
+Masks are ints with bit i set for lane i (a sequence of bools is accepted too).
+Every access is recorded per PC: a histogram of transactions per access and the
+bytes the lanes asked for against the bytes moved, so efficiency is
+requested / transferred (1.0 when every moved byte is used).
+"""
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple, Union
+
+SEGMENT_SIZES = (32, 64, 128)
+
+Transaction = Tuple[int, int, int]  # (segment address, segment bytes, lane mask)
+
+
+def lane_mask(mask: Union[int, Sequence[bool]]) -> int:
+    if isinstance(mask, int):
+        return mask
+    bits = 0
+    for lane, active in enumerate(mask):
+        if active:
+            bits |= 1 << lane
+    return bits
+
+
+def coalesce(addrs: Sequence[int], mask: Union[int, Sequence[bool]], size: int = 4,
+             segment: int = 128, min_segment: int = 32) -> List[Transaction]:
+    mask = lane_mask(mask)
+    touched: Dict[int, List[int]] = {}  # segment address -> [first byte, end byte, lane mask]
+    for lane in range(len(addrs)):
+        if not (mask >> lane) & 1:
+            continue
+        addr = int(addrs[lane])
+        end = addr + size
+        while addr < end:  # an unaligned access can straddle two segments
+            base = addr - addr % segment
+            stop = min(end, base + segment)
+            used = touched.get(base)
+            if used is None:
+                touched[base] = [addr, stop, 1 << lane]
+            else:
+                used[0] = min(used[0], addr)
+                used[1] = max(used[1], stop)
+                used[2] |= 1 << lane
+            addr = stop
+
+    transactions = []
+    for base in sorted(touched):
+        lo, hi, lanes = touched[base]
+        seg = segment
+        while seg > min_segment:
+            half = seg // 2
+            if hi <= base + half:
+                seg = half
+            elif lo >= base + half:
+                base, seg = base + half, half
+            else:
+                break
+        transactions.append((base, seg, lanes))
+    return transactions
+
+
+class Coalescer:
+    def __init__(self, segment: int = 128, min_segment: int = 32) -> None:
+        if segment not in SEGMENT_SIZES or min_segment not in SEGMENT_SIZES or min_segment > segment:
+            raise ValueError(f"segments must be one of {SEGMENT_SIZES} with min_segment <= segment, "
+                             f"got {segment} and {min_segment}")
+        self.segment = segment
+        self.min_segment = min_segment
+        self.per_pc: Dict[int, Dict] = {}
+
+    def coalesce(self, pc: int, addrs: Sequence[int], mask: Union[int, Sequence[bool]],
+                 size: int = 4) -> List[Transaction]:
+        mask = lane_mask(mask)
+        transactions = coalesce(addrs, mask, size, self.segment, self.min_segment)
+        if transactions:
+            stats = self._stats(pc)
+            stats["accesses"] += 1
+            stats["transactions"] += len(transactions)
+            stats["requested"] += bin(mask).count("1") * size
+            stats["transferred"] += sum(seg for _, seg, _ in transactions)
+            stats["hist"][len(transactions)] += 1
+        return transactions
+
+    def _stats(self, pc: int) -> Dict:
+        stats = self.per_pc.get(pc)
+        if stats is None:
+            stats = self.per_pc[pc] = {"accesses": 0, "transactions": 0, "requested": 0,
+                                       "transferred": 0, "hist": Counter()}
+        return stats
+
+    def merge(self, per_pc: Dict[int, Dict]) -> None:
+        """Add the per_pc counters of another Coalescer (another SM) to these."""
+        for pc, other in per_pc.items():
+            stats = self._stats(pc)
+            for key in ("accesses", "transactions", "requested", "transferred"):
+                stats[key] += other[key]
+            stats["hist"].update(other["hist"])
+
+    def efficiency(self, pc: int) -> float:
+        stats = self.per_pc[pc]
+        return min(1.0, stats["requested"] / stats["transferred"])
+
+    def report(self) -> Dict[int, Dict]:
+        """Per-PC counters, efficiency and transactions-per-access histogram, by ascending PC."""
+        return {pc: {**self.per_pc[pc], "hist": dict(sorted(self.per_pc[pc]["hist"].items())),
+                     "efficiency": self.efficiency(pc)}
+                for pc in sorted(self.per_pc)}
@@ -0,0 +1,164 @@
+"""
+Binary program/data image shared by the assembler, the emulator and the simulator.
+
+Layout (all fields little endian):
+    header:   magic "TWIG", u16 version, u16 segment count
+    segments: u32 load address, u32 size, u32 file offset, u32 flags   (one per segment)
+    data:     raw segment bytes, each segment starts on a 16 byte boundary
+
+Loading memory-maps the file copy-on-write, so segment data is handed out as
+memoryviews into the mapping instead of being parsed and copied.
+
+One-time conversion of the old text formats (one word per line):
+    python -m common.mem_image meminit.hex meminit.img hex [start_addr]
+
+Memory dumps use the same image format (one segment per run of dumped pages).
+Streaming dumps taken during a run are a "TWDS" magic followed by records of
+u64 step, u32 address, u32 size and the raw bytes; replay_dump_stream() folds
+them back into segments.
+"""
+import mmap
+import struct
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Union
+
+IMAGE_MAGIC = b"TWIG"
+IMAGE_VERSION = 1
+
+SEG_TEXT = 0x1 # holds instructions
+SEG_DATA = 0x2 # holds data
+
+DUMP_STREAM_MAGIC = b"TWDS"
+
+_HEADER = struct.Struct("<4sHH")
+_RECORD = struct.Struct("<QII")
+_SEGMENT = struct.Struct("<IIII")
+_ALIGN = 16
+
+@dataclass
+class Segment:
+    addr: int
+    data: Union[bytes, bytearray, memoryview]
+    flags: int = SEG_TEXT | SEG_DATA
+
+    @property
+    def end(self) -> int:
+        return self.addr + len(self.data)
+
+def is_image(path: Union[str, Path]) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(IMAGE_MAGIC)) == IMAGE_MAGIC
+
+def write_image(path: Union[str, Path], segments: list[Segment]) -> None:
+    offset = _HEADER.size + _SEGMENT.size * len(segments)
+    table = []
+    for seg in segments:
+        offset = (offset + _ALIGN - 1) & ~(_ALIGN - 1)
+        table.append((seg.addr, len(seg.data), offset, seg.flags))
+        offset += len(seg.data)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, len(segments)))
+        for entry in table:
+            f.write(_SEGMENT.pack(*entry))
+        for seg, (_, _, seg_offset, _) in zip(segments, table):
+            f.write(bytes(seg_offset - f.tell()))
+            f.write(seg.data)
+
+def load_image(path: Union[str, Path]) -> tuple[mmap.mmap, list[Segment]]:
+    """
+    Map an image and return (mapping, segments). Segment data are views into the
+    mapping, so keep the mapping alive as long as they are in use. The mapping is
+    copy-on-write: writing through the views never touches the file.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, version, count = _HEADER.unpack_from(mapping, 0)
+    if magic != IMAGE_MAGIC:
+        raise ValueError(f"{path}: not a program image (magic {magic!r})")
+    if version != IMAGE_VERSION:
+        raise ValueError(f"{path}: unsupported image version {version}")
+
+    view = memoryview(mapping)
+    segments = []
+    for i in range(count):
+        addr, size, offset, flags = _SEGMENT.unpack_from(mapping, _HEADER.size + i * _SEGMENT.size)
+        if offset + size > len(mapping):
+            raise ValueError(f"{path}: segment {i} runs past the end of the file")
+        segments.append(Segment(addr=addr, data=view[offset:offset + size], flags=flags))
+    return mapping, segments
+
+def segments_from_pages(pages: dict[int, memoryview], page_shift: int) -> list[Segment]:
+    """Coalesce {page number: page bytes} into one segment per run of consecutive pages."""
+    segments = []
+    for page_no in sorted(pages):
+        addr = page_no << page_shift
+        if segments and segments[-1].end == addr:
+            segments[-1].data += pages[page_no]
+        else:
+            segments.append(Segment(addr=addr, data=bytearray(pages[page_no]), flags=SEG_DATA))
+    return segments
+
+def open_dump_stream(path: Union[str, Path]) -> BinaryIO:
+    f = open(path, "wb")
+    f.write(DUMP_STREAM_MAGIC)
+    return f
+
+def write_dump_record(f: BinaryIO, step: int, addr: int, data) -> None:
+    f.write(_RECORD.pack(step, addr, len(data)))
+    f.write(data)
+
+def read_dump_stream(path: Union[str, Path]) -> Iterator[tuple[int, int, bytes]]:
+    """Yield (step, addr, data) for every record of a streaming dump, in file order."""
+    with open(path, "rb") as f:
+        if f.read(len(DUMP_STREAM_MAGIC)) != DUMP_STREAM_MAGIC:
+            raise ValueError(f"{path}: not a dump stream")
+        while header := f.read(_RECORD.size):
+            step, addr, size = _RECORD.unpack(header)
+            yield step, addr, f.read(size)
+
+def replay_dump_stream(path: Union[str, Path], until: int = None) -> list[Segment]:
+    """Memory contents written up to step `until` (default: the end of the stream), later records win."""
+    latest: dict[int, bytes] = {}
+    for step, addr, data in read_dump_stream(path):
+        if until is not None and step > until:
+            break
+        latest[addr] = data
+    segments = []
+    for addr in sorted(latest):
+        if segments and segments[-1].end == addr:
+            segments[-1].data += latest[addr]
+        else:
+            segments.append(Segment(addr=addr, data=bytearray(latest[addr]), flags=SEG_DATA))
+    return segments
+
+def text_to_segments(path: Union[str, Path], fmt: str = "bin", start_addr: int = 0) -> list[Segment]:
+    """Read a text program (one 32-bit word per line, 'bin' or 'hex') as one segment at start_addr."""
+    base = 2 if fmt == "bin" else 16
+    width = 32 if fmt == "bin" else 8
+    image = bytearray()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, raw in enumerate(f, start=1):
+            for marker in ("//", "#"):
+                i = raw.find(marker)
+                if i != -1:
+                    raw = raw[:i]
+            bits = raw.strip().replace("_", "")
+            if not bits:
+                continue
+            if len(bits) != width:
+                raise ValueError(f"Line {line_no}: expected {width} {fmt} digits, got {bits!r}")
+            image += (int(bits, base) & 0xFFFF_FFFF).to_bytes(4, "little")
+    return [Segment(addr=start_addr, data=bytes(image))]
+
+def convert(input_file: Union[str, Path], output_file: Union[str, Path], fmt: str = "bin", start_addr: int = 0) -> None:
+    write_image(output_file, text_to_segments(input_file, fmt, start_addr))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python -m common.mem_image <input.hex|input.bin> <output.img> <hex|bin> [start_addr]")
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4], 0) if len(sys.argv) > 4 else 0)
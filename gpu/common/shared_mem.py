@@ -0,0 +1,77 @@
+"""
+Shared memory (per thread block scratchpad) layout and bank conflicts, used by
+the emulator and the simulator.
+
+Loads and stores whose address falls in [SHARED_BASE, SHARED_BASE + SHARED_SIZE)
+go to the scratchpad of the issuing thread block instead of global memory, so
+kernels use it with the existing LW/SW family and no new opcodes.
+
+The scratchpad is NUM_BANKS banks of BANK_BYTES-wide words, word i lives in
+bank i % NUM_BANKS. A warp access needs one pass per distinct word asked of the
+busiest bank (lanes reading the same word share it), so the conflict degree is
+1 for a conflict-free access and up to 32 when every lane hits one bank:
+
+    BankConflicts().access(pc, addrs, mask, size=4) -> conflict degree
+"""
+from collections import Counter
+from typing import Dict, Sequence, Union
+
+from common.coalesce import lane_mask
+
+SHARED_BASE = 0x7000_0000
+SHARED_SIZE = 0x1_0000  # 64 KiB window per thread block
+NUM_BANKS = 32
+BANK_BYTES = 4
+
+
+def is_shared(addr: int) -> bool:
+    return SHARED_BASE <= addr < SHARED_BASE + SHARED_SIZE
+
+
+def conflict_degree(addrs: Sequence[int], mask: Union[int, Sequence[bool]], size: int = 4,
+                    num_banks: int = NUM_BANKS, bank_bytes: int = BANK_BYTES) -> int:
+    mask = lane_mask(mask)
+    words: Dict[int, set] = {}  # bank -> distinct words asked of it
+    for lane in range(len(addrs)):
+        if (mask >> lane) & 1:
+            addr = int(addrs[lane])
+            for word in range(addr // bank_bytes, (addr + size - 1) // bank_bytes + 1):
+                words.setdefault(word % num_banks, set()).add(word)
+    return max((len(w) for w in words.values()), default=0)
+
+
+class BankConflicts:
+    def __init__(self, num_banks: int = NUM_BANKS, bank_bytes: int = BANK_BYTES) -> None:
+        self.num_banks = num_banks
+        self.bank_bytes = bank_bytes
+        self.per_pc: Dict[int, Dict] = {}
+
+    def access(self, pc: int, addrs: Sequence[int], mask: Union[int, Sequence[bool]], size: int = 4) -> int:
+        degree = conflict_degree(addrs, mask, size, self.num_banks, self.bank_bytes)
+        if degree:
+            stats = self._stats(pc)
+            stats["accesses"] += 1
+            stats["passes"] += degree
+            stats["max_degree"] = max(stats["max_degree"], degree)
+            stats["hist"][degree] += 1
+        return degree
+
+    def _stats(self, pc: int) -> Dict:
+        stats = self.per_pc.get(pc)
+        if stats is None:
+            stats = self.per_pc[pc] = {"accesses": 0, "passes": 0, "max_degree": 0, "hist": Counter()}
+        return stats
+
+    def merge(self, per_pc: Dict[int, Dict]) -> None:
+        """Add the per_pc counters of another BankConflicts (another SM) to these."""
+        for pc, other in per_pc.items():
+            stats = self._stats(pc)
+            stats["accesses"] += other["accesses"]
+            stats["passes"] += other["passes"]
+            stats["max_degree"] = max(stats["max_degree"], other["max_degree"])
+            stats["hist"].update(other["hist"])
+
+    def report(self) -> Dict[int, Dict]:
+        """Per-PC passes, average and worst conflict degree and the degree histogram, by ascending PC."""
+        return {pc: {**st, "hist": dict(sorted(st["hist"].items())), "avg_degree": st["passes"] / st["accesses"]}
+                for pc, st in sorted(self.per_pc.items())}
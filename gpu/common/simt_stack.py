@@ -0,0 +1,102 @@
+"""
+SIMT reconvergence for divergent warps and per-PC SIMD efficiency, shared by
+the emulator and the simulator.
+
+The ISA carries no reconvergence points, so the stack reconverges where the
+paths of a warp meet again. Its entries are splits, (pc, lane mask) pairs,
+kept ordered by PC with the lowest on top. The warp always runs the top split,
+and splits that reach the same PC merge. Running the lowest PC first brings
+every path of structured code (if/else, loops, early exits jumping forward) to
+the immediate post-dominator before any of them passes it, so the warp
+reconverges where an IPDOM stack would:
+
+    stack = SIMTStack(pc=0, mask=0xFFFFFFFF)
+    stack.pc, stack.mask                          # split to run next
+    stack.advance({pc + 4: fall, target: taken})  # where its lanes go, lanes left out have exited
+    stack.redirect({target: taken})               # same, for lanes anywhere on the stack
+
+SimdEfficiency records the active lanes of every warp instruction per PC:
+efficiency is active lanes / lanes of the warp (1.0 when nothing diverged or
+was predicated off).
+"""
+from typing import Dict, List
+
+from common.coalesce import lane_mask
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class SIMTStack:
+    def __init__(self, pc: int, mask: int) -> None:
+        self.splits: List[List[int]] = [[pc, mask]] if mask else []  # [pc, lane mask], highest pc first
+        self.max_depth = len(self.splits)
+        self.divergences = 0
+
+    @property
+    def empty(self) -> bool:
+        return not self.splits
+
+    @property
+    def pc(self) -> int:
+        return self.splits[-1][0]
+
+    @property
+    def mask(self) -> int:
+        return self.splits[-1][1]
+
+    def advance(self, next_pcs: Dict[int, int]) -> None:
+        """Replace the top split by its lanes' next PCs ({pc: lane mask})."""
+        self.splits.pop()
+        self._push(next_pcs)
+
+    def redirect(self, next_pcs: Dict[int, int]) -> None:
+        """Move the lanes of next_pcs to their PCs from whichever splits hold them (a branch resolved late)."""
+        lanes = 0
+        for mask in next_pcs.values():
+            lanes |= mask
+        self.splits = [[pc, mask & ~lanes] for pc, mask in self.splits if mask & ~lanes]
+        self._push(next_pcs)
+
+    def _push(self, next_pcs: Dict[int, int]) -> None:
+        targets = [(pc, mask) for pc, mask in next_pcs.items() if mask]
+        if len(targets) > 1:
+            self.divergences += 1
+        for pc, mask in targets:
+            self._insert(pc, mask)
+        self.max_depth = max(self.max_depth, len(self.splits))
+
+    def _insert(self, pc: int, mask: int) -> None:
+        i = len(self.splits)
+        while i and self.splits[i - 1][0] < pc:
+            i -= 1
+        if i and self.splits[i - 1][0] == pc:
+            self.splits[i - 1][1] |= mask  # reconverged
+        else:
+            self.splits.insert(i, [pc, mask])
+
+
+class SimdEfficiency:
+    def __init__(self) -> None:
+        self.per_pc: Dict[int, Dict[str, int]] = {}
+
+    def record(self, pc: int, active, width: int) -> None:
+        stats = self.per_pc.get(pc)
+        if stats is None:
+            stats = self.per_pc[pc] = {"issues": 0, "active_lanes": 0, "lane_slots": 0}
+        stats["issues"] += 1
+        stats["active_lanes"] += popcount(lane_mask(active))
+        stats["lane_slots"] += width
+
+    def efficiency(self, pc: int) -> float:
+        stats = self.per_pc[pc]
+        return stats["active_lanes"] / stats["lane_slots"] if stats["lane_slots"] else 0.0
+
+    def overall(self) -> float:
+        slots = sum(st["lane_slots"] for st in self.per_pc.values())
+        return sum(st["active_lanes"] for st in self.per_pc.values()) / slots if slots else 0.0
+
+    def report(self) -> Dict[int, Dict]:
+        """Per-PC issues, active lanes and efficiency, by ascending PC."""
+        return {pc: {**self.per_pc[pc], "efficiency": self.efficiency(pc)} for pc in sorted(self.per_pc)}
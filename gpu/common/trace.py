@@ -0,0 +1,194 @@
+"""
+Leveled, per-channel tracing for the emulator and the simulator.
+
+Call sites grab a channel once at import time and log through its level methods
+with %-style arguments, so nothing is formatted unless the channel is enabled:
+
+    _trace = trace.channel("icache")
+    _trace.debug("HIT warp=%d pc=0x%X", inst.warp, pc)
+
+A disabled level method is a shared no-op, so a disabled call costs one call with
+already-computed arguments. Guard anything expensive to compute with
+`if _trace.level >= trace.DEBUG:`.
+
+Configuration comes from the environment (or configure() at runtime):
+    GPU_TRACE="decode=debug,icache=trace,*=info"    channel levels, "*" is the default (warn)
+    GPU_TRACE_SINK="ring:trace.bin:65536"           binary ring buffer of the last 65536 records
+                                                    (default sink: text on stdout)
+
+Ring buffer files are decoded offline with:
+    python -m common.trace trace.bin
+"""
+import atexit
+import os
+import struct
+import sys
+from typing import Any, Optional
+
+OFF, ERROR, WARN, INFO, DEBUG, TRACE = range(6)
+LEVEL_NAMES = ["off", "error", "warn", "info", "debug", "trace"]
+
+def _noop(*args: Any) -> None:
+    pass
+
+class Channel:
+    """One trace channel; error()/warn()/info()/debug()/trace() are rebound whenever the level changes."""
+    __slots__ = ("name", "level", "error", "warn", "info", "debug", "trace")
+
+    def __init__(self, name: str, level: int) -> None:
+        self.name = name
+        self.set_level(level)
+
+    def set_level(self, level: int) -> None:
+        self.level = level
+        for lvl in range(ERROR, TRACE + 1):
+            emit = (lambda fmt, *args, _lvl=lvl: _sink.write(self.name, _lvl, fmt, args)) if lvl <= level else _noop
+            setattr(self, LEVEL_NAMES[lvl], emit)
+
+class TextSink:
+    def __init__(self, stream=None) -> None:
+        self.stream = stream # None follows sys.stdout, which test runners swap out and close
+
+    def write(self, channel: str, level: int, fmt: str, args: tuple) -> None:
+        (self.stream or sys.stdout).write(f"[{channel}] {fmt % args if args else fmt}\n")
+
+    def close(self) -> None:
+        (self.stream or sys.stdout).flush()
+
+# ---------------- binary ring buffer ----------------
+# file:   magic "TWTR", u16 version, u16 record size, u32 record count, u32 first seq,
+#         u32 string count, strings (u16 length + utf-8), records oldest first
+# record: u32 seq, u16 channel string id, u8 level, u8 arg tags (2 bits per arg),
+#         u16 format string id, 2 pad bytes, 4 x u64 args
+# arg tags: 0 none, 1 int (two's complement), 2 float (IEEE double bits), 3 string id
+RING_MAGIC = b"TWTR"
+RING_VERSION = 1
+MAX_ARGS = 4
+_RING_HEADER = struct.Struct("<4sHHIII")
+_RING_RECORD = struct.Struct("<IHBBH2x" + "Q" * MAX_ARGS)
+_U64 = (1 << 64) - 1
+
+class RingSink:
+    def __init__(self, path: str, capacity: int = 1 << 16) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.buf = bytearray(capacity * _RING_RECORD.size)
+        self.seq = 0
+        self.strings: dict[str, int] = {}
+        self.pid = os.getpid()
+
+    def _intern(self, s: str) -> int:
+        sid = self.strings.get(s)
+        if sid is None:
+            sid = self.strings[s] = len(self.strings)
+        return sid
+
+    def write(self, channel: str, level: int, fmt: str, args: tuple) -> None:
+        if len(args) > MAX_ARGS: # fold the tail into the last argument
+            args = args[:MAX_ARGS - 1] + (" ".join(map(str, args[MAX_ARGS - 1:])),)
+        tags = 0
+        vals = [0] * MAX_ARGS
+        for i, arg in enumerate(args):
+            if type(arg) is int and -(1 << 63) <= arg <= _U64:
+                tag, val = 1, arg & _U64
+            elif type(arg) is float:
+                tag, val = 2, struct.unpack("<Q", struct.pack("<d", arg))[0]
+            else:
+                tag, val = 3, self._intern(str(arg))
+            tags |= tag << (2 * i)
+            vals[i] = val
+        _RING_RECORD.pack_into(self.buf, (self.seq % self.capacity) * _RING_RECORD.size,
+                               self.seq & 0xFFFFFFFF, self._intern(channel), level, tags, self._intern(fmt), *vals)
+        self.seq += 1
+
+    def close(self) -> None:
+        path = self.path if os.getpid() == self.pid else f"{self.path}.{os.getpid()}" # forked workers get their own file
+        count = min(self.seq, self.capacity)
+        start = self.seq % self.capacity if self.seq > self.capacity else 0
+        size = _RING_RECORD.size
+        with open(path, "wb") as f:
+            f.write(_RING_HEADER.pack(RING_MAGIC, RING_VERSION, size, count, self.seq - count, len(self.strings)))
+            for s in self.strings: # dicts keep insertion order, which is the id order
+                data = s.encode("utf-8")
+                f.write(struct.pack("<H", len(data)))
+                f.write(data)
+            f.write(self.buf[start * size:count * size])
+            f.write(self.buf[:start * size])
+
+def decode_ring(path: str):
+    """Yield (seq, channel, level name, message) for every record of a ring buffer file, oldest first."""
+    with open(path, "rb") as f:
+        magic, version, size, count, first_seq, num_strings = _RING_HEADER.unpack(f.read(_RING_HEADER.size))
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"{path}: not a version {RING_VERSION} trace ring buffer")
+        strings = []
+        for _ in range(num_strings):
+            (length,) = struct.unpack("<H", f.read(2))
+            strings.append(f.read(length).decode("utf-8"))
+        for i in range(count):
+            seq, channel, level, tags, fmt, *vals = _RING_RECORD.unpack(f.read(size))
+            args = []
+            for j in range(MAX_ARGS):
+                tag = (tags >> (2 * j)) & 0x3
+                if tag == 1:
+                    args.append(vals[j] - (1 << 64) if vals[j] >> 63 else vals[j])
+                elif tag == 2:
+                    args.append(struct.unpack("<d", struct.pack("<Q", vals[j]))[0])
+                elif tag == 3:
+                    args.append(strings[vals[j]])
+            try:
+                msg = strings[fmt] % tuple(args) if args else strings[fmt]
+            except (TypeError, ValueError):
+                msg = f"{strings[fmt]} {args}"
+            yield first_seq + i, strings[channel], LEVEL_NAMES[level], msg
+
+# ---------------- configuration ----------------
+_channels: dict[str, Channel] = {}
+_levels: dict[str, int] = {}
+_default_level = WARN
+_sink = TextSink()
+
+def channel(name: str) -> Channel:
+    ch = _channels.get(name)
+    if ch is None:
+        ch = _channels[name] = Channel(name, _levels.get(name, _default_level))
+    return ch
+
+def _parse_level(name: str) -> int:
+    return int(name) if name.isdigit() else LEVEL_NAMES.index(name.lower())
+
+def configure(levels: Optional[str] = None, sink: Optional[str] = None) -> None:
+    """levels: "chan=level,...,*=level"; sink: "text" or "ring:<path>[:<capacity>]"."""
+    global _default_level, _sink
+    if levels:
+        for item in levels.split(","):
+            name, _, level = item.strip().partition("=")
+            if name == "*":
+                _default_level = _parse_level(level)
+            else:
+                _levels[name] = _parse_level(level)
+        for name, ch in _channels.items():
+            ch.set_level(_levels.get(name, _default_level))
+    if sink:
+        _sink.close()
+        kind, _, rest = sink.partition(":")
+        if kind == "ring":
+            path, _, capacity = rest.partition(":")
+            _sink = RingSink(path or "trace.bin", int(capacity) if capacity else 1 << 16)
+        else:
+            _sink = TextSink()
+
+def flush() -> None:
+    _sink.close()
+
+configure(os.environ.get("GPU_TRACE"), os.environ.get("GPU_TRACE_SINK"))
+atexit.register(flush)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m common.trace <trace.bin> [channel ...]")
+        sys.exit(1)
+    wanted = set(sys.argv[2:])
+    for seq, ch, level, msg in decode_ring(sys.argv[1]):
+        if not wanted or ch in wanted:
+            print(f"{seq:>10} [{ch}] {level:<5} {msg}")
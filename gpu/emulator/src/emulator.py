@@ -1,4 +1,7 @@
 import sys
+import os
+import multiprocessing
+from multiprocessing import shared_memory
 from pathlib import Path
 
 # Add project root to path for imports
@@ -11,26 +14,22 @@ from reg_file import *
 from instr import *
 from warp import *
 from mem import *
+from program import *
+from common import trace
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from common import custom_enums
-def fetch(instructions, pc: int):
-    line = instructions[int(pc / 4)].strip()
-    for marker in ("//", "#"):
-        idx = line.find(marker)
-        if idx != -1:
-            line = line[:idx]
-        line = line.strip()
-    if(sys.argv[5] == "hex"):
-        line = Bits(hex=line, length=32)
-    else:
-        line = Bits(bin=line, length=32)
-    return line
-# thread block scheduler RIGHT NOT ONLY WORKS FOR TOTAL GLOBAL THREADS <= 1024, probably have to change main function to get that real functionality
-#32 threads per warp, 32 warps per threadblock. currently 1 threadblock
-def tbs(blockdim, gridsize): 
+
+_warp_trace = trace.channel("warp")
+_coalesce_trace = trace.channel("coalesce")
+_smem_trace = trace.channel("smem")
+_simt_trace = trace.channel("simt")
+
+# thread block scheduler: 32 threads per warp, up to 32 warps (1024 threads) per emulated SM.
+# Larger grids are split into batches of whole thread blocks (see partition()), one batch per SM.
+def tbs(blockdim, gridsize, first_block=0): 
     totalsize = blockdim * gridsize #
-    print(f"blockdim = {blockdim}, gridsize = {gridsize}")
+    _warp_trace.info("blockdim = %d, gridsize = %d", blockdim, gridsize)
     if totalsize > 1024:
         print("fuck you 3")
         sys.exit(1)
@@ -45,52 +44,138 @@ def tbs(blockdim, gridsize):
         
         csrs.append({
             "warp_id": w,
-            "tb_id": tb_id,
+            "tb_id": first_block + tb_id,
             "tid": tid
         })
 
     return csrs
 
+def partition(blockdim, gridsize):
+    """Split the grid into (first block, block count) batches that each fit on one SM (<= 1024 threads)."""
+    if blockdim > 1024:
+        print(f"blockdim {blockdim} does not fit on one SM (max 1024 threads)")
+        sys.exit(1)
+    blocks_per_sm = 1024 // blockdim
+    return [(first, min(blocks_per_sm, gridsize - first)) for first in range(0, gridsize, blocks_per_sm)]
+
 
 # actual emulator
 def emulator(input_file, mem):
-    with open(input_file, "r") as f:
-        instructions = f.readlines()
-    csrs = tbs(int(sys.argv[2]), int(sys.argv[3]))
+    blockdim, gridsize = int(sys.argv[2]), int(sys.argv[3])
+    batches = partition(blockdim, gridsize)
+    if len(batches) > 1:
+        sms = int(sys.argv[9]) if len(sys.argv) > 9 and int(sys.argv[9]) > 0 else os.cpu_count() # optional: number of SM worker processes
+        run_grid(input_file, mem, batches, sms)
+        report_memory_stats()
+        return
+    program = Program(input_file, fmt=sys.argv[5], mem=mem) # decoded once, shared by all warps
+    run_blocks(program, mem, tbs(blockdim, gridsize))
+    report_memory_stats()
+
+def run_blocks(program, mem, csrs):
+    """Run the warps of one SM (one batch of thread blocks) until every warp halts."""
+    simd = len(sys.argv) > 6 and sys.argv[6] == "simd" # optional: evaluate all lanes of a warp at once
+    num_warps = len(csrs)
 
-    threadblock = [0] * 32
-    thread_pred_RFs = [0] * 32
+    threadblock = [0] * num_warps
+    thread_pred_RFs = [0] * num_warps
     halt_count = 0 #number of warps that have halted
+    block_mems = {} # tb_id -> global memory + that block's shared memory scratchpad
+    warp_mems = [0] * num_warps
     
-    for warp_id in range(32): #declare all warps in a threadblock, each with own csr and pred_rf
-        threadblock[warp_id] = Warp(warp_id=warp_id, pc=Bits(int=int(sys.argv[4]), length=32), csr=csrs[warp_id])
+    for warp_id in range(num_warps): #declare all warps in a threadblock, each with own csr and pred_rf
+        threadblock[warp_id] = Warp(warp_id=warp_id, pc=Bits(int=int(sys.argv[4]), length=32), csr=csrs[warp_id], simd=simd)
         thread_pred_RFs[warp_id] = Predicate_Reg_File()
+        tb_id = csrs[warp_id]["tb_id"]
+        if tb_id not in block_mems:
+            block_mems[tb_id] = BlockMem(mem, SharedMem())
+        warp_mems[warp_id] = block_mems[tb_id]
     #!WARP SCHEDULING! currently has SIMD/lockstep warps
-    while(halt_count < 32): #assuming 32 warps must halt
-        for warp_id in range(32): #execute one warp at a time
+    step = 0
+    while(halt_count < num_warps): #assuming all warps must halt
+        step += 1
+        mem.checkpoint(step)
+        for warp_id in range(num_warps): #execute one warp at a time
             warp = threadblock[warp_id]
             pred_reg_file = thread_pred_RFs[warp_id]
             if(warp.halt_status is False):
                 assert(threadblock[warp_id].halt_status is False)
-                print(f"warp_id={warp_id}")
                 pc = warp.pc.int
+                _warp_trace.debug("warp_id=%d pc=%d", warp_id, pc)
                 
-                instr_bin = fetch(instructions, pc)
-                
-                instr = I_Instr_0(op=I_Op_0.ADDI, rd=Bits(uint=0, length=5), rs1=Bits(uint=0, length=5), imm=Bits(int=0, length=12)) #NOP
-                instr = instr.decode(instruction=instr_bin,pc=warp.pc)
+                instr = program.fetch(pc)
                 
-                threadblock[warp_id] = warp.eval(instr=instr, pred_reg_file=pred_reg_file, mem=mem, csr=csrs[warp_id]) #update threadblock warp
+                threadblock[warp_id] = warp.eval(instr=instr, pred_reg_file=pred_reg_file, mem=warp_mems[warp_id], csr=csrs[warp_id]) #update threadblock warp
                 
-                print(f"Next_pc={warp.pc.int}")
+                if _warp_trace.level >= trace.DEBUG:
+                    _warp_trace.debug("Next_pc=%d", warp.pc.int)
                 if(threadblock[warp_id].halt_status): #this gets updated and hit only after first halt
                     halt_count += 1
-                    print(f"halt_count={halt_count}")
-                print()
+                    _warp_trace.info("halt_count=%d", halt_count)
             # else:
 
+    if _simt_trace.level >= trace.INFO: # per-PC SIMD efficiency (active lanes / warp lanes) and divergence
+        for pc, st in simd_efficiency.report().items():
+            _simt_trace.info("pc=%d issues=%d active_lanes=%d efficiency=%.2f",
+                             pc, st["issues"], st["active_lanes"], st["efficiency"])
+        _simt_trace.info("efficiency=%.2f divergences=%d max_stack_depth=%d", simd_efficiency.overall(),
+                         sum(w.stack.divergences for w in threadblock), max(w.stack.max_depth for w in threadblock))
+    simd_efficiency.per_pc.clear()
     return
 
+def report_memory_stats():
+    """Log the per-PC coalescing and shared memory bank conflicts of the whole grid, then clear them."""
+    if _coalesce_trace.level >= trace.INFO:
+        for pc, st in coalescer.report().items():
+            _coalesce_trace.info("pc=%d accesses=%d transactions=%d efficiency=%.2f hist=%s",
+                                 pc, st["accesses"], st["transactions"], st["efficiency"], st["hist"])
+    if _smem_trace.level >= trace.INFO:
+        for pc, st in bank_conflicts.report().items():
+            _smem_trace.info("pc=%d accesses=%d passes=%d avg_degree=%.2f max_degree=%d hist=%s",
+                             pc, st["accesses"], st["passes"], st["avg_degree"], st["max_degree"], st["hist"])
+    coalescer.per_pc.clear()
+    bank_conflicts.per_pc.clear()
+
+# ---------------- multi-SM grids ----------------
+# Every worker process emulates one SM at a time. Global memory is shared read-only
+# through one shared memory block; each batch writes into private copies of the pages
+# it touches, and the parent merges the written bytes back in batch order. The result
+# only depends on the batch order, not on the number of workers or their timing.
+# Per-PC memory statistics travel back with the written pages and are summed up there.
+_sm_state = {}
+
+def _init_sm(shm_name, table, segments, input_file):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _sm_state.update(shm=shm, table=table, segments=segments, input_file=input_file)
+    coalescer.per_pc.clear() # a forked worker starts with a copy of the parent's counters
+    bank_conflicts.per_pc.clear()
+
+def _run_sm(batch):
+    first_block, num_blocks = batch
+    mem = Mem.attach(_sm_state["shm"].buf, _sm_state["table"], _sm_state["segments"])
+    program = Program(_sm_state["input_file"], fmt=sys.argv[5], mem=mem)
+    run_blocks(program, mem, tbs(int(sys.argv[2]), num_blocks, first_block))
+    trace.flush() # pool workers exit without running atexit handlers
+    stats = coalescer.per_pc, bank_conflicts.per_pc
+    coalescer.per_pc, bank_conflicts.per_pc = {}, {}
+    return mem.written_pages(), stats
+
+def run_grid(input_file, mem, batches, sms):
+    _warp_trace.info("%d thread block batches on %d SM worker(s)", len(batches), min(sms, len(batches)))
+    shm, table = mem.share()
+    base = {page_no: shm.buf[off:off + PAGE_SIZE] for page_no, off in table.items()}
+    try:
+        with multiprocessing.Pool(processes=min(sms, len(batches)), initializer=_init_sm, initargs=(shm.name, table, mem.segment_extents(), str(input_file))) as pool:
+            for written, (coalesced, conflicts) in pool.imap(_run_sm, batches): # imap keeps batch order
+                mem.merge(written, base)
+                coalescer.merge(coalesced)
+                bank_conflicts.merge(conflicts)
+    finally:
+        for view in base.values():
+            view.release()
+        shm.close()
+        shm.unlink()
+
 # main function
 if __name__ == "__main__":
     if len(sys.argv) < 5:
@@ -103,5 +188,10 @@ if __name__ == "__main__":
         print("fuck u again lol")
         sys.exit(1)
     mem = Mem(int(sys.argv[4]), sys.argv[1])
-    print(mem.memory)
+    if len(sys.argv) > 7: # optional: final dump format, "hex" (memsim.hex) or "bin" (memsim.img)
+        mem.dump_fmt = sys.argv[7]
+        mem.dump_path = "memsim.img" if mem.dump_fmt == "bin" else "memsim.hex"
+    if len(sys.argv) > 8 and int(sys.argv[8]) > 0: # optional: stream dirty pages every N scheduler rounds
+        mem.start_stream("memsim.stream", int(sys.argv[8]))
+    _warp_trace.info("loaded %d memory page(s)", len(mem.pages))
     emulator(sys.argv[1], mem)
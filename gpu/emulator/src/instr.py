@@ -3,6 +3,7 @@ from enum import Enum
 from bitstring import Bits
 from typing import Union, Optional
 from mem import *
+import numpy as np
 import logging
 import sys
 import math
@@ -14,11 +15,78 @@ if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
 from common.custom_enums import *
+from common import trace
+from common.coalesce import Coalescer
+from common.shared_mem import BankConflicts, SHARED_BASE, SHARED_SIZE
 from reg_file import *
 from mem import *
 from predicate_reg_file import *
 
 logger = logging.getLogger(__name__)
+_decode_trace = trace.channel("decode")
+_exec_trace = trace.channel("exec")
+
+INT32_MIN = -2147483648
+INT32_MAX = 2147483647
+
+# ---------------- warp-wide (SIMD) helpers ----------------
+# Register matrix is uint32[32 lanes, 64 regs]; every lane mask is bool[32].
+def _signed(regs: np.ndarray, r: int) -> np.ndarray:
+    return regs[:, r].view(np.int32).astype(np.int64)
+
+def _unsigned(regs: np.ndarray, r: int) -> np.ndarray:
+    return regs[:, r].astype(np.int64)
+
+def _as_float(regs: np.ndarray, r: int) -> np.ndarray:
+    return regs[:, r].view(np.float32)
+
+def _as_float_swapped(regs: np.ndarray, r: int) -> np.ndarray:
+    # FP R-types hold their operands byte-swapped (see R_Instr_1.eval)
+    return regs[:, r].byteswap().view(np.float32)
+
+def _write_lanes(regs: np.ndarray, rd: int, mask: np.ndarray, values: np.ndarray) -> None:
+    if rd == 0: # x0 is hardwired to zero
+        return
+    regs[mask, rd] = values[mask].astype(np.uint32)
+
+def _write_float_lanes(regs: np.ndarray, rd: int, mask: np.ndarray, values: np.ndarray, swapped: bool = False) -> None:
+    bits = values.astype(np.float32).view(np.uint32)
+    _write_lanes(regs, rd, mask, bits.byteswap() if swapped else bits)
+
+# warp loads/stores are split into aligned segment transactions, with per-PC efficiency counters
+coalescer = Coalescer(segment=128, min_segment=32)
+
+# shared memory (scratchpad) accesses are not coalesced, they count bank conflicts instead
+bank_conflicts = BankConflicts()
+
+def _lanes_of(bits: int) -> np.ndarray:
+    return np.unpackbits(np.array([bits], dtype="<u4").view(np.uint8), bitorder="little").astype(bool)
+
+def _transactions(pc: Bits, addr: np.ndarray, mask: np.ndarray, size: int) -> Optional[list]:
+    """
+    Coalesced segments of a warp access, None if it has to go lane by lane: some
+    lane straddles two segments, or the access touches shared memory (then its
+    bank conflicts are recorded instead).
+    """
+    shared = mask & (addr >= SHARED_BASE) & (addr < SHARED_BASE + SHARED_SIZE)
+    if shared.any():
+        bank_conflicts.access(pc.int, addr.tolist(), shared.tolist(), size)
+        return None
+    transactions = coalescer.coalesce(pc.int, addr.tolist(), mask.tolist(), size)
+    if sum(bin(lanes).count("1") for _, _, lanes in transactions) != int(mask.sum()):
+        return None
+    return transactions
+
+_ACCESS_SIZE = {I_Op_2.LW: 4, I_Op_2.LH: 2, I_Op_2.LB: 1, S_Op_0.SW: 4, S_Op_0.SH: 2, S_Op_0.SB: 1}
+
+def record_access(instr: "Instr", regs: np.ndarray, mask: np.ndarray) -> None:
+    """
+    Per-PC statistics of a load/store that the scalar engine runs lane by lane:
+    the active lanes' addresses are gathered the way eval_warp sees them.
+    """
+    size = _ACCESS_SIZE.get(instr.op)
+    if size is not None:
+        _transactions(instr.pc, _signed(regs, instr.rs1_idx) + instr.imm_val, mask, size)
 
 class Instr(ABC):
     # @abstractmethod
@@ -29,6 +97,22 @@ class Instr(ABC):
     def eval(self, global_thread_id: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: int=None) -> bool:
         pass
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        """
+        Evaluate this instruction for every lane in `mask` at once.
+
+        regs:  uint32 register matrix of the warp, shape (32 lanes, 64 regs)
+        mask:  bool[32], lanes that execute the instruction
+        lanes: local lane ids in the order the scalar engine visits them
+               (only matters for memory side effects and jumps)
+        """
+        raise NotImplementedError(f"Warp-wide evaluation of {self.op} not implemented yet.")
+
+    def check_overflow_lanes(self, result: np.ndarray, mask: np.ndarray) -> None:
+        overflow = mask & ((result > INT32_MAX) | (result < INT32_MIN))
+        for lane in np.flatnonzero(overflow):
+            self.check_overflow(int(result[lane]), int(lane))
+
     def check_overflow(self, result: Union[int, float], global_thread_id: int) -> None:
         match self.op:
             case R_Op_0.ADD:
@@ -73,60 +157,60 @@ class Instr(ABC):
             case Instr_Type.R_TYPE_0:
                 op = R_Op_0(funct3)
                 self = R_Instr_0(op=op, rs1=rs1, rs2=rs2, rd=rd)
-                print(f"rtype_0, funct={op}, rs1={rs1.int}, rs2={rs2.int}, rd={rd.uint}")  
+                _decode_trace.debug("rtype_0, funct=%s, rs1=%d, rs2=%d, rd=%d", op, rs1.int, rs2.int, rd.uint)
             case Instr_Type.R_TYPE_1:
                 op = R_Op_1(funct3)
                 self = R_Instr_1(op=op, rs1=rs1, rs2=rs2, rd=rd)
-                print(f"rtype_1, funct={op}, rs1={rs1.int}, rs2={rs2.int}, rd={rd.uint}")  
+                _decode_trace.debug("rtype_1, funct=%s, rs1=%d, rs2=%d, rd=%d", op, rs1.int, rs2.int, rd.uint)
             case Instr_Type.I_TYPE_0:
                 op = I_Op_0(funct3)
                 self = I_Instr_0(op=op, rs1=rs1, imm=imm, rd=rd)
-                print(f"itype_0, funct={op},rd={rd.int},rs1={rs1.int},imm={imm.int}")
+                _decode_trace.debug("itype_0, funct=%s,rd=%d,rs1=%d,imm=%d", op, rd.int, rs1.int, imm.int)
             case Instr_Type.I_TYPE_1:
                 op = I_Op_1(funct3)
                 self = I_Instr_1(op=op, rs1=rs1, imm=imm, rd=rd)
-                print(f"itype_1, funct={op},imm={imm.int}")
+                _decode_trace.debug("itype_1, funct=%s,imm=%d", op, imm.int)
             case Instr_Type.I_TYPE_2:
                 op = I_Op_2(funct3)
                 self = I_Instr_2(op=op, rs1=rs1, imm=imm, rd=rd, pc=pc)
-                print(f"itype_2, funct={op}, rd={rd.int}, rs1={rs1.int}, imm={imm.int}")
+                _decode_trace.debug("itype_2, funct=%s, rd=%d, rs1=%d, imm=%d", op, rd.int, rs1.int, imm.int)
             case Instr_Type.S_TYPE_0:
                 op = S_Op_0(funct3)
                 # rs2 = imm #reads rs2 in imm spot
-                self = S_Instr_0(op=op, rs1=rs1, rs2=rs2, imm=rd) #reads imm in the normal rd spot
-                print(f"stype_0, funct={op},imm={rd.int}, rs1={rs1.int}, rs2={rs2.int}")
+                self = S_Instr_0(op=op, rs1=rs1, rs2=rs2, imm=rd, pc=pc) #reads imm in the normal rd spot
+                _decode_trace.debug("stype_0, funct=%s,imm=%d, rs1=%d, rs2=%d", op, rd.int, rs1.int, rs2.int)
             case Instr_Type.B_TYPE_0:
                 op = B_Op_0(funct3)
                 self = B_Instr_0(op=op, rs1=rs1, rs2=rs2)
-                print(f"btype, funct={op}")
+                _decode_trace.debug("btype, funct=%s", op)
             case Instr_Type.U_TYPE:
                 op = U_Op(funct3)
                 imm = imm + rs1 #concatenate
                 self = U_Instr(op=op, imm=imm, rd=rd, pc=pc)
-                print(f"utype, funct={op},imm={imm.int}, rd={rd.uint}")
+                _decode_trace.debug("utype, funct=%s,imm=%d, rd=%d", op, imm.int, rd.uint)
             case Instr_Type.J_TYPE:
                 op = J_Op(funct3)
                 imm = pred + rs2 + rs1 #rs1 + rs2 + pred #concatenate
                 self = J_Instr(op=op, rd=rd, imm=imm, pc=pc)
-                print("jtype")
+                _decode_trace.debug("jtype")
             case Instr_Type.P_TYPE:
                 op = P_Op(funct3)
                 # self = C_Instr(op=op, rs1=rs1, rs2=rs2, rd=rd)
-                print("ptype, not implemented yet")
+                _decode_trace.warn("ptype, not implemented yet")
             case Instr_Type.C_TYPE:
                 op = C_Op(funct3)
                 self = C_Instr(op=op, rs1=rs1, rs2=rs2, rd=rd)
-                print(f"ctype, funct={op}, rs1={rs1.uint}, rs2={rs2.uint}, rd={rd.uint}")
+                _decode_trace.debug("ctype, funct=%s, rs1=%d, rs2=%d, rd=%d", op, rs1.uint, rs2.uint, rd.uint)
             case Instr_Type.F_TYPE:
                 op = F_Op(funct3)
                 self = F_Instr(op=op, rs1=rs1, rd=rd)
-                print(f"ftype, funct={op},imm={imm.int}")
+                _decode_trace.debug("ftype, funct=%s,imm=%d", op, imm.int)
             case Instr_Type.H_TYPE:
                 op=H_Op(funct3)
                 self = H_Instr(op=op, funct3=funct3)
-                print(f"halt, funct={op}, {funct3}")
+                _decode_trace.debug("halt, funct=%s, %s", op, funct3)
             case _:
-                print("Undefined opcode")
+                _decode_trace.warn("Undefined opcode")
         return self
 
 
@@ -136,123 +220,142 @@ class R_Instr_0(Instr):
         self.rs1 = rs1
         self.rs2 = rs2
         self.rd = rd
+        self.rs1_idx, self.rs2_idx, self.rd_idx = rs1.uint, rs2.uint, rd.uint
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        rdat2 = t_reg.read(self.rs2)
+        rdat1 = to_signed(t_reg.read(self.rs1_idx))
+        rdat2 = to_signed(t_reg.read(self.rs2_idx))
         match self.op:
             # INT Arithmetic Operations
             case R_Op_0.ADD:
-                result = rdat1.int + rdat2.int
-                print(f"{rdat1.int} + {rdat2.int} = {rdat1.int + rdat2.int}")
+                result = rdat1 + rdat2
+                _exec_trace.trace("%d + %d = %d", rdat1, rdat2, result)
             
             case R_Op_0.SUB:
-                result = rdat1.int - rdat2.int
+                result = rdat1 - rdat2
             
             case R_Op_0.MUL:
-                # print(f"{rdat1.int} * {rdat2.int} = {rdat1.int * rdat2.int}")
-                result = rdat1.int * rdat2.int
+                # print(f"{rdat1} * {rdat2} = {rdat1 * rdat2}")
+                result = rdat1 * rdat2
             
             case R_Op_0.DIV:
-                if rdat2.int == 0:
+                if rdat2 == 0:
                     logger.warning(f"Division by zero in DIV from thread ID {global_thread_id}: R{self.rd} = R{self.rs1.uint} / {self.rs2.int}")
                     result = 0
                 else:
-                    result = rdat1.int // rdat2.int
+                    result = rdat1 // rdat2
             
             # Bitwise Logical Operators
             case R_Op_0.AND:
-                result = rdat1.int & rdat2.int
+                result = rdat1 & rdat2
             
             case R_Op_0.OR:
-                result = rdat1.int | rdat2.int
+                result = rdat1 | rdat2
             
             case R_Op_0.XOR:
-                result = rdat1.int ^ rdat2.int
+                result = rdat1 ^ rdat2
             
             # Comparison Operations
             case R_Op_0.SLT:
-                result = 1 if rdat1.int < rdat2.int else 0
+                result = 1 if rdat1 < rdat2 else 0
             
             case _:
                 raise NotImplementedError(f"R-Type operation {self.op} not implemented yet or doesn't exist.")
 
         self.check_overflow(result, global_thread_id)
 
-        t_reg.write(self.rd, Bits(int=result, length=32))
+        t_reg.write(self.rd_idx, result)
         return None
-        
+
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        rdat1 = _signed(regs, self.rs1_idx)
+        rdat2 = _signed(regs, self.rs2_idx)
+        match self.op:
+            case R_Op_0.ADD: result = rdat1 + rdat2
+            case R_Op_0.SUB: result = rdat1 - rdat2
+            case R_Op_0.MUL: result = rdat1 * rdat2
+            case R_Op_0.DIV:
+                zero = rdat2 == 0
+                for lane in np.flatnonzero(mask & zero):
+                    logger.warning(f"Division by zero in DIV from thread ID {lane}: R{self.rd} = R{self.rs1.uint} / {self.rs2.int}")
+                result = np.where(zero, 0, rdat1 // np.where(zero, 1, rdat2))
+            case R_Op_0.AND: result = rdat1 & rdat2
+            case R_Op_0.OR: result = rdat1 | rdat2
+            case R_Op_0.XOR: result = rdat1 ^ rdat2
+            case R_Op_0.SLT: result = (rdat1 < rdat2).astype(np.int64)
+            case _:
+                raise NotImplementedError(f"R-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        self.check_overflow_lanes(result, mask)
+        _write_lanes(regs, self.rd_idx, mask, result)
+
 class R_Instr_1(Instr):
     def __init__(self, op: R_Op_1, rs1: Bits, rs2: Bits, rd: Bits) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rs2 = rs2
         self.rd = rd
+        self.rs1_idx, self.rs2_idx, self.rd_idx = rs1.uint, rs2.uint, rd.uint
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        rdat2 = t_reg.read(self.rs2)
+        rdat1 = t_reg.read(self.rs1_idx)
+        rdat2 = t_reg.read(self.rs2_idx)
         is_float_op = False
 
         
         match self.op:
             # Comparison Operations
             case R_Op_1.SLTU:
-                result = Bits(int=1, length=32) if rdat1.uint < rdat2.uint else Bits(int=1, length=32)
+                result = 1 if rdat1 < rdat2 else 0
             
             # Floating Point Arithmetic Operations
             case R_Op_1.ADDF:
-                rdat1 = Bits(bytes=rdat1.bytes[::-1]) #flip to little endian
-                rdat2 = Bits(bytes=rdat2.bytes[::-1])
+                fdat1 = to_float(byteswap32(rdat1)) #flip to little endian
+                fdat2 = to_float(byteswap32(rdat2))
                 is_float_op = True
-                result = Bits(float=rdat1.float + rdat2.float, length=32)
-                print(f"{rdat1.float} + {rdat2.float} = {result.float}")
-                result = Bits(bytes=result.bytes[::-1])
+                result = fdat1 + fdat2
+                _exec_trace.trace("%s + %s = %s", fdat1, fdat2, result)
                 
             
             case R_Op_1.SUBF:
-                rdat1 = Bits(bytes=rdat1.bytes[::-1]) #flip to little endian
-                rdat2 = Bits(bytes=rdat2.bytes[::-1])
+                fdat1 = to_float(byteswap32(rdat1)) #flip to little endian
+                fdat2 = to_float(byteswap32(rdat2))
                 is_float_op = True
-                result = Bits(float=rdat1.float - rdat2.float, length=32)
-                result = Bits(bytes=result.bytes[::-1])
+                result = fdat1 - fdat2
                 
             
             case R_Op_1.MULF:
-                print(f"{rdat1.int}, {rdat2.int}")
                 # Reverse BYTES to convert from big-endian to little-endian
-                little_1 = Bits(bytes=rdat1.bytes[::-1])  # .bytes gives you the byte representation
-                little_2 = Bits(bytes=rdat2.bytes[::-1])
+                fdat1 = to_float(byteswap32(rdat1))
+                fdat2 = to_float(byteswap32(rdat2))
                 is_float_op = True
-                result = Bits(float=little_1.float * little_2.float, length=32)
-                print(f"{little_1.float} * {little_2.float} = {result.float}")
-                result = Bits(bytes=result.bytes[::-1])
+                result = fdat1 * fdat2
+                _exec_trace.trace("%s * %s = %s", fdat1, fdat2, result)
                 
             
             case R_Op_1.DIVF:
-                rdat1 = Bits(bytes=rdat1.bytes[::-1]) #flip to little endian
-                rdat2 = Bits(bytes=rdat2.bytes[::-1])
+                fdat1 = to_float(byteswap32(rdat1)) #flip to little endian
+                fdat2 = to_float(byteswap32(rdat2))
                 is_float_op = True
-                if rdat2.float == 0.0:
+                if fdat2 == 0.0:
                     logger.warning(f"Division by zero in DIVF from thread ID {global_thread_id}: R{self.rd} = R{self.rs1.int} / R{self.rs2.int}")
                     result = float('inf')
                 else:
-                    result = Bits(float=rdat1.float / rdat2.float, length=32)
-                    result = Bits(bytes=result.bytes[::-1])
+                    result = fdat1 / fdat2
             
             # Bit Shifting Operations
             case R_Op_1.SLL:
-                shift_amount = rdat2.uint & 0x1F  # Mask to 5 bits
-                result = (rdat1.int << shift_amount)
-                print(f"{rdat1.int} << {shift_amount} = {result}")
+                shift_amount = rdat2 & 0x1F  # Mask to 5 bits
+                result = (to_signed(rdat1) << shift_amount)
+                _exec_trace.trace("%d << %d = %d", rdat1, shift_amount, result)
             
             case R_Op_1.SRL:
-                shift_amount = rdat2.uint & 0x1F
-                result = rdat1.uint >> shift_amount
+                shift_amount = rdat2 & 0x1F
+                result = rdat1 >> shift_amount
             
             case R_Op_1.SRA:
-                shift_amount = rdat2.uint & 0x1F
-                result = rdat1.int >> shift_amount  # Python's >> preserves sign for negative numbers
+                shift_amount = rdat2 & 0x1F
+                result = to_signed(rdat1) >> shift_amount  # Python's >> preserves sign for negative numbers
             
             case _:
                 raise NotImplementedError(f"R-Type 1 operation {self.op} not implemented yet or doesn't exist.")
@@ -260,12 +363,45 @@ class R_Instr_1(Instr):
         self.check_overflow(result, global_thread_id)
 
         if is_float_op:
-            t_reg.write(self.rd, result)
+            t_reg.write(self.rd_idx, byteswap32(from_float(result))) #back to big endian
         else:
-            out = result 
-            t_reg.write(self.rd, Bits(int=out, length=32)) #result should already be Bits class
+            t_reg.write(self.rd_idx, result)
         return None
-        # t_reg.write(self.rd, Bits(int=out, length=32))
+
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        if self.op in (R_Op_1.ADDF, R_Op_1.SUBF, R_Op_1.MULF, R_Op_1.DIVF):
+            fdat1 = _as_float_swapped(regs, self.rs1_idx)
+            fdat2 = _as_float_swapped(regs, self.rs2_idx)
+            with np.errstate(all="ignore"):
+                match self.op:
+                    case R_Op_1.ADDF: result = fdat1 + fdat2
+                    case R_Op_1.SUBF: result = fdat1 - fdat2
+                    case R_Op_1.MULF: result = fdat1 * fdat2
+                    case R_Op_1.DIVF:
+                        zero = fdat2 == 0.0
+                        for lane in np.flatnonzero(mask & zero):
+                            logger.warning(f"Division by zero in DIVF from thread ID {lane}: R{self.rd} = R{self.rs1.int} / R{self.rs2.int}")
+                        result = np.where(zero, np.float32("inf"), fdat1 / fdat2)
+            for lane in np.flatnonzero(mask & ~np.isfinite(result)):
+                self.check_overflow(float(result[lane]), int(lane))
+            _write_float_lanes(regs, self.rd_idx, mask, result, swapped=True)
+            return
+
+        shift_amount = _unsigned(regs, self.rs2_idx) & 0x1F
+        match self.op:
+            case R_Op_1.SLTU:
+                result = (_unsigned(regs, self.rs1_idx) < _unsigned(regs, self.rs2_idx)).astype(np.int64)
+            case R_Op_1.SLL:
+                result = _signed(regs, self.rs1_idx) << shift_amount
+            case R_Op_1.SRL:
+                result = _unsigned(regs, self.rs1_idx) >> shift_amount
+            case R_Op_1.SRA:
+                result = _signed(regs, self.rs1_idx) >> shift_amount
+            case _:
+                raise NotImplementedError(f"R-Type 1 operation {self.op} not implemented yet or doesn't exist.")
+
+        self.check_overflow_lanes(result, mask)
+        _write_lanes(regs, self.rd_idx, mask, result)
 
 class I_Instr_0(Instr):
     def __init__(self, op: I_Op_0, rs1: Bits, rd: Bits, imm: Bits) -> None:
@@ -273,83 +409,106 @@ class I_Instr_0(Instr):
         self.rs1 = rs1
         self.rd = rd
         self.imm = imm
+        self.rs1_idx, self.rd_idx, self.imm_val = rs1.uint, rd.uint, imm.int
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        imm_val = self.imm.int  # Sign-extended immediate
+        rdat1 = to_signed(t_reg.read(self.rs1_idx))
+        imm_val = self.imm_val  # Sign-extended immediate
 
         match self.op:
             # Immediate INT Arithmetic
             case I_Op_0.ADDI:
-                result = rdat1.int + imm_val
-                print(f"{rdat1.int} + {imm_val} = {result}")
+                result = rdat1 + imm_val
+                _exec_trace.trace("%d + %d = %d", rdat1, imm_val, result)
             
             case I_Op_0.SUBI:
-                result = rdat1.int - imm_val
+                result = rdat1 - imm_val
             
             # Immediate Logical Operators
             case I_Op_0.ORI:
-                result = rdat1.int | imm_val
+                result = rdat1 | imm_val
             
             # Immediate Comparison
             case I_Op_0.SLTI:
-                result = 1 if rdat1.int < imm_val else 0
+                result = 1 if rdat1 < imm_val else 0
             
             case _:
                 raise NotImplementedError(f"I-Type 0 operation {self.op} not implemented yet or doesn't exist.")
 
-        out = result
-        t_reg.write(self.rd, Bits(int=out, length=32))
+        t_reg.write(self.rd_idx, result)
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        rdat1 = _signed(regs, self.rs1_idx)
+        imm_val = self.imm_val
+
+        match self.op:
+            case I_Op_0.ADDI: result = rdat1 + imm_val
+            case I_Op_0.SUBI: result = rdat1 - imm_val
+            case I_Op_0.ORI: result = rdat1 | imm_val
+            case I_Op_0.SLTI: result = (rdat1 < imm_val).astype(np.int64)
+            case _:
+                raise NotImplementedError(f"I-Type 0 operation {self.op} not implemented yet or doesn't exist.")
+
+        _write_lanes(regs, self.rd_idx, mask, result)
+
 class I_Instr_1(Instr):
     def __init__(self, op: I_Op_1, rs1: Bits, rd: Bits, imm: Bits) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rd = rd
         self.imm = imm
+        self.rs1_idx, self.rd_idx, self.imm_val = rs1.uint, rd.uint, imm.uint
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File = None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        imm_val = self.imm.uint  # Unsigned immediate for shifts and unsigned compare
+        rdat1 = t_reg.read(self.rs1_idx)
+        imm_val = self.imm_val  # Unsigned immediate for shifts and unsigned compare
 
         match self.op:
             case I_Op_1.SLTIU:
-                result = 1 if rdat1.uint < imm_val else 0
+                result = 1 if rdat1 < imm_val else 0
             
             case I_Op_1.SRLI:
                 shift_amount = imm_val & 0x1F  # Mask to 5 bits
-                result = rdat1.uint >> shift_amount
+                result = rdat1 >> shift_amount
             
             case I_Op_1.SRAI:
                 shift_amount = imm_val & 0x1F  # Mask to 5 bits
-                result = rdat1.int >> shift_amount  # Arithmetic right shift (sign-extends)
+                result = to_signed(rdat1) >> shift_amount  # Arithmetic right shift (sign-extends)
             
             case _:
                 raise NotImplementedError(f"I-Type 1 operation {self.op} not implemented yet or doesn't exist.")
 
-        out = result & 0xFFFFFFFF
-        t_reg.write(self.rd, Bits(int=out, length=32))
+        t_reg.write(self.rd_idx, result)
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        imm_val = self.imm_val
+
+        match self.op:
+            case I_Op_1.SLTIU: result = (_unsigned(regs, self.rs1_idx) < imm_val).astype(np.int64)
+            case I_Op_1.SRLI: result = _unsigned(regs, self.rs1_idx) >> (imm_val & 0x1F)
+            case I_Op_1.SRAI: result = _signed(regs, self.rs1_idx) >> (imm_val & 0x1F)
+            case _:
+                raise NotImplementedError(f"I-Type 1 operation {self.op} not implemented yet or doesn't exist.")
+
+        _write_lanes(regs, self.rd_idx, mask, result)
+
 class I_Instr_2(Instr):
     def __init__(self, op: I_Op_2, rs1: Bits, rd: Bits, imm: Bits, pc: Bits = None) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rd = rd
         self.imm = imm
+        self.rs1_idx, self.rd_idx, self.imm_val = rs1.uint, rd.uint, imm.int
 
-        if op == I_Op_2.JALR:
-            self.pc = pc    # Program counter for JALR
-            # self.mem = None # Memory is not used for JALR
-        else: # op == I_Op_2.LW or op == I_Op_2.LH or op == I_Op_2.LB
-            self.pc = None # Program counter not used for LW/LH/LB
-            # self.mem = mem # Memory object for LW/LH/LB
+        self.pc = pc # return address for JALR, coalescing statistics are kept per PC for LW/LH/LB
   
-    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem, pred_reg_file=None) -> bool:
+    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem, pred_reg_file=None) -> Optional[Bits]:
         # if(self.op != I_Op_2.JALR):
-        rdat1 = t_reg.read(self.rs1) #jalr doesn't read from reg file?
-        imm_val = self.imm.int  # Sign-extended immediate
+        rdat1 = to_signed(t_reg.read(self.rs1_idx)) #jalr doesn't read from reg file?
+        imm_val = self.imm_val  # Sign-extended immediate
+        next_pc = None
 
         if self.op == I_Op_2.JALR:
             mem = None # Memory is not used for JALR
@@ -359,15 +518,15 @@ class I_Instr_2(Instr):
             case I_Op_2.LW:
                 # if mem is None:
                 #     raise RuntimeError("Memory object required for LW operation")
-                addr = rdat1.int + imm_val
-                print(f"addr: {rdat1.int} + {imm_val} = {rdat1.int + imm_val}")
+                addr = rdat1 + imm_val
+                _exec_trace.trace("addr: %d + %d = %d", rdat1, imm_val, addr)
                 result = mem.read(addr, 4)  # Read 32 bits (4 bytes)
-                print(f"result: {result}")
+                _exec_trace.trace("result: %d", result)
 
             case I_Op_2.LH:
                 # if self.mem is None:
                 #     raise RuntimeError("Memory object required for LH operation")
-                addr = rdat1.int + imm_val
+                addr = rdat1 + imm_val
                 result = mem.read(addr, 2)  # Read 16 bits (2 bytes)
                 # Sign extend from 16 to 32 bits
                 if result & 0x8000:
@@ -376,7 +535,7 @@ class I_Instr_2(Instr):
             case I_Op_2.LB:
                 # if self.mem is None:
                 #     raise RuntimeError("Memory object required for LB operation")
-                addr = rdat1.int + imm_val
+                addr = rdat1 + imm_val
                 result = mem.read(addr, 1)  # Read 8 bits (1 byte)
                 # Sign extend from 8 to 32 bits
                 if result & 0x80:
@@ -384,7 +543,6 @@ class I_Instr_2(Instr):
             
             # Jump and Link Register
             case I_Op_2.JALR:
-                print(self.pc)
                 if self.pc is None:
                     raise RuntimeError("Program counter required for JALR operation")
                 # Save return address (PC + 4)
@@ -392,31 +550,69 @@ class I_Instr_2(Instr):
                 result = return_addr
 
                 # Calculate target address
-                target_addr = rdat1.int + imm_val
-                self.pc = Bits(int=target_addr, length=32)
-                print(type(self.pc))
+                target_addr = rdat1 + imm_val
+                next_pc = Bits(int=target_addr, length=32)
+                _exec_trace.trace("jalr -> %d", target_addr)
             
             case _:
                 raise NotImplementedError(f"I-Type operation {self.op} not implemented yet or doesn't exist.")
         # print(f"loading x{self.rd.int}={hex(result)} from MEM[{hex(addr)}]")
-        t_reg.write(self.rd, Bits(int=result, length=32))
-        return None
-        # return None.pc # If op is JALR, the target PC is returned. Otherwise (for LW/LH/LB), None is returned
+        t_reg.write(self.rd_idx, result)
+        return next_pc # If op is JALR, the target PC is returned. Otherwise (for LW/LH/LB), None is returned
+
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> Optional[Bits]:
+        rdat1 = _signed(regs, self.rs1_idx)
+        imm_val = self.imm_val
+        next_pc = None
+
+        match self.op:
+            # Memory Read Operations, memory is still byte addressed so go lane by lane
+            case I_Op_2.LW | I_Op_2.LH | I_Op_2.LB:
+                size, sign = {I_Op_2.LW: (4, 0), I_Op_2.LH: (2, 0x8000), I_Op_2.LB: (1, 0x80)}[self.op]
+                result = np.zeros(32, dtype=np.int64)
+                addr = rdat1 + imm_val
+                transactions = _transactions(self.pc, addr, mask, size)
+                if transactions is None:
+                    for lane in lanes[mask[lanes]]:
+                        result[lane] = mem.read(int(addr[lane]), size)
+                else: # one block read per segment, lanes pick their bytes out of it
+                    for base, seg, seg_lanes in transactions:
+                        block = np.frombuffer(mem.read_block(base, seg), dtype=np.uint8).astype(np.int64)
+                        sel = _lanes_of(seg_lanes)
+                        off = addr[sel] - base
+                        result[sel] = sum(block[off + i] << (8 * i) for i in range(size))
+                if sign:
+                    result = np.where(result & sign, result - (sign << 1), result) # sign extend to 32 bits
+
+            # Jump and Link Register (only ever given the single lane that takes the jump)
+            case I_Op_2.JALR:
+                if self.pc is None:
+                    raise RuntimeError("Program counter required for JALR operation")
+                result = np.full(32, self.pc.int + 4, dtype=np.int64)
+                lane = np.flatnonzero(mask)[0]
+                next_pc = Bits(int=int(rdat1[lane]) + imm_val, length=32)
+
+            case _:
+                raise NotImplementedError(f"I-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        _write_lanes(regs, self.rd_idx, mask, result)
+        return next_pc
 
 class F_Instr(Instr):
     def __init__(self, op: F_Op, rs1: Bits, rd: Bits) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rd = rd
+        self.rs1_idx, self.rd_idx = rs1.uint, rd.uint
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
+        rdat1 = t_reg.read(self.rs1_idx)
 
         match self.op:
             # Root Operations
             case F_Op.ISQRT:
                 # Inverse square root: 1 / sqrt(x)
-                val = rdat1.float
+                val = to_float(rdat1)
                 if val <= 0:
                     logger.warning(f"Invalid value for ISQRT from thread ID {global_thread_id}: R{self.rs1.int} = {val}")
                     result = float('inf')
@@ -425,19 +621,19 @@ class F_Instr(Instr):
             
             # Trigonometric Operations
             case F_Op.SIN:
-                result = math.sin(rdat1.float)
+                result = math.sin(to_float(rdat1))
             
             case F_Op.COS:
-                result = math.cos(rdat1.float)
+                result = math.cos(to_float(rdat1))
             
             # Type Conversion Operations
             case F_Op.ITOF:
                 # Integer to Float
-                result = float(rdat1.int)
+                result = float(to_signed(rdat1))
             
             case F_Op.FTOI:
                 # Float to Integer (truncate towards zero)
-                result = int(rdat1.float)
+                result = int(to_float(rdat1))
             
             case _:
                 raise NotImplementedError(f"F-Type operation {self.op} not implemented yet or doesn't exist.")
@@ -449,70 +645,125 @@ class F_Instr(Instr):
 
         # For FTOI, keep as integer; for others, convert properly
         if self.op == F_Op.FTOI:
-            out = result & 0xFFFFFFFF
-            t_reg.write(self.rd, Bits(int=out, length=32))
+            t_reg.write(self.rd_idx, result)
         else:
             # For floating point results, write as float
-            t_reg.write(self.rd, Bits(float=result, length=32))
+            t_reg.write(self.rd_idx, from_float(result))
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        fdat1 = _as_float(regs, self.rs1_idx).astype(np.float64)
+
+        with np.errstate(all="ignore"):
+            match self.op:
+                case F_Op.ISQRT:
+                    invalid = fdat1 <= 0
+                    for lane in np.flatnonzero(mask & invalid):
+                        logger.warning(f"Invalid value for ISQRT from thread ID {lane}: R{self.rs1.int} = {fdat1[lane]}")
+                    result = np.where(invalid, np.inf, 1.0 / np.sqrt(fdat1))
+                # Trigonometric Operations, go through math so results match the scalar engine exactly
+                case F_Op.SIN:
+                    result = np.array([math.sin(v) if m else 0.0 for v, m in zip(fdat1, mask)])
+                case F_Op.COS:
+                    result = np.array([math.cos(v) if m else 0.0 for v, m in zip(fdat1, mask)])
+                case F_Op.ITOF:
+                    result = _signed(regs, self.rs1_idx).astype(np.float64)
+                case F_Op.FTOI:
+                    result = np.trunc(fdat1).astype(np.int64) & 0xFFFFFFFF
+                    _write_lanes(regs, self.rd_idx, mask, result)
+                    return
+                case _:
+                    raise NotImplementedError(f"F-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        for lane in np.flatnonzero(mask & ~np.isfinite(result)):
+            logger.warning(f"Infinite/NaN FP result in {self.op.name} from thread ID {lane}: R{self.rd.int} = {self.op.name}(R{self.rs1.int})")
+        _write_float_lanes(regs, self.rd_idx, mask, result)
+
 class S_Instr_0(Instr):
-    def __init__(self, op: S_Op_0, rs1: Bits, rs2: Bits, imm: Bits) -> None:
+    def __init__(self, op: S_Op_0, rs1: Bits, rs2: Bits, imm: Bits, pc: Bits = None) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rs2 = rs2
         self.imm = imm
+        self.pc = pc # coalescing statistics are kept per PC
+        self.rs1_idx, self.rs2_idx, self.imm_val = rs1.uint, rs2.uint, imm.int
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem, pred_reg_file=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        rdat2 = t_reg.read(self.rs2)
-        imm_val = self.imm.int  # Sign-extended immediate
+        rdat1 = to_signed(t_reg.read(self.rs1_idx))
+        rdat2 = t_reg.read(self.rs2_idx)
+        imm_val = self.imm_val  # Sign-extended immediate
         
         # Calculate address
-        addr = rdat1.int + imm_val
+        addr = rdat1 + imm_val
         # print(f"{addr}, rdat1={rdat1}, rdat2={rdat2}")
         match self.op:
             # Memory Write Operations
             case S_Op_0.SW:
                 # Store Word (32 bits / 4 bytes)
-                mem.write(addr, rdat2.uint, 4)
-                little_endian_float = Bits(bytes=rdat2.bytes[::-1]).float
-                print(little_endian_float)
+                mem.write(addr, rdat2, 4)
+                if _exec_trace.level >= trace.TRACE:
+                    _exec_trace.trace("sw %s", to_float(byteswap32(rdat2)))
             
             case S_Op_0.SH:
                 # Store Half-Word (16 bits / 2 bytes)
-                data = rdat2.uint & 0xFFFF
+                data = rdat2 & 0xFFFF
                 mem.write(addr, data, 2)
             
             case S_Op_0.SB:
                 # Store Byte (8 bits / 1 byte)
-                data = rdat2.uint & 0xFF
+                data = rdat2 & 0xFF
                 mem.write(addr, data, 1)
             
             case _:
                 raise NotImplementedError(f"S-Type operation {self.op} not implemented yet or doesn't exist.")
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        addr = _signed(regs, self.rs1_idx) + self.imm_val
+        rdat2 = regs[:, self.rs2_idx]
+
+        match self.op:
+            case S_Op_0.SW: size = 4
+            case S_Op_0.SH: size = 2
+            case S_Op_0.SB: size = 1
+            case _:
+                raise NotImplementedError(f"S-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        # stores land in scalar lane order so the last lane wins on conflicts
+        data_mask = (1 << (8 * size)) - 1
+        transactions = _transactions(self.pc, addr, mask, size)
+        if transactions is None:
+            for lane in lanes[mask[lanes]]:
+                mem.write(int(addr[lane]), int(rdat2[lane]) & data_mask, size)
+            return
+        for base, seg, seg_lanes in transactions: # read-modify-write one block per segment
+            block = bytearray(mem.read_block(base, seg))
+            for lane in lanes[_lanes_of(seg_lanes)[lanes]]:
+                off = int(addr[lane]) - base
+                block[off:off + size] = (int(rdat2[lane]) & data_mask).to_bytes(size, "little")
+            mem.write_block(base, bytes(block))
+
 class B_Instr_0(Instr):
     def __init__(self, op: B_Op_0, rs1: Bits, rs2: Bits) -> None:
         super().__init__(op)
         self.rs1 = rs1
         self.rs2 = rs2
+        self.rs1_idx, self.rs2_idx = rs1.uint, rs2.uint
         # self.pred_reg_file = pred_reg_file
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
-        rdat1 = t_reg.read(self.rs1)
-        rdat2 = t_reg.read(self.rs2)
+        rdat1 = t_reg.read(self.rs1_idx)
+        rdat2 = t_reg.read(self.rs2_idx)
         
         # Evaluate branch condition and write result to predicate register
         match self.op:
             # Comparison Operations (write to predicate register)
-            case B_Op_0.BEQ: result = 1 if rdat1.int == rdat2.int else 0
-            case B_Op_0.BNE: result = 1 if rdat1.int != rdat2.int else 0
-            case B_Op_0.BGE: result = 1 if rdat1.int >= rdat2.int else 0
-            case B_Op_0.BGEU: result = 1 if rdat1.uint >= rdat2.uint else 0
-            case B_Op_0.BLT: result = 1 if rdat1.int < rdat2.int else 0
-            case B_Op_0.BLTU: result = 1 if rdat1.uint < rdat2.uint else 0
+            case B_Op_0.BEQ: result = 1 if rdat1 == rdat2 else 0
+            case B_Op_0.BNE: result = 1 if rdat1 != rdat2 else 0
+            case B_Op_0.BGE: result = 1 if to_signed(rdat1) >= to_signed(rdat2) else 0
+            case B_Op_0.BGEU: result = 1 if rdat1 >= rdat2 else 0
+            case B_Op_0.BLT: result = 1 if to_signed(rdat1) < to_signed(rdat2) else 0
+            case B_Op_0.BLTU: result = 1 if rdat1 < rdat2 else 0
             case _:
                 raise NotImplementedError(f"B-Type operation {self.op} not implemented yet or doesn't exist.")
 
@@ -526,12 +777,27 @@ class B_Instr_0(Instr):
             pass
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        match self.op:
+            case B_Op_0.BEQ: result = _signed(regs, self.rs1_idx) == _signed(regs, self.rs2_idx)
+            case B_Op_0.BNE: result = _signed(regs, self.rs1_idx) != _signed(regs, self.rs2_idx)
+            case B_Op_0.BGE: result = _signed(regs, self.rs1_idx) >= _signed(regs, self.rs2_idx)
+            case B_Op_0.BGEU: result = _unsigned(regs, self.rs1_idx) >= _unsigned(regs, self.rs2_idx)
+            case B_Op_0.BLT: result = _signed(regs, self.rs1_idx) < _signed(regs, self.rs2_idx)
+            case B_Op_0.BLTU: result = _unsigned(regs, self.rs1_idx) < _unsigned(regs, self.rs2_idx)
+            case _:
+                raise NotImplementedError(f"B-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        # Write to predicate register: PR[lane] = result for every active lane
+        pred_reg_file.write_mask(np.where(mask, result, pred_reg_file.read_mask()))
+
 class U_Instr(Instr):
     def __init__(self, op: U_Op, rd: Bits, imm: Bits, pc: Bits = None) -> None:
         super().__init__(op)
         self.rd = rd
         self.imm = imm
         self.pc = pc  # Program counter for AUIPC
+        self.rd_idx, self.imm_val = rd.uint, imm.uint
 
     def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
         match self.op:
@@ -542,47 +808,67 @@ class U_Instr(Instr):
                     raise RuntimeError("Program counter required for AUIPC operation")
                 result = self.pc.int + (self.imm.int << 12)
                 self.check_overflow(result, global_thread_id)
-                t_reg.write(self.rd, Bits(int=result, length=32))
+                t_reg.write(self.rd_idx, result)
                 
             
             # Building Immediates
             case U_Op.LLI:
                 # Load Lower Immediate: R[rd] = {R[rd][31:12], imm[11:0]}
-                rd_val = t_reg.read(self.rd)
-                upper_bits = rd_val.uint & 0xFFFFF000  # Keep upper 20 bits
-                lower_bits = self.imm.uint & 0x00000FFF  # Get lower 12 bits from immediate
+                rd_val = t_reg.read(self.rd_idx)
+                upper_bits = rd_val & 0xFFFFF000  # Keep upper 20 bits
+                lower_bits = self.imm_val & 0x00000FFF  # Get lower 12 bits from immediate
                 result = upper_bits | lower_bits
-                t_reg.write(self.rd, Bits(uint=result, length=32))
+                t_reg.write(self.rd_idx, result)
             
             case U_Op.LMI:
                 # Load Middle Immediate: R[rd] = {R[rd][31:24], imm[11:0], R[rd][11:0]}
-                rd_val = t_reg.read(self.rd)
-                upper_bits = rd_val.uint & 0xFF000000  # Keep upper 8 bits
-                lower_bits = rd_val.uint & 0x00000FFF  # Keep lower 12 bits
-                middle_bits = (self.imm.uint & 0x00000FFF) << 12  # Middle 12 bits from immediate
+                rd_val = t_reg.read(self.rd_idx)
+                upper_bits = rd_val & 0xFF000000  # Keep upper 8 bits
+                lower_bits = rd_val & 0x00000FFF  # Keep lower 12 bits
+                middle_bits = (self.imm_val & 0x00000FFF) << 12  # Middle 12 bits from immediate
                 result = upper_bits | middle_bits | lower_bits
-                t_reg.write(self.rd, Bits(uint=result, length=32))
+                t_reg.write(self.rd_idx, result)
             
             case U_Op.LUI:
                 # Load Upper Immediate: R[rd] = {imm[7:0], R[rd][23:0]}
                 # Note: imm is 12 bits, but we only use the lower 8 bits
-                rd_val = t_reg.read(self.rd)
-                lower_bits = rd_val.uint & 0x00FFFFFF  # Keep lower 24 bits
-                upper_bits = (self.imm.uint & 0x000000FF) << 24  # Upper 8 bits from immediate
+                rd_val = t_reg.read(self.rd_idx)
+                lower_bits = rd_val & 0x00FFFFFF  # Keep lower 24 bits
+                upper_bits = (self.imm_val & 0x000000FF) << 24  # Upper 8 bits from immediate
                 result = upper_bits | lower_bits
-                t_reg.write(self.rd, Bits(uint=result, length=32))
+                t_reg.write(self.rd_idx, result)
             
             case _:
                 raise NotImplementedError(f"U-Type operation {self.op} not implemented yet or doesn't exist.")
         # print(f"x{self.rd.int}={result}")
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        rd_val = _unsigned(regs, self.rd_idx)
+        match self.op:
+            case U_Op.AUIPC:
+                if self.pc is None:
+                    raise RuntimeError("Program counter required for AUIPC operation")
+                result = np.full(32, self.pc.int + (self.imm.int << 12), dtype=np.int64)
+                self.check_overflow_lanes(result, mask)
+            case U_Op.LLI:
+                result = (rd_val & 0xFFFFF000) | (self.imm_val & 0x00000FFF)
+            case U_Op.LMI:
+                result = (rd_val & 0xFF000FFF) | ((self.imm_val & 0x00000FFF) << 12)
+            case U_Op.LUI:
+                result = (rd_val & 0x00FFFFFF) | ((self.imm_val & 0x000000FF) << 24)
+            case _:
+                raise NotImplementedError(f"U-Type operation {self.op} not implemented yet or doesn't exist.")
+
+        _write_lanes(regs, self.rd_idx, mask, result)
+
 class C_Instr(Instr):
     def __init__(self, op: C_Op, rd: Bits, rs1: Bits, rs2: Bits) -> None:
         super().__init__(op)
         self.rd = rd
         self.rs1 = rs1
         self.rs2 = rs2
+        self.rd_idx = rd.uint
         # self.csr = csr
         # self.csr_file = csr_file  # Control Status Register file
 
@@ -599,7 +885,7 @@ class C_Instr(Instr):
                 # CSR Read: R[rd] = CSR[csr]
         csr_tid = csr["tid"]
         csr_val = csr_tid[global_thread_id] #global is actually local...
-        t_reg.write(self.rd, Bits(int=csr_val, length=32))
+        t_reg.write(self.rd_idx, csr_val)
         # print(f"x{self.rd.int}(rd)={csr_val}")
             
             # case C_Op.CSRW:
@@ -611,15 +897,22 @@ class C_Instr(Instr):
             #     raise NotImplementedError(f"C-Type operation {self.op} not implemented yet or doesn't exist.")
         return None
 
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> None:
+        if csr is None:
+            raise RuntimeError(f"CSR file required for {self.op.name} operation")
+        # same indexing as eval(): the local lane id selects the thread id
+        _write_lanes(regs, self.rd_idx, mask, np.asarray(csr["tid"], dtype=np.int64))
+
 class J_Instr(Instr):
     def __init__(self, op: J_Op, rd: Bits, imm: Bits, pc: Bits) -> None:
         super().__init__(op)
         self.rd = rd
         self.imm = imm
         self.pc = pc  # Program counter
+        self.rd_idx = rd.uint
         # self.pred_reg_file = pred_reg_file  # Predicate register file
 
-    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
+    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> Bits:
         match self.op:
             # Jump and Link
             case J_Op.JAL:
@@ -631,15 +924,26 @@ class J_Instr(Instr):
                 pred_reg_file.write_all(data=Bits(uint=1,length=1))  # writes to all 32 registers
                 
                 # Calculate new PC (PC = PC + imm)
-                self.pc = Bits(int=self.pc.int + self.imm.int, length=32)
-                t_reg.write(self.rd, Bits(int=return_addr, length=32))
+                next_pc = Bits(int=self.pc.int + self.imm.int, length=32)
+                t_reg.write(self.rd_idx, return_addr)
 
             case _:
                 raise NotImplementedError(f"J-Type operation {self.op} not implemented yet or doesn't exist.")
         
         # t_reg.write(self.rd, Bits(int=self.pc.int, length=32))
-        return None
-        # return None.pc
+        return next_pc
+
+    def eval_warp(self, regs: np.ndarray, mask: np.ndarray, lanes: np.ndarray, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None, csr: dict=None) -> Bits:
+        match self.op:
+            # Jump and Link (only ever given the single lane that takes the jump)
+            case J_Op.JAL:
+                return_addr = self.pc.int + 4
+                pred_reg_file.write_all(data=Bits(uint=1,length=1))
+                _write_lanes(regs, self.rd_idx, mask, np.full(32, return_addr, dtype=np.int64))
+                return Bits(int=self.pc.int + self.imm.int, length=32)
+
+            case _:
+                raise NotImplementedError(f"J-Type operation {self.op} not implemented yet or doesn't exist.")
 
 class P_Instr(Instr):
     def __init__(self, op: P_Op, rs1: Bits, rs2: Bits, pc: Bits, pred_reg_file: Predicate_Reg_File) -> None:
@@ -649,7 +953,7 @@ class P_Instr(Instr):
         self.pc = pc  # Program counter
         self.pred_reg_file = pred_reg_file  # Predicate register file
 
-    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> bool:
+    def eval(self, global_thread_id: int, csr: int, t_reg: Reg_File, mem: Mem=None, pred_reg_file: Predicate_Reg_File=None) -> Bits:
         match self.op:
             # Jump Predicate Not Zero
             case P_Op.JPNZ:      
@@ -659,14 +963,13 @@ class P_Instr(Instr):
                 if pred_val == 0:
                     # If predicate is zero, jump: PC = R[rs2]
                     rdat2 = t_reg.read(self.rs2)
-                    self.pc = Bits(int=rdat2.int, length=32)
+                    next_pc = Bits(int=to_signed(rdat2), length=32)
                 else:
                     # If predicate is not zero, continue: PC = PC + 4
-                    self.pc = Bits(int=self.pc.int + 4, length=32)
+                    next_pc = Bits(int=self.pc.int + 4, length=32)
             case _:
                 raise NotImplementedError(f"P-Type operation {self.op} not implemented yet or doesn't exist.")
-        return None
-        # return self.pc
+        return next_pc
 
 class H_Instr(Instr): #returns true
     def __init__(self, op: H_Op, funct3: Bits, r_pred: Bits = Bits(bin='11111', length=5)) -> None:
@@ -3,11 +3,44 @@ import sys
 from pathlib import Path
 import atexit
 from pathlib import Path
+from multiprocessing import shared_memory
+from typing import Optional
 from bitstring import Bits
+import numpy as np
+
+# Add project root to path for imports
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from common import trace
+from common.mem_image import *
+from common.shared_mem import SHARED_BASE, SHARED_SIZE, is_shared
+
+_trace = trace.channel("mem")
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+
+# aligned accesses go through native memoryview casts, which are only little endian on little endian hosts
+_NATIVE_LE = sys.byteorder == "little"
 
 class Mem: 
-    def __init__(self, start_pc: int, input_file: str) -> None:
-        self.memory: dict[int, int] = {}
+    def __init__(self, start_pc: int, input_file: Optional[str]) -> None:
+        # page number -> {access size: memoryview}, pages are allocated on first write
+        self.pages: dict[int, dict[int, memoryview]] = {}
+        self.base: dict[int, memoryview] = {} # read-only pages shared with other processes, copied on first write (see attach())
+        self.watchers: list = [] # (lo, hi, callback) ranges that want to hear about writes
+        self.segments: list[Segment] = [] # set when loading a binary image
+        self.dirty: set[int] = set() # pages written since the program was loaded / last stream flush
+        self.dump_path = "memsim.hex"
+        self.dump_fmt = "hex"
+        self._stream = None # streaming dump, see start_stream()
+        self._mappings: list = [] # keeps image mmaps alive while pages point into them
+
+        if input_file is None: # empty memory, e.g. a worker attaching to shared pages
+            return
 
         endianness = "little"
         addr = start_pc
@@ -16,6 +49,13 @@ class Mem:
         if not p.exists():
             raise FileNotFoundError(f"Program file not found: {p}")
 
+        if is_image(p): # binary image, segments carry their own load addresses
+            self.load_image(p)
+            self.dirty.clear()
+            atexit.register(self.dump_on_exit)
+            return
+
+        image = bytearray()
         with p.open("r", encoding="utf-8") as f:
             for line_no, raw in enumerate(f, start=1):
                 # clean line: remove comments/whitespace/underscores
@@ -39,71 +79,267 @@ class Mem:
                 # else: 
                 #     word = int(bits, 2) & 0xFFFF_FFFF
                 # split into 4 bytes per chosen endianness
-                if endianness == "little":
-                    b0 = (word >> 0)  & 0xFF
-                    b1 = (word >> 8)  & 0xFF
-                    b2 = (word >> 16) & 0xFF
-                    b3 = (word >> 24) & 0xFF
-                else:  # big-endian
-                    b3 = (word >> 0)  & 0xFF
-                    b2 = (word >> 8)  & 0xFF
-                    b1 = (word >> 16) & 0xFF
-                    b0 = (word >> 24) & 0xFF
-
-                # store 4 consecutive bytes
-                self.memory[addr + 0] = b0
-                self.memory[addr + 1] = b1
-                self.memory[addr + 2] = b2
-                self.memory[addr + 3] = b3
-
-                addr += 4  # next word starts 4 bytes later
+                image += word.to_bytes(4, endianness)
+
+        # store the whole program in one go, 4 bytes per word
+        self.write_block(addr, image)
+        self.dirty.clear()
         atexit.register(self.dump_on_exit)
 
+    def _page(self, page_no: int) -> dict[int, memoryview]:
+        views = self.pages.get(page_no)
+        if views is None:
+            shared = self.base.get(page_no)
+            raw = memoryview(bytearray(PAGE_SIZE) if shared is None else bytearray(shared))
+            views = {1: raw, 2: raw.cast("H"), 4: raw.cast("I")}
+            self.pages[page_no] = views
+        return views
+
+    def load_image(self, path) -> None:
+        """
+        Place the segments of a binary image (see common/mem_image.py) into memory.
+        Whole pages are used straight out of the copy-on-write mapping, only the
+        partial pages at the edges of a segment get copied.
+        """
+        mapping, segments = load_image(path)
+        self._mappings.append(mapping)
+        self.segments.extend(segments)
+        for seg in segments:
+            data, addr = seg.data, seg.addr
+            pos = 0
+            while pos < len(data):
+                off = (addr + pos) & PAGE_MASK
+                chunk = min(len(data) - pos, PAGE_SIZE - off)
+                if chunk == PAGE_SIZE and _NATIVE_LE:
+                    raw = data[pos:pos + PAGE_SIZE]
+                    self.pages[(addr + pos) >> PAGE_SHIFT] = {1: raw, 2: raw.cast("H"), 4: raw.cast("I")}
+                else:
+                    self.write_block(addr + pos, data[pos:pos + chunk])
+                pos += chunk
+
     def read(self, addr: int, bytes: int) -> int:
-        val = 0
-
-        for i in range(bytes): #reads LSB first
-            b = self.memory[addr + i] & 0xFF #endianness
-            val |= b << (8 * i)
-            # print(f"byte_{i}={bin(b)} at mem_addr={addr + i}")
-            
-        # print(f"word={hex(val)} at mem_addr={addr}")
-        return val
-
-    def write(self, addr: Bits, data: Bits, bytes_t: int) -> None:
-        # print(f"{addr},{data}")
-        for i in range(bytes_t):
-            self.memory[addr + i] =  data >> (8 * i)#
-            # print(f"{i}, {data << (8*i)}, {addr}")
+        off = addr & PAGE_MASK
+        if _NATIVE_LE and bytes in (1, 2, 4) and off % bytes == 0:
+            views = self.pages.get(addr >> PAGE_SHIFT)
+            if views is None:
+                shared = self.base.get(addr >> PAGE_SHIFT)
+                if shared is None:
+                    return 0 # untouched memory reads as zero
+                return int.from_bytes(shared[off:off + bytes], "little")
+            return views[bytes][off // bytes]
+        return int.from_bytes(self.read_block(addr, bytes), "little") #reads LSB first
+
+    def write(self, addr: int, data: int, bytes_t: int) -> None:
+        off = addr & PAGE_MASK
+        if _NATIVE_LE and bytes_t in (1, 2, 4) and off % bytes_t == 0:
+            page_no = addr >> PAGE_SHIFT
+            self._page(page_no)[bytes_t][off // bytes_t] = data & ((1 << (8 * bytes_t)) - 1)
+            self.dirty.add(page_no)
+            for lo, hi, callback in self.watchers:
+                if addr < hi and addr + bytes_t > lo:
+                    callback(addr, bytes_t)
+        else:
+            self.write_block(addr, (data & ((1 << (8 * bytes_t)) - 1)).to_bytes(bytes_t, "little"))
+
+    def read_block(self, addr: int, n: int) -> bytes:
+        """Read n bytes starting at addr, bytes that were never written read as zero."""
+        out = bytearray(n)
+        pos = 0
+        while pos < n:
+            off = (addr + pos) & PAGE_MASK
+            chunk = min(n - pos, PAGE_SIZE - off)
+            views = self.pages.get((addr + pos) >> PAGE_SHIFT)
+            src = views[1] if views is not None else self.base.get((addr + pos) >> PAGE_SHIFT)
+            if src is not None:
+                out[pos:pos + chunk] = src[off:off + chunk]
+            pos += chunk
+        return bytes(out)
+
+    def write_block(self, addr: int, data: bytes) -> None:
+        """Write a run of bytes starting at addr, allocating pages as needed."""
+        n = len(data)
+        pos = 0
+        while pos < n:
+            off = (addr + pos) & PAGE_MASK
+            chunk = min(n - pos, PAGE_SIZE - off)
+            page_no = (addr + pos) >> PAGE_SHIFT
+            self._page(page_no)[1][off:off + chunk] = data[pos:pos + chunk]
+            self.dirty.add(page_no)
+            pos += chunk
+        for lo, hi, callback in self.watchers:
+            if addr < hi and addr + n > lo:
+                callback(addr, n)
+
+    def share(self) -> tuple[shared_memory.SharedMemory, dict[int, int]]:
+        """
+        Copy every page into one shared memory block for worker processes.
+        Returns the block and its page table (page number -> offset in the block);
+        the caller closes and unlinks the block when the workers are done.
+        """
+        table = {page_no: i * PAGE_SIZE for i, page_no in enumerate(sorted(self.pages))}
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(table) * PAGE_SIZE))
+        for page_no, off in table.items():
+            shm.buf[off:off + PAGE_SIZE] = self.pages[page_no][1]
+        return shm, table
+
+    @classmethod
+    def attach(cls, buf: memoryview, table: dict[int, int], segments: tuple = ()) -> "Mem":
+        """
+        Private memory on top of shared pages: reads see them, the first write to a page copies it.
+        segments are the (addr, size, flags) of the image segments (see segment_extents()); their
+        data become views into the shared pages, which share() laid out in page order.
+        """
+        mem = cls(0, None)
+        mem.base = {page_no: buf[off:off + PAGE_SIZE].toreadonly() for page_no, off in table.items()}
+        for addr, size, flags in segments:
+            off = table[addr >> PAGE_SHIFT] + (addr & PAGE_MASK) if size else 0
+            mem.segments.append(Segment(addr=addr, data=buf[off:off + size].toreadonly(), flags=flags))
+        return mem
+
+    def segment_extents(self) -> tuple:
+        """(addr, size, flags) of every image segment, the picklable part handed to attach()."""
+        return tuple((seg.addr, len(seg.data), seg.flags) for seg in self.segments)
+
+    def written_pages(self) -> dict[int, bytes]:
+        """Contents of every page this Mem wrote (on top of its shared base)."""
+        return {page_no: bytes(views[1]) for page_no, views in self.pages.items()}
+
+    def merge(self, written: dict[int, bytes], base: dict[int, memoryview]) -> None:
+        """
+        Apply pages another Mem wrote on top of `base`: only bytes that differ from
+        base are copied, so merging workers one after another in a fixed order is
+        deterministic and disjoint writes from different workers all survive.
+        """
+        zero_page = np.zeros(PAGE_SIZE, dtype=np.uint8)
+        for page_no in sorted(written):
+            new = np.frombuffer(written[page_no], dtype=np.uint8)
+            old = np.frombuffer(base[page_no], dtype=np.uint8) if page_no in base else zero_page
+            changed = new != old
+            if not changed.any():
+                continue
+            page = np.frombuffer(self._page(page_no)[1], dtype=np.uint8)
+            page[changed] = new[changed]
+            self.dirty.add(page_no)
+            addr = page_no << PAGE_SHIFT
+            for lo, hi, callback in self.watchers:
+                if addr < hi and addr + PAGE_SIZE > lo:
+                    callback(addr, PAGE_SIZE)
+
+    def watch(self, lo: int, hi: int, callback) -> None:
+        """Call callback(addr, bytes) whenever a write touches [lo, hi), e.g. stores into the text region."""
+        self.watchers.append((lo, hi, callback))
+    def start_stream(self, path: str, every: int) -> None:
+        """
+        Stream modified pages to `path` during the run: checkpoint(step) appends every
+        page dirtied since the last flush once `every` steps have passed. Read the
+        stream back with common.mem_image.replay_dump_stream().
+        """
+        self._stream = open_dump_stream(path)
+        self._stream_every = every
+        self._last_flush = 0
+
+    def checkpoint(self, step: int) -> None:
+        if self._stream is not None and step - self._last_flush >= self._stream_every:
+            self.flush_dirty(step)
+
+    def flush_dirty(self, step: int) -> None:
+        for page_no in sorted(self.dirty):
+            write_dump_record(self._stream, step, page_no << PAGE_SHIFT, self.pages[page_no][1])
+        self._stream.flush()
+        self.dirty.clear()
+        self._last_flush = step
+
     def dump_on_exit(self) -> None:
         try:
-            self.dump("memsim.hex")
-        except Exception:
-            print("oopsie")
-            pass
+            if self._stream is not None:
+                self.flush_dirty(self._last_flush + self._stream_every)
+                self._stream.close()
+            if self.dump_path is not None:
+                self.dump(self.dump_path, fmt=self.dump_fmt)
+        except Exception as exc:
+            _trace.error("dump failed: %s", exc)
     
     # CAN CHANGE THIS SHIT LATER IF WE WANT TO PRINT OUT MORE INFO
-    def dump(self, path: str = "memsim.hex") -> None:
+    def dump(self, path: str = "memsim.hex", fmt: str = "hex", dirty_only: bool = False) -> None:
         """
         Dump memory one 32-bit word per line.
         Groups consecutive bytes [addr, addr+1, addr+2, addr+3] into one word.
         Skips words that are entirely zero (uninitialized).
-        """
-        word_bases = {addr & ~0x3 for addr in self.memory.keys()}
 
+        fmt="bin" writes the pages as a binary image instead (common/mem_image.py),
+        which loads straight back into Mem. dirty_only limits the dump to pages
+        written since the program was loaded.
+        """
+        page_nos = sorted(self.dirty if dirty_only else self.pages)
+        if fmt == "bin":
+            write_image(path, segments_from_pages({p: self.pages[p][1] for p in page_nos}, PAGE_SHIFT))
+            return
+        zero_page = bytes(PAGE_SIZE)
         with open(path, "w", encoding="utf-8") as f:
-            for base in sorted(word_bases):
-                # collect 4 bytes for this word
-                b0 = self.memory.get(base + 0, 0) & 0xFF
-                b1 = self.memory.get(base + 1, 0) & 0xFF
-                b2 = self.memory.get(base + 2, 0) & 0xFF
-                b3 = self.memory.get(base + 3, 0) & 0xFF
-                if (b0 | b1 | b2 | b3) == 0:
-                    continue  # skip all-zero words
+            for page_no in page_nos:
+                raw = self.pages[page_no][1]
+                if raw == zero_page:
+                    continue
+                page_base = page_no << PAGE_SHIFT
+                if _NATIVE_LE:
+                    words = self.pages[page_no][4]
+                else:
+                    words = [int.from_bytes(raw[off:off + 4], "little") for off in range(0, PAGE_SIZE, 4)]
+                f.writelines(f"{page_base + 4 * i:#010x} {word:#010x}\n" for i, word in enumerate(words) if word)  # skip all-zero words
+
+    #dump into memsim.hex
+        #copy meminit.hex into memsim
 
-                word = b0 | (b1 << 8) | (b2 << 16) | (b3 << 24)
+class SharedMem:
+    """One thread block's scratchpad, addressed like global memory inside the shared window."""
+    def __init__(self) -> None:
+        self.data = bytearray(SHARED_SIZE)
 
-                f.write(f"{base:#010x} {word:#010x}\n")
+    def _off(self, addr: int, n: int) -> int:
+        off = addr - SHARED_BASE
+        if off < 0 or off + n > SHARED_SIZE:
+            raise IndexError(f"shared memory access {addr:#x}+{n} outside the {SHARED_SIZE:#x} byte window")
+        return off
 
-    #dump into memsim.hex
-        #copy meminit.hex into memsim
\ No newline at end of file
+    def read(self, addr: int, bytes: int) -> int:
+        off = self._off(addr, bytes)
+        return int.from_bytes(self.data[off:off + bytes], "little")
+
+    def write(self, addr: int, data: int, bytes_t: int) -> None:
+        off = self._off(addr, bytes_t)
+        self.data[off:off + bytes_t] = (data & ((1 << (8 * bytes_t)) - 1)).to_bytes(bytes_t, "little")
+
+    def read_block(self, addr: int, n: int) -> bytes:
+        off = self._off(addr, n)
+        return bytes(self.data[off:off + n])
+
+    def write_block(self, addr: int, data: bytes) -> None:
+        off = self._off(addr, len(data))
+        self.data[off:off + len(data)] = data
+
+class BlockMem:
+    """
+    What the warps of one thread block see: accesses inside the shared window go
+    to the block's scratchpad, everything else to global memory.
+    """
+    def __init__(self, mem: Mem, shared: SharedMem) -> None:
+        self.mem = mem
+        self.shared = shared
+
+    def read(self, addr: int, bytes: int) -> int:
+        return self.shared.read(addr, bytes) if is_shared(addr) else self.mem.read(addr, bytes)
+
+    def write(self, addr: int, data: int, bytes_t: int) -> None:
+        if is_shared(addr):
+            self.shared.write(addr, data, bytes_t)
+        else:
+            self.mem.write(addr, data, bytes_t)
+
+    def read_block(self, addr: int, n: int) -> bytes:
+        return self.shared.read_block(addr, n) if is_shared(addr) else self.mem.read_block(addr, n)
+
+    def write_block(self, addr: int, data: bytes) -> None:
+        if is_shared(addr):
+            self.shared.write_block(addr, data)
+        else:
+            self.mem.write_block(addr, data)
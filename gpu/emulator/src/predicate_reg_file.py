@@ -1,12 +1,27 @@
 from functools import singledispatchmethod
 
+import numpy as np
+
 from reg_file import *
 
+_PRED_TRUE = Bits(uint=1, length=1)
+_PRED_FALSE = Bits(uint=0, length=1)
+_PRED_BITS = (_PRED_FALSE, _PRED_TRUE)
+_LANES = np.arange(32, dtype=np.uint32)
+
 class Predicate_Reg_File(Reg_File):
+    """
+    One predicate bit per lane, packed into a single 32-bit int (bit i = lane i).
+
+    read()/write() still hand out 1-bit Bits per lane for the per-thread engine,
+    read_mask()/write_mask() convert to the bool[32] arrays of the warp-wide one.
+    """
     def __init__(self) -> None:
-        super().__init__(num_regs=32, num_bits_per_reg=1, init_value=1)
-        
-        
+        super().__init__(num_regs=32, num_bits_per_reg=1, init_value=1, storage=())
+        self.full = (1 << self.num_regs) - 1
+        self.lanes: int = self.full # every lane starts enabled
+
+
     @singledispatchmethod
     def read(self, addr):
         """
@@ -20,18 +35,11 @@ class Predicate_Reg_File(Reg_File):
 
     @read.register
     def _(self, addr: Bits) -> Bits:
-        return super().read(addr)
-    
+        return _PRED_BITS[(self.lanes >> addr.uint) & 1]
+
     @read.register
     def _(self, thread_id: int) -> Bits:
-        if thread_id > 31:
-            global_thread_id = thread_id
-            local_thread_id = self._get_local_thread_id_from(global_thread_id)
-        else:
-            local_thread_id = thread_id
-
-        addr = Bits(uint=local_thread_id, length=5)
-        return super().read(addr)
+        return _PRED_BITS[(self.lanes >> (thread_id % 32)) & 1]
 
     @singledispatchmethod
     def write(self, addr, data) -> None:
@@ -45,9 +53,27 @@ class Predicate_Reg_File(Reg_File):
 
     @write.register
     def _(self, thread_id: int, data: Bits) -> None:
-        addr = Bits(uint=(thread_id % 32), length=5) #Note: predicate RF must be able to write to x0!
-        self.arr[addr.uint] = data
+        bit = 1 << (thread_id % 32) #Note: predicate RF must be able to write to x0!
+        self.lanes = self.lanes | bit if data.uint else self.lanes & ~bit
 
     def write_all(self, data) -> None:
-        for i in range(self.num_regs):
-            self.write(i, data)
\ No newline at end of file
+        self.lanes = self.full if data.uint else 0
+
+    def read_negated(self) -> int:
+        return self.lanes ^ self.full
+
+    def popcount(self) -> int:
+        return bin(self.lanes).count("1")
+
+    def any(self) -> bool:
+        return self.lanes != 0
+
+    def all(self) -> bool:
+        return self.lanes == self.full
+
+    def read_mask(self) -> np.ndarray:
+        """Predicate of every lane as a bool[32] array (used by the warp-wide engine)."""
+        return ((self.lanes >> _LANES) & 1).astype(bool)
+
+    def write_mask(self, mask: np.ndarray) -> None:
+        self.lanes = int(np.packbits(mask, bitorder="little").view("<u4")[0])
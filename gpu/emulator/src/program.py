@@ -0,0 +1,70 @@
+from bitstring import Bits
+from typing import Optional
+from instr import *
+from mem import *
+
+# decode() falls back to the instruction it was called on, so decode from a NOP
+_NOP = I_Instr_0(op=I_Op_0.ADDI, rd=Bits(uint=0, length=5), rs1=Bits(uint=0, length=5), imm=Bits(int=0, length=12))
+
+class Program:
+    """
+    Decode-once program image shared by every warp running the kernel.
+
+    Text lines are cleaned up once when the kernel is loaded and each PC is decoded
+    the first time any warp fetches it; every later fetch (from any warp) gets the
+    same Instr object back. Instrs are never modified by eval, jumps return their
+    target pc instead.
+
+    If mem is given, stores that hit the text region invalidate the decoded entries
+    they overlap; the next fetch of those PCs decodes the word now in memory.
+
+    Binary images (common/mem_image.py) have no text lines, their text segments are
+    fetched from mem, so mem is required for them.
+    """
+    def __init__(self, input_file: str, fmt: str = "bin", mem: Mem = None) -> None:
+        self.fmt = fmt
+        self.mem = mem
+        self.decoded: dict[int, Instr] = {}
+        if is_image(input_file):
+            if mem is None:
+                raise ValueError("Program images are fetched from memory, mem is required")
+            text = [seg for seg in mem.segments if seg.flags & SEG_TEXT]
+            self.text_end = max((seg.end for seg in text), default=0)
+            self.lines: list[Optional[str]] = [None] * ((self.text_end + 3) // 4)
+        else:
+            with open(input_file, "r") as f:
+                self.lines = [self._clean(line) for line in f]
+            self.text_end = 4 * len(self.lines)
+        if mem is not None:
+            mem.watch(0, self.text_end, self.invalidate)
+
+    @staticmethod
+    def _clean(line: str) -> str:
+        line = line.strip()
+        for marker in ("//", "#"):
+            idx = line.find(marker)
+            if idx != -1:
+                line = line[:idx]
+            line = line.strip()
+        return line
+
+    def _word(self, pc: int) -> Bits:
+        line = self.lines[int(pc / 4)]
+        if line is None: # overwritten by a store, fetch what is in memory now
+            return Bits(uint=self.mem.read(pc & ~0x3, 4), length=32)
+        if self.fmt == "hex":
+            return Bits(hex=line, length=32)
+        return Bits(bin=line, length=32)
+
+    def fetch(self, pc: int) -> Instr:
+        instr = self.decoded.get(pc)
+        if instr is None:
+            instr = _NOP.decode(instruction=self._word(pc), pc=Bits(int=pc, length=32))
+            self.decoded[pc] = instr
+        return instr
+
+    def invalidate(self, addr: int, bytes_t: int) -> None:
+        for base in range(addr & ~0x3, min(addr + bytes_t, self.text_end), 4):
+            self.lines[base // 4] = None
+            for pc in range(base, base + 4): # unaligned PCs decode the same word
+                self.decoded.pop(pc, None)
@@ -1,18 +1,50 @@
-from bitstring import Bits 
+from array import array
+import math
+import struct
+from typing import Union
+from bitstring import Bits
+
+# Registers hold raw 32-bit patterns as plain ints, these reinterpret them
+def to_signed(val: int) -> int:
+    return val - 0x1_0000_0000 if val & 0x8000_0000 else val
+
+def to_float(val: int) -> float:
+    return struct.unpack(">f", val.to_bytes(4, "big"))[0]
+
+def from_float(val: float) -> int:
+    try:
+        return int.from_bytes(struct.pack(">f", val), "big")
+    except OverflowError: # too large for float32, round to infinity like the hardware would
+        return int.from_bytes(struct.pack(">f", math.copysign(math.inf, val)), "big")
+
+def byteswap32(val: int) -> int:
+    return int.from_bytes(val.to_bytes(4, "big"), "little")
 
 class Reg_File:
-    def __init__(self, num_regs: int = 64, num_bits_per_reg: int = 32, init_value: int=0) -> None:
-        self.arr: list[Bits] = [Bits(uint=init_value, length=num_bits_per_reg) for i in range(num_regs)]
+    """
+    Register file of one thread, stored as unsigned ints in one contiguous buffer.
+
+    storage: optional buffer to live in instead of allocating one, e.g. a memoryview
+             of this lane's row in the warp's register matrix (see Warp)
+    """
+    def __init__(self, num_regs: int = 64, num_bits_per_reg: int = 32, init_value: int=0, storage=None) -> None:
+        self.arr = storage if storage is not None else array("I", [init_value] * num_regs)
         self.num_regs = num_regs
         self.num_bits_per_reg = num_bits_per_reg
-        
-    def read(self, rd: Bits) -> Bits:
-        return self.arr[rd.uint]
+        self.mask = (1 << num_bits_per_reg) - 1
+
+    def read(self, rd: Union[Bits, int]) -> int:
+        return self.arr[rd if type(rd) is int else rd.uint]
+
+    def read_bits(self, rd: Union[Bits, int]) -> Bits:
+        """Only for debug printing, everything else works on the int from read()"""
+        return Bits(uint=self.read(rd), length=self.num_bits_per_reg)
 
-    def write(self, rd: Bits, val: Bits) -> None:
-        if(rd.int == 0):
+    def write(self, rd: Union[Bits, int], val: Union[Bits, int]) -> None:
+        idx = rd if type(rd) is int else rd.uint
+        if(idx == 0):
             return
-        self.arr[rd.uint] = val
+        self.arr[idx] = (val if type(val) is int else val.uint) & self.mask
 
     @staticmethod
     def _get_local_thread_id_from(global_thread_id: int) -> int:
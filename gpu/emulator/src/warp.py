@@ -2,30 +2,118 @@ from reg_file import *
 from instr import *
 from bitstring import Bits
 from mem import *
+import numpy as np
+
+from common.coalesce import lane_mask
+from common.simt_stack import SIMTStack, SimdEfficiency, popcount
+
+_PRED_ON = Bits(uint=1, length=1)
+
+# per-PC active lanes of every executed warp instruction, reported per SM by run_blocks
+simd_efficiency = SimdEfficiency()
 
 class Warp:
-    def __init__(self, warp_id: int, pc: Bits, csr: dict) -> None:
-        self.reg_files = [Reg_File(num_regs=64, num_bits_per_reg=32) for i in range(32)]
+    """
+    Divergence is handled by a SIMT reconvergence stack (common/simt_stack.py): the
+    warp runs the split on top of it, a jump sends each active lane to its own
+    target, and splits merge again where their PCs meet.
+
+    Predication still skips one instruction: a lane whose predicate is off does
+    not execute and gets its predicate re-enabled.
+    """
+    def __init__(self, warp_id: int, pc: Bits, csr: dict, simd: bool = False) -> None:
+        self.simd = simd
+        # one row per lane, one column per register; x0 column is never written
+        self.regs = np.zeros((32, 64), dtype=np.uint32)
+        self.lanes = np.array([tid % 32 for tid in csr["tid"]], dtype=np.intp)
+        # per-lane register files are views of the same rows, both engines see the same state
+        self.reg_files = [Reg_File(num_regs=64, num_bits_per_reg=32, storage=memoryview(self.regs[i])) for i in range(32)]
         self.pc = pc
         self.csr_file = csr # contains thread IDs and block IDs
         self.halt_status = False
         self.warp_id = warp_id
+        self.lane_mask = lane_mask([lane in self.lanes for lane in range(32)])
+        self.width = popcount(self.lane_mask)
+        self.stack = SIMTStack(pc.int, self.lane_mask)
+
+    def _advance(self, next_pcs: dict) -> "Warp":
+        self.stack.advance(next_pcs)
+        if self.stack.empty:
+            self.halt_status = True
+        else:
+            self.pc = Bits(int=self.stack.pc, length=32)
+        return self
 
-    def eval(self, instr: Instr, pred_reg_file: Predicate_Reg_File, mem: Mem, csr) -> Bits: #eventually change thread_id to Bits/csr_file
-        for global_thread_id in self.csr_file["tid"]: 
+    def eval(self, instr: Instr, pred_reg_file: Predicate_Reg_File, mem: Mem, csr) -> "Warp":
+        if self.simd:
+            return self.eval_simd(instr=instr, pred_reg_file=pred_reg_file, mem=mem, csr=csr)
+        pc, split = self.stack.pc, self.stack.mask
+        fall = pc + 4
+        active = split & pred_reg_file.lanes
+        simd_efficiency.record(pc, active, self.width)
+        match instr.op:
+            case H_Op.HALT:
+                if active: # the split exits, lanes still in other splits go on
+                    return self._advance({})
+                pred_reg_file.lanes |= split
+                return self._advance({fall: split})
+            case I_Op_2.JALR | P_Op.JPNZ | J_Op.JAL: # every active lane jumps to its own target
+                next_pcs = {fall: split & ~active}
+                for global_thread_id in self.csr_file["tid"]:
+                    local_thread_id = global_thread_id % 32
+                    bit = 1 << local_thread_id
+                    if active & bit:
+                        target = instr.eval(global_thread_id=local_thread_id, t_reg=self.reg_files[local_thread_id], mem=mem, pred_reg_file=pred_reg_file, csr=csr).int
+                        next_pcs[target] = next_pcs.get(target, 0) | bit
+                    elif split & bit:
+                        pred_reg_file.write(global_thread_id, _PRED_ON)
+                return self._advance(next_pcs)
+        if active:
+            record_access(instr, self.regs, _lane_bools(active))
+        for global_thread_id in self.csr_file["tid"]:
             local_thread_id = global_thread_id % 32
+            if not (split >> local_thread_id) & 1:
+                continue
             if pred_reg_file.read(local_thread_id).uint == 1:
-                match instr.op:
-                    case I_Op_2.JALR | P_Op.JPNZ | J_Op.JAL:
-                        instr.eval(global_thread_id=local_thread_id, t_reg=self.reg_files[local_thread_id], mem=mem, pred_reg_file=pred_reg_file, csr=csr)
-                        self.pc = instr.pc
-                        return self
-                    case H_Op.HALT:
-                        self.halt_status = True
-                        return self
-                    case _:
-                        instr.eval(global_thread_id=local_thread_id, t_reg=self.reg_files[local_thread_id], mem=mem, pred_reg_file=pred_reg_file, csr=csr)
+                instr.eval(global_thread_id=local_thread_id, t_reg=self.reg_files[local_thread_id], mem=mem, pred_reg_file=pred_reg_file, csr=csr)
             else:
-                pred_reg_file.write(global_thread_id, Bits(uint=1, length=1)) #assume predication only skips one instruction
-        self.pc = Bits(int=self.pc.int + 4, length=32) #potential problem of jumps incrementing by an extra 4? 
-        return self
\ No newline at end of file
+                pred_reg_file.write(global_thread_id, _PRED_ON) #assume predication only skips one instruction
+        return self._advance({fall: split})
+
+    def eval_simd(self, instr: Instr, pred_reg_file: Predicate_Reg_File, mem: Mem, csr) -> "Warp":
+        """
+        Warp-wide version of eval(): all active lanes of the split execute the
+        instruction at once on the register matrix. Produces the same
+        architectural state as eval().
+        """
+        pc, split = self.stack.pc, self.stack.mask
+        fall = pc + 4
+        active = split & pred_reg_file.lanes
+        simd_efficiency.record(pc, active, self.width)
+        match instr.op:
+            case H_Op.HALT:
+                if active:
+                    return self._advance({})
+                pred_reg_file.lanes |= split
+                return self._advance({fall: split})
+            case I_Op_2.JALR | P_Op.JPNZ | J_Op.JAL: # targets differ per lane, go lane by lane
+                pred_reg_file.lanes |= split & ~active
+                next_pcs = {fall: split & ~active}
+                for lane in self.lanes:
+                    bit = 1 << int(lane)
+                    if active & bit:
+                        one = np.zeros(32, dtype=bool)
+                        one[lane] = True
+                        target = instr.eval_warp(regs=self.regs, mask=one, lanes=self.lanes, mem=mem, pred_reg_file=pred_reg_file, csr=csr).int
+                        next_pcs[target] = next_pcs.get(target, 0) | bit
+                return self._advance(next_pcs)
+        if active:
+            instr.eval_warp(regs=self.regs, mask=_lane_bools(active), lanes=self.lanes, mem=mem, pred_reg_file=pred_reg_file, csr=csr)
+        pred_reg_file.lanes |= split & ~active #assume predication only skips one instruction
+        return self._advance({fall: split})
+
+
+_LANE_BITS = np.arange(32, dtype=np.uint64)
+
+def _lane_bools(mask: int) -> np.ndarray:
+    return ((np.uint64(mask) >> _LANE_BITS) & np.uint64(1)).astype(bool)
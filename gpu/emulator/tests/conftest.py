@@ -0,0 +1,22 @@
+# conftest.py — the emulator's sources come first, ahead of the simulator's same-named modules
+
+import sys
+from pathlib import Path
+
+src_dir = Path(__file__).resolve().parents[1] / "src"
+
+
+def pytest_collect_file(file_path, parent):
+    """
+    Runs before the emulator test files are imported (not when this conftest is
+    loaded, which can be before the simulator tests are collected). After
+    gpu/tests, predicate_reg_file may already be the simulator's, and run from
+    gpu/, emulator and mem are the directories; forget those so src/ is found.
+    """
+    if sys.path[0] == str(src_dir):
+        return
+    sys.path.insert(0, str(src_dir))
+    for name in [p.stem for p in src_dir.glob("*.py")] + ["mem"]:
+        module = sys.modules.get(name)
+        if module is not None and Path(getattr(module, "__file__", None) or "").parent != src_dir:
+            del sys.modules[name]
@@ -0,0 +1,68 @@
+# grid_test.py — multi-SM grids started from a binary image
+
+import gc
+import sys
+from pathlib import Path
+
+src_dir = Path(__file__).resolve().parents[1] / "src"
+if str(src_dir) not in sys.path:
+    sys.path.insert(0, str(src_dir))
+
+import emulator
+import instr
+from mem import Mem, PAGE_SIZE
+from common.coalesce import Coalescer
+from common.mem_image import Segment, write_image, SEG_TEXT, SEG_DATA
+
+# csrr x3, x1000; x22 = 2000 + 4*x3; sw x3*x3 -> [x22]; halt
+KERNEL = [0x807D01D8, 0x80100710, 0x80706A0D, 0x80FA0B51, 0x80A2CB00, 0x80186B82, 0x80BAC030, 0xBFFFFFFF]
+OUT, THREADS = 2000, 512
+
+
+def image(tmp_path):
+    path = tmp_path / "kern.img"
+    text = b"".join(w.to_bytes(4, "little") for w in KERNEL)
+    write_image(path, [Segment(addr=0, data=text, flags=SEG_TEXT), Segment(addr=0x8000, data=bytes(64), flags=SEG_DATA)])
+    return str(path)
+
+
+def load(path):
+    mem = Mem(0, path)
+    mem.dump_path = None
+    return mem
+
+
+def test_two_batch_grid_matches_one_process(tmp_path, monkeypatch):
+    img = image(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["emulator.py", img, str(THREADS), "3", "0", "bin", "scalar"])
+    batches = emulator.partition(THREADS, 3)
+    assert len(batches) == 2
+
+    pooled = load(img)
+    instr.coalescer.per_pc.clear()
+    emulator.run_grid(img, pooled, batches, sms=2)
+    pooled_stats = instr.coalescer.report()  # merged from both workers
+
+    # the same batches one after another in this process, through the same attach/merge path
+    single = load(img)
+    single_stats = Coalescer(segment=128, min_segment=32)
+    shm, table = single.share()
+    base = {page_no: shm.buf[off:off + PAGE_SIZE] for page_no, off in table.items()}
+    emulator._init_sm(shm.name, table, single.segment_extents(), img)
+    for batch in batches:
+        written, (coalesced, _) = emulator._run_sm(batch)
+        single.merge(written, base)
+        single_stats.merge(coalesced)
+    for view in base.values():
+        view.release()
+    worker_shm = emulator._sm_state.pop("shm")
+    gc.collect()  # attached Mems hold views into the block until their cycles are collected
+    worker_shm.close()
+    shm.close()
+    shm.unlink()
+
+    out = pooled.read_block(OUT, 4 * THREADS)
+    assert out == single.read_block(OUT, 4 * THREADS)
+    assert [int.from_bytes(out[4 * t:4 * t + 4], "little") for t in (0, 3, THREADS - 1)] == [0, 9, (THREADS - 1) ** 2]
+    assert pooled_stats == single_stats.report()
+    assert pooled_stats[24]["accesses"] == 3 * THREADS // 32  # the store, once per warp of every block
@@ -0,0 +1,53 @@
+# stats_test.py — per-PC memory access statistics from the scalar and the warp-wide engine
+
+import sys
+from pathlib import Path
+
+import pytest
+
+src_dir = Path(__file__).resolve().parents[1] / "src"
+if str(src_dir) not in sys.path:
+    sys.path.insert(0, str(src_dir))
+
+import emulator
+import instr
+from mem import Mem
+from program import Program
+
+# each thread stores to shared memory at 4*tid (pc 24), loads it back (pc 28), stores to
+# global 2048+4*tid (pc 40), then stores/loads shared memory at 32*tid (pcs 56, 60): 8-way conflicts
+SMEM_KERNEL = [0x807D01D8, 0x80100710, 0x80706A0D, 0x800E0AD4, 0x80A2AB00, 0x80F06290, 0x802AC030, 0x8022C4A0,
+               0x81000551, 0x80A14500, 0x80494030, 0x80280310, 0x8030638D, 0x803AA400, 0x80190030, 0x800105A0,
+               0x80594230, 0xBFFFFFFF]
+THREADS = 64
+
+
+def run(tmp_path, monkeypatch, engine):
+    path = tmp_path / "smem.hex"
+    path.write_text("".join(f"{w:08X}\n" for w in SMEM_KERNEL))
+    monkeypatch.setattr(sys, "argv", ["emulator.py", str(path), str(THREADS), "1", "0", "hex", engine])
+    mem = Mem(0, str(path))
+    mem.dump_path = None
+    instr.coalescer.per_pc.clear()
+    instr.bank_conflicts.per_pc.clear()
+    emulator.run_blocks(Program(str(path), fmt="hex", mem=mem), mem, emulator.tbs(THREADS, 1))
+    return instr.coalescer.report(), instr.bank_conflicts.report()
+
+
+@pytest.mark.parametrize("engine", ["scalar", "simd"])
+def test_bank_conflicts_per_pc(tmp_path, monkeypatch, engine):
+    _, report = run(tmp_path, monkeypatch, engine)
+    assert list(report) == [24, 28, 56, 60]
+    assert report[24]["accesses"] == 2 and report[24]["max_degree"] == 1
+    assert report[56]["passes"] == 16 and report[56]["hist"] == {8: 2}
+
+
+@pytest.mark.parametrize("engine", ["scalar", "simd"])
+def test_coalescing_per_pc(tmp_path, monkeypatch, engine):
+    report, _ = run(tmp_path, monkeypatch, engine)
+    assert list(report) == [40, 64]
+    assert report[40]["accesses"] == 2 and report[40]["hist"] == {1: 2} and report[40]["efficiency"] == 1.0
+
+
+def test_scalar_matches_simd(tmp_path, monkeypatch):
+    assert run(tmp_path, monkeypatch, "scalar") == run(tmp_path, monkeypatch, "simd")
@@ -1,20 +1,22 @@
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from collections import deque
 from typing import NamedTuple
 from bitstring import Bits
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from collections import deque
 from bitstring import Bits 
 from enum import Enum
 from pathlib import Path
 import sys
-parent = Path(__file__).resolve().parents[2]
-sys.path.append(str(parent))
-from common.custom_enums_multi import Op
+_SIM_ROOT = Path(__file__).resolve().parent
+for _p in (_SIM_ROOT, _SIM_ROOT.parent):  # simulator modules, gpu/ for common
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from custom_enums_multi import Op
 
 '''FROM DCACHE'''
 # --- Cache Configuration ---
@@ -51,7 +53,14 @@ class Addr:
     full_addr: int
     block_addr_val: int     # The block address of the request
 
-    def __init__(self, addr: int):
+    def __init__(self, addr: int, num_banks: int = NUM_BANKS, sets_per_bank: int = NUM_SETS_PER_BANK,
+                 block_words: int = BLOCK_SIZE_WORDS):
+        # the geometry defaults to the constants above, a D$ with a different size passes its own
+        block_off_len = (block_words - 1).bit_length()
+        bank_id_len = (num_banks - 1).bit_length()
+        set_index_len = (sets_per_bank - 1).bit_length()
+        tag_len = 32 - (set_index_len + bank_id_len + block_off_len + BYTE_OFF_BIT_LEN)
+
         self.full_addr = addr
         
         # Gets the byte offset (which byte within a word)
@@ -60,22 +69,22 @@ class Addr:
         addr_temp >>= BYTE_OFF_BIT_LEN  # Removes the lowest BYTE_OFF_BIT_LEN bits for further processing
         
         # Gets the block offset (which word within a cache line)
-        self.block_offset = addr_temp & ((1 << BLOCK_OFF_BIT_LEN) - 1)  # Gets the lowest BLOCK_OFF_BIT_LEN bits
-        addr_temp >>= BLOCK_OFF_BIT_LEN # Removes the lowest BLOCK_OFF_BIT_LEN bits
+        self.block_offset = addr_temp & ((1 << block_off_len) - 1)  # Gets the lowest block_off_len bits
+        addr_temp >>= block_off_len # Removes the lowest block_off_len bits
         
         # Gets the bank id (which bank to access into)
-        self.bank_id = addr_temp & ((1 << BANK_ID_BIT_LEN) - 1) #
-        addr_temp >>= BANK_ID_BIT_LEN
+        self.bank_id = addr_temp & ((1 << bank_id_len) - 1) #
+        addr_temp >>= bank_id_len
         
         # Gets the set index (which set to access within the bank)
-        self.set_index = addr_temp & ((1 << SET_INDEX_BIT_LEN) - 1) #
-        addr_temp >>= SET_INDEX_BIT_LEN
+        self.set_index = addr_temp & ((1 << set_index_len) - 1) #
+        addr_temp >>= set_index_len
         
         # Gets the tag
-        self.tag = addr_temp & ((1 << TAG_BIT_LEN) - 1)
+        self.tag = addr_temp & ((1 << tag_len) - 1)
         
         # Address of the start of the block (includes bank index, set index, and the tag, removes the byte and block offset)
-        self.block_addr_val = self.full_addr >> (BYTE_OFF_BIT_LEN + BLOCK_OFF_BIT_LEN) 
+        self.block_addr_val = self.full_addr >> (BYTE_OFF_BIT_LEN + block_off_len) 
 
 @dataclass
 class dCacheRequest:
@@ -85,6 +94,8 @@ class dCacheRequest:
     size: str # 'word' 'half' 'btye'
     store_value: Optional[int] = None    # The values that want to be written to cache
     halt: bool = False
+    uuid: Optional[int] = None  # echoed in the dMemResponse
+    lanes: Optional[List[Tuple[int, int, Optional[int]]]] = None  # coalesced segment: (lane, addr, store value) per lane
     
 
     def __post_init__(self):
@@ -114,6 +125,7 @@ class MemRequest:
     data: int 
     rw_mode: str
     remaining: int = 0
+    ready_cycle: int = 0 # cycle the response is due
     
 @dataclass
 class dCacheFrame:
@@ -136,6 +148,7 @@ class MSHREntry:
     write_block: List[int] = field(default_factory=lambda: [0] * BLOCK_SIZE_WORDS)      # The data to be written
     original_request: dCacheRequest = None # CHECK THIS
     cycles_to_ready: int = 0    # Internal timer for each entry in the buffer
+    waiting: List[dCacheRequest] = field(default_factory=list)  # every request merged into this miss, in arrival order
 
 
 @dataclass
@@ -186,72 +199,34 @@ class WarpGroup:
 @dataclass
 class Instruction:
     pc: Bits
-    intended_FU: str 
-    warp_id: int
-    warp_group_id: int
-    rs1: Bits
-    rs2: Bits
-    rd: Bits
-    opcode: Op
-    predicate: list[Bits] # list of Bits instances, each of length 1
-    issued_cycle: Optional[int] = None
-    stage_entry: Optional[Dict[str, int]] = field(default_factory=dict)   # stage -> first cycle seen
-    stage_exit:  Optional[Dict[str, int]] = field(default_factory=dict)   # stage -> last cycle completed
-    fu_entries:  Optional[List[Dict]]     = field(default_factory=list)   # [{fu:"ALU", enter: c, exit: c}, ...]
-    wb_cycle: Optional[int] = None
-    target_bank: int = None
-    rdat1: list[Bits] = None
-    rdat2: list[Bits] = None
-    wdat: list[Bits] = None
-
-    def mark_stage_enter(self, stage: str, cycle: int):
-        self.stage_entry.setdefault(stage, cycle)
-
-    def mark_stage_exit(self, stage: str, cycle: int):
-        self.stage_exit[stage] = cycle
-
-    def mark_fu_enter(self, fu: str, cycle: int):
-        self.fu_entries.append({"fu": fu, "enter": cycle, "exit": None})
+    iid: Optional[int] = None
+    intended_FSU: Optional[str] = None
+    warp: Optional[int] = None
+    warpGroup: Optional[int] = None
 
-    def mark_fu_exit(self, fu: str, cycle: int):
-        for e in reversed(self.fu_entries):
-            if e["fu"] == fu and e["exit"] is None:
-                e["exit"] = cycle
-                return
-
-    def mark_writeback(self, cycle: int):
-        self.wb_cycle = cycle
-
-@dataclass
-class Instruction:
-    # ----- required (no defaults) -----
-    pc: Bits
-    intended_FU: str 
-    warp_id: int
-    warp_group_id: int
+    # ----- fields populated by decode ----
+    opcode: Optional[Op] = None
+    rs1: Optional[int] = None
+    rs2: Optional[int] = None
+    rd: Optional[int] = None
+    imm: Optional[Bits] = None
+    pred: int = 0xFFFF_FFFF   # lane mask, bit i = thread i
+    type: Optional[int] = None                       # DecodeType
 
     # this is for instruction data memory responses, populated by the MemController
     packet: Optional[Bits] = None
 
-    # ----- fields populated by decode ----
-    rs1: Bits
-    rs2: Bits
-    rd: Bits
-    opcode: Op
-    imm: Bits 
-
     rdat1: list[Bits] = field(default_factory=list)
     rdat2: list[Bits] = field(default_factory=list)
     wdat: list[Bits] = field(default_factory=list)
 
-    # ----- optional / with defaults (must come after ALL non-defaults) -----
-    predicate: list[Bits] = field(default_factory=list)   # list of 1-bit Bits
-    stage_entry: Dict[str, int] = field(default_factory=dict)
-    stage_exit:  Dict[str, int] = field(default_factory=dict)
-    fu_entries:  List[Dict]     = field(default_factory=list)
+    issued_cycle: Optional[int] = None
+    stage_entry: Dict[str, int] = field(default_factory=dict)   # stage -> first cycle seen
+    stage_exit:  Dict[str, int] = field(default_factory=dict)   # stage -> last cycle completed
+    fu_entries:  List[Dict]     = field(default_factory=list)   # [{fu:"ALU", enter: c, exit: c}, ...]
     wb_cycle: Optional[int] = None
-    target_bank: int = None 
-    
+    target_bank: int = None
+
     def mark_stage_enter(self, stage: str, cycle: int):
         self.stage_entry.setdefault(stage, cycle)
 
@@ -275,18 +250,25 @@ class ForwardingIF:
     payload: Optional[Any] = None
     wait: bool = False
     name: str = field(default="BackwardIF", repr=False)
+    on_change: Optional[Callable[[], None]] = field(default=None, repr=False, compare=False) # set by EventKernel.connect()
 
     def push(self, data: Any) -> None:
         self.payload = data
         self.wait = False
+        if self.on_change is not None:
+            self.on_change()
     
     def pop(self) -> Optional[Any]:
         data = self.payload
         self.payload = None
+        if self.on_change is not None:
+            self.on_change()
         return data
     
     def set_wait(self, flag: bool) -> None:
         self.wait = bool(flag)
+        if self.on_change is not None:
+            self.on_change()
 
     def __repr__(self) -> str:
         return (f"<{self.name} wait={self.wait} "
@@ -299,6 +281,7 @@ class LatchIF:
     read: bool = False
     name: str = field(default="LatchIF", repr=False)
     forward_if: Optional[ForwardingIF] = None
+    on_change: Optional[Callable[[], None]] = field(default=None, repr=False, compare=False) # set by EventKernel.connect()
 
     def ready_for_push(self) -> bool:
         if self.valid:
@@ -312,11 +295,15 @@ class LatchIF:
             return False
         self.payload = data
         self.valid = True
+        if self.on_change is not None:
+            self.on_change()
         return True
     
     def force_push(self, data: Any) -> None: # will most likely need a forceful push for squashing
         self.payload = data
         self.valid = True
+        if self.on_change is not None:
+            self.on_change()
 
     def snoop(self) -> Optional[Any]: # may need this if we want to see the data without clearing the data
         return self.payload if self.valid else None
@@ -327,11 +314,15 @@ class LatchIF:
         data = self.payload
         self.payload = None
         self.valid = False
+        if self.on_change is not None:
+            self.on_change()
         return data
     
     def clear_all(self) -> None:
         self.payload = None
         self.valid = False
+        if self.on_change is not None:
+            self.on_change()
     
     def __repr__(self) -> str: # idk if we need this or not
         return (f"<{self.name} valid={self.valid} wait={self.wait} "
@@ -360,8 +351,17 @@ class Stage:
         # default computation, subclassess will override this
         return input_data
 
+    def tick(self, cycle: int) -> Optional[int]:
+        """
+        Run this stage for `cycle` and return the next cycle it has work of its own,
+        or None to sleep until one of its latches changes (see event_kernel.py).
+        The default never sleeps; subclasses that can tell when they are idle override it.
+        """
+        self.compute(None)
+        return cycle + 1
+
 # helper function for dumping memory
 def dump_bytes(mem, base, n=4):
     for i in range(n):
         addr = base + i
-        print(f"{addr:#06x}: {mem.memory.get(addr, 0):#04x}")
+        print(f"{addr:#06x}: {mem.read_block(addr, 1)[0]:#04x}")
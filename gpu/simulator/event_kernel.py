@@ -0,0 +1,107 @@
+"""
+Event-driven simulation kernel for the cycle simulator.
+
+Components (Stage subclasses, the MemController, ...) are ticked in the order
+they were added, but only in cycles where they have work. tick(cycle) returns
+the next cycle the component needs on its own account (a countdown finishing,
+a queue it still has to drain), or None to sleep until one of its latches
+changes. Latches and forwarding interfaces registered with connect() wake
+their producer and consumer whenever they are pushed, popped or change wait.
+
+Wakeups live in a heap of (cycle, tick order). When nothing is scheduled
+before cycle N, global time jumps straight to N, so a RAM_LATENCY_CYCLES miss
+costs one tick instead of two hundred.
+
+Cycle counts are identical to ticking every component every cycle
+(run_stepped()) as long as a tick that the component would have slept
+through does nothing except advance its own cycle counter.
+"""
+import heapq
+from typing import Any, Callable, Optional
+
+class EventKernel:
+    def __init__(self) -> None:
+        self.cycle = 0
+        self.components: list[Any] = []
+        self.ticks = 0  # component ticks actually run, for comparing against cycles * components
+        self._order: dict[int, int] = {}  # id(component) -> tick order
+        self._heap: list[tuple[int, int]] = []  # (cycle, tick order)
+        self._queued: set[tuple[int, int]] = set()
+        self._current = -1  # tick order of the component being ticked, -1 outside of a tick
+        self._started = False
+
+    def add(self, component: Any) -> Any:
+        self._order[id(component)] = len(self.components)
+        self.components.append(component)
+        return component
+
+    def connect(self, channel: Any, *components: Any) -> None:
+        """Wake `components` (usually producer and consumer) whenever `channel` (LatchIF/ForwardingIF) changes."""
+        orders = [self._order[id(c)] for c in components]
+        def wake_all() -> None:
+            for order in orders:
+                self._schedule(order, self.cycle)
+        channel.on_change = wake_all
+
+    def wake(self, component: Any, cycle: Optional[int] = None) -> None:
+        self._schedule(self._order[id(component)], self.cycle if cycle is None else cycle)
+
+    def _schedule(self, order: int, cycle: int) -> None:
+        # a component that already ran this cycle sees the change next cycle, same as when stepping
+        if cycle <= self.cycle and order <= self._current:
+            cycle = self.cycle + 1
+        cycle = max(cycle, self.cycle)
+        key = (cycle, order)
+        if key not in self._queued:
+            self._queued.add(key)
+            heapq.heappush(self._heap, key)
+
+    def run(self, until: Optional[Callable[[], bool]] = None, max_cycles: Optional[int] = None) -> int:
+        """
+        Run until `until()` holds at the end of a cycle, every component sleeps, or
+        max_cycles is reached. Returns the number of cycles simulated.
+        """
+        if not self._started:
+            self._started = True
+            for order in range(len(self.components)):
+                self._schedule(order, self.cycle)
+
+        heap = self._heap
+        while heap:
+            cycle, order = heap[0]
+            if max_cycles is not None and cycle >= max_cycles:
+                self.cycle = max_cycles
+                return self.cycle
+            heapq.heappop(heap)
+            self._queued.discard((cycle, order))
+
+            self.cycle = cycle
+            self._current = order
+            nxt = self.components[order].tick(cycle)
+            self._current = -1
+            self.ticks += 1
+            if nxt is not None:
+                self._schedule(order, nxt)
+
+            # end of this cycle: nothing else is due before the next one
+            if until is not None and (not heap or heap[0][0] > cycle) and until():
+                self.cycle = cycle + 1
+                return self.cycle
+
+        # everything is asleep, stepping would spin idle until max_cycles
+        if max_cycles is not None:
+            self.cycle = max_cycles
+        else:
+            self.cycle += 1
+        return self.cycle
+
+    def run_stepped(self, until: Optional[Callable[[], bool]] = None, max_cycles: Optional[int] = None) -> int:
+        """Reference loop: tick every component every cycle. Same arguments and result as run()."""
+        while max_cycles is None or self.cycle < max_cycles:
+            for component in self.components:
+                component.tick(self.cycle)
+                self.ticks += 1
+            self.cycle += 1
+            if until is not None and until():
+                break
+        return self.cycle
@@ -1,4 +1,301 @@
+"""
+SM pipeline built from a declarative config.
+
+A config names the stages (a type from STAGE_TYPES plus constructor options),
+the LatchIF edges between their ports, the ForwardingIF side channels and the
+cache geometry:
+
+    "stages":     [{"name": "icache", "type": "ICacheStage", "cache": "icache"}, ...]
+    "latches":    [{"name": "icache_decode", "from": "icache.ahead_latch", "to": "decode.behind_latch"}, ...]
+    "forwarding": [{"name": "ICache_Scheduler", "from": "icache", "to": ["scheduler"]}, ...]
+    "caches":     {"icache": {"cache_size": 32768, "block_size": 64, "associativity": 4}}
+
+Ports are the stage constructor's latch parameters. Required ports left out of
+the config get an unconnected latch. Shared resources are handed to any stage
+whose constructor asks for them by name (mem_backend, prf, scoreboard, timeline,
+num_warps, start_pc).
+
+Stages are ticked in reverse-topological order of the latch edges, so every
+latch behaves like a pipeline register. Edges that close a loop (responses
+flowing back upstream) must be marked "feedback": true; they are left out of
+the ordering.
+
+DCacheStage, CoalescerStage and SharedMemStage are registered so a config can
+build them, but no stage of the pipeline produces load/store addresses for them
+(register values are not modelled): they are standalone, driven by the tests.
+The default pipeline has no D$; FUPoolStage's LDST unit stands in for it.
+"""
+import inspect
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_SIM_ROOT = Path(__file__).resolve().parent
+for _p in (_SIM_ROOT, _SIM_ROOT / "src" / "mem", _SIM_ROOT / "src" / "decode", _SIM_ROOT / "src" / "scheduler",
+           _SIM_ROOT / "src" / "backend"):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+
+from base_class import ForwardingIF, LatchIF, Stage, Instruction, DecodeType, RAM_LATENCY_CYCLES
+from event_kernel import EventKernel
+from Memory import Mem
+from mem_controller import MemController
+from icache_stage import ICacheStage
+from dcache_stage import DCacheStage
+from coalescer_stage import CoalescerStage
+from shared_mem_stage import SharedMemStage
+from decode_class import DecodeStage
+from predicate_reg_file import PredicateRegFile
+from scheduler import WarpScheduler
+from operand_collector import OperandCollectorStage
+from scoreboard import Scoreboard
+from issue_stage import IssueStage
+from fu_pool import FUPoolStage
+from common.simt_stack import SimdEfficiency
+from timeline import TimelineWriter
+
+WARP_LANES = 32
+
+
+class RetireStage(Stage):
+    """
+    End of the modelled pipeline: counts instructions and squashes the ones
+    fetched past a warp's HALT. Records the active lanes (inst.pred) of every
+    retired instruction per PC for the SIMD efficiency report, and streams
+    every instruction leaving the pipe to the timeline log if there is one.
+    """
+
+    def __init__(self, name: str, behind_latch: LatchIF, num_warps: int = 1,
+                 timeline: Optional[TimelineWriter] = None):
+        super().__init__(name=name, behind_latch=behind_latch)
+        self.num_warps = int(num_warps)
+        self.timeline = timeline
+        self.halted: set[int] = set()
+        self.retired = 0
+        self.squashed = 0
+        self.simd = SimdEfficiency()
+        self.cycle = 0
+
+    def compute(self, input_data: Optional[Any] = None):
+        if not self.behind_latch.valid:
+            return None
+        inst: Instruction = self.behind_latch.pop()
+        inst.mark_stage_exit(self.name, self.cycle)
+        if inst.warp in self.halted:
+            self.squashed += 1
+            if self.timeline is not None:
+                self.timeline.record(inst, squashed=True)
+            return None
+        self.retired += 1
+        self.simd.record(inst.pc.uint, inst.pred, WARP_LANES)
+        if self.timeline is not None:
+            self.timeline.record(inst)
+        if inst.type == DecodeType.halt:
+            self.halted.add(inst.warp)
+        return inst
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        return cycle + 1 if self.behind_latch.valid else None
+
+    @property
+    def done(self) -> bool:
+        return len(self.halted) == self.num_warps
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "retired": self.retired,
+            "squashed": self.squashed,
+            "simd_efficiency": self.simd.overall(),
+            "per_pc": self.simd.report(),
+        }
+
+
+STAGE_TYPES = {
+    "WarpScheduler": WarpScheduler,
+    "ICacheStage": ICacheStage,
+    "DCacheStage": DCacheStage,
+    "CoalescerStage": CoalescerStage,
+    "SharedMemStage": SharedMemStage,
+    "MemController": MemController,
+    "DecodeStage": DecodeStage,
+    "IssueStage": IssueStage,
+    "OperandCollectorStage": OperandCollectorStage,
+    "FUPoolStage": FUPoolStage,
+    "RetireStage": RetireStage,
+}
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "num_warps": 4,
+    "start_pc": 0,
+    "num_preds_per_warp": 16,
+    "max_cycles": 1_000_000,
+    "caches": {
+        "icache": {"cache_size": 32 * 1024, "block_size": 64, "associativity": 4, "replacement": "lru",
+                   "mshr_entries": 4, "prefetch_lines": 0},
+        # geometry for a DCacheStage a config adds; the default stages below do not use it
+        "dcache": {"num_banks": 2, "sets_per_bank": 16, "associativity": 8, "block_words": 32, "mshr_entries": 16},
+    },
+    "stages": [
+        {"name": "scheduler", "type": "WarpScheduler"},
+        {"name": "icache", "type": "ICacheStage", "cache": "icache"},
+        {"name": "mem", "type": "MemController", "policy": "rr", "max_inflight": 8,
+         "dram_config": {"channels": 2, "banks_per_channel": 8, "row_miss_latency": RAM_LATENCY_CYCLES}},
+        {"name": "decode", "type": "DecodeStage"},
+        {"name": "issue", "type": "IssueStage", "ibuffer_depth": 2},
+        {"name": "opcoll", "type": "OperandCollectorStage",
+         "rf_config": {"num_banks": 4, "ports_per_bank": 1, "collectors": 4}},
+        {"name": "fu", "type": "FUPoolStage", "fu_config": {"wb_ports": 1, "wb_policy": "oldest"}},
+        {"name": "retire", "type": "RetireStage"},
+    ],
+    "latches": [
+        {"name": "sched_icache", "from": "scheduler.ahead_latch", "to": "icache.behind_latch"},
+        {"name": "icache_mem", "from": "icache.mem_req_if", "to": "mem.ic_req_latch"},
+        {"name": "mem_icache", "from": "mem.ic_serve_latch", "to": "icache.mem_resp_if", "feedback": True},
+        {"name": "icache_decode", "from": "icache.ahead_latch", "to": "decode.behind_latch"},
+        {"name": "decode_issue", "from": "decode.ahead_latch", "to": "issue.behind_latch"},
+        {"name": "issue_opcoll", "from": "issue.ahead_latch", "to": "opcoll.behind_latch"},
+        {"name": "opcoll_fu", "from": "opcoll.ahead_latch", "to": "fu.behind_latch"},
+        {"name": "fu_retire", "from": "fu.ahead_latch", "to": "retire.behind_latch"},
+    ],
+    "forwarding": [
+        {"name": "ICache_Decode_Ihit", "from": "icache", "to": ["decode"]},
+        {"name": "ICache_Scheduler", "from": "icache", "to": ["scheduler"]},
+        {"name": "Decode_Scheduler", "from": "decode", "to": ["scheduler"]},
+    ],
+}
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """DEFAULT_CONFIG with the top-level keys of a JSON config file (if any) replaced."""
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
 
 class GPU_model:
+    """One SM: the pipeline from `config`, memory loaded from `program` (text or binary image)."""
+
+    def __init__(self, program: str, config: Optional[Dict[str, Any]] = None, fmt: str = "bin"):
+        self.config = config or load_config()
+        self.num_warps = int(self.config["num_warps"])
+
+        self.mem = Mem(start_pc=self.config["start_pc"], input_file=program, fmt=fmt)
+        self.mem.dump_path = self.config.get("dump")  # None: no memsim.hex at exit
+        self.prf = PredicateRegFile(num_preds_per_warp=self.config["num_preds_per_warp"], num_warps=self.num_warps)
+        self.scoreboard = Scoreboard(self.num_warps)
+        timeline = self.config.get("timeline")  # path of the binary timeline log, None: no log
+        self.timeline = TimelineWriter(timeline) if timeline else None
+
+        self.latches: Dict[str, LatchIF] = {}
+        self.forwarding: Dict[str, ForwardingIF] = {}
+        self.stages: Dict[str, Any] = {}
+        self._build()
+
+        self.order = self._tick_order()
+        self.kernel = EventKernel()
+        for name in self.order:
+            self.kernel.add(self.stages[name])
+        for edge in self.config["latches"]:
+            self.kernel.connect(self.latches[edge["name"]],
+                                self.stages[edge["from"].split(".")[0]], self.stages[edge["to"].split(".")[0]])
+        for edge in self.config["forwarding"]:
+            self.kernel.connect(self.forwarding[edge["name"]],
+                                self.stages[edge["from"]], *(self.stages[d] for d in edge["to"]))
+
+    # ---------------- construction ----------------
+    def _build(self) -> None:
+        ports: Dict[str, Dict[str, Any]] = {s["name"]: {} for s in self.config["stages"]}
+
+        for edge in self.config["latches"]:
+            latch = self.latches[edge["name"]] = LatchIF(name=edge["name"])
+            for end in ("from", "to"):
+                stage, _, port = edge[end].partition(".")
+                if stage not in ports:
+                    raise ValueError(f"latch {edge['name']}: unknown stage {stage!r}")
+                ports[stage][port] = latch
+
+        for edge in self.config["forwarding"]:
+            fwd = self.forwarding[edge["name"]] = ForwardingIF(name=edge["name"])
+            ports[edge["from"]].setdefault("forward_ifs_write", {})[edge["name"]] = fwd
+            for dst in edge["to"]:
+                ports[dst].setdefault("forward_ifs_read", {})[edge["name"]] = fwd
+
+        shared = {
+            "mem_backend": self.mem,
+            "prf": self.prf,
+            "scoreboard": self.scoreboard,
+            "timeline": self.timeline,
+            "num_warps": self.num_warps,
+            "start_pc": self.config["start_pc"],
+        }
+        for spec in self.config["stages"]:
+            name = spec["name"]
+            cls = STAGE_TYPES[spec["type"]]
+            params = inspect.signature(cls.__init__).parameters
+            kwargs = {k: v for k, v in spec.items() if k not in ("name", "type", "cache")}
+            if "cache" in spec:
+                kwargs["cache_config"] = self.config["caches"][spec["cache"]]
+            kwargs.update(ports[name])
+            for pname, param in params.items():
+                if pname in ("self", "name") or pname in kwargs:
+                    continue
+                if pname in shared:
+                    kwargs[pname] = shared[pname]
+                elif param.default is inspect.Parameter.empty:
+                    kwargs[pname] = LatchIF(name=f"{name}.{pname}")  # port left unconnected
+            unknown = set(kwargs) - set(params)
+            if unknown:
+                raise ValueError(f"stage {name} ({spec['type']}) has no port/option {sorted(unknown)}")
+            self.stages[name] = cls(name=name, **kwargs)
+
+    def _tick_order(self) -> list[str]:
+        """Reverse-topological order of the stages over the non-feedback latch edges."""
+        names = [s["name"] for s in self.config["stages"]]
+        succ: Dict[str, list[str]] = {n: [] for n in names}
+        indeg = {n: 0 for n in names}
+        for edge in self.config["latches"]:
+            if edge.get("feedback"):
+                continue
+            src, dst = edge["from"].split(".")[0], edge["to"].split(".")[0]
+            succ[src].append(dst)
+            indeg[dst] += 1
+
+        topo = []
+        ready = [n for n in names if indeg[n] == 0]
+        while ready:
+            n = ready.pop(0)
+            topo.append(n)
+            for m in succ[n]:
+                indeg[m] -= 1
+                if indeg[m] == 0:
+                    ready.append(m)
+        if len(topo) != len(names):
+            loop = [n for n in names if n not in topo]
+            raise ValueError(f"latch loop through {loop}, mark the edge that flows back upstream as feedback")
+        return topo[::-1]
+
+    # ---------------- simulation ----------------
+    def _retire(self) -> RetireStage:
+        return next(s for s in self.stages.values() if isinstance(s, RetireStage))
 
-    
\ No newline at end of file
+    def run(self, max_cycles: Optional[int] = None, stepped: bool = False) -> Dict[str, Any]:
+        """Run until every warp retired its HALT (or max_cycles); returns cycles, instructions and IPC."""
+        retire = self._retire()
+        max_cycles = self.config["max_cycles"] if max_cycles is None else max_cycles
+        run = self.kernel.run_stepped if stepped else self.kernel.run
+        cycles = run(until=lambda: retire.done, max_cycles=max_cycles)
+        if self.timeline is not None:
+            self.timeline.close()  # the log is complete once run() returns
+        return {
+            "cycles": cycles,
+            "instructions": retire.retired,
+            "ipc": retire.retired / cycles if cycles else 0.0,
+            "squashed": retire.squashed,
+            "halted": retire.done,
+            "simd_efficiency": retire.simd.overall(),
+        }
@@ -0,0 +1,55 @@
+"""
+Cycle simulator entry point.
+
+    python main.py <program> [hex|bin|img] [--config sm.json] [--warps N] [--max-cycles N] [--stepped]
+                   [--timeline run.tl]
+
+Builds one SM from the config (gpu_model.DEFAULT_CONFIG unless --config is
+given), runs the program until every warp halts and prints cycles, IPC and
+SIMD efficiency.
+"""
+import argparse
+import time
+
+from gpu_model import GPU_model, load_config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cycle simulator for one SM")
+    parser.add_argument("program", help="program file: text (hex/bin, one word per line) or binary image")
+    parser.add_argument("fmt", nargs="?", default="bin", choices=["hex", "bin", "img"],
+                        help="text format of the program (images are detected by their header)")
+    parser.add_argument("--config", help="JSON file overriding top-level keys of the default SM config")
+    parser.add_argument("--warps", type=int, help="number of warps (overrides the config)")
+    parser.add_argument("--start-pc", type=lambda s: int(s, 0), help="load/start address (overrides the config)")
+    parser.add_argument("--max-cycles", type=int, help="give up after this many cycles")
+    parser.add_argument("--timeline", metavar="PATH",
+                        help="stream a per-instruction pipeline timeline to PATH (convert with timeline.py)")
+    parser.add_argument("--stepped", action="store_true", help="tick every stage every cycle instead of skipping idle cycles")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.warps is not None:
+        config["num_warps"] = args.warps
+    if args.start_pc is not None:
+        config["start_pc"] = args.start_pc
+    if args.timeline is not None:
+        config["timeline"] = args.timeline
+
+    model = GPU_model(args.program, config, fmt=args.fmt)
+    start = time.perf_counter()
+    stats = model.run(max_cycles=args.max_cycles, stepped=args.stepped)
+    elapsed = time.perf_counter() - start
+
+    print(f"tick order:   {' <- '.join(model.order)}")
+    print(f"cycles:       {stats['cycles']}")
+    print(f"instructions: {stats['instructions']} ({stats['squashed']} squashed past HALT)")
+    print(f"IPC:          {stats['ipc']:.3f}")
+    print(f"SIMD eff.:    {stats['simd_efficiency']:.3f}")
+    if not stats["halted"]:
+        print("WARNING: stopped at the cycle limit before every warp halted")
+    print(f"sim time:     {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
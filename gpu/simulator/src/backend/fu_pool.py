@@ -0,0 +1,176 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+sys.path.append(str(Path(__file__).resolve().parents[1] / "mem"))  # for the arbiters
+
+import heapq
+from base_class import LatchIF, Stage, Instruction
+from collections import deque
+from typing import Any, Dict, List, Optional
+from common import trace
+from arbiter import make_arbiter
+from scoreboard import Scoreboard
+
+_trace = trace.channel("fu")
+
+# per FUST class (see decode_class.classify_fust_unit): instances, cycles to result, pipelined or iterative.
+# LDST is a fixed-latency stand-in: the pipeline carries no register values, so it has no lane
+# addresses to hand to the CoalescerStage / DCacheStage, and loads and stores never reach the D$.
+FU_DEFAULTS: Dict[str, Any] = {
+    "units": {
+        "ADD":    {"count": 2, "latency": 4,  "pipelined": True},
+        "SUB":    {"count": 1, "latency": 4,  "pipelined": True},
+        "MUL":    {"count": 1, "latency": 6,  "pipelined": True},
+        "DIV":    {"count": 1, "latency": 20, "pipelined": False},
+        "SQRT":   {"count": 1, "latency": 20, "pipelined": False},
+        "LDST":   {"count": 1, "latency": 8,  "pipelined": True},
+        "BRANCH": {"count": 1, "latency": 2,  "pipelined": True},
+    },
+    "ops": {},            # opcode name -> {"latency": n, "ii": n}, overrides its class
+    "wb_ports": 1,
+    "wb_policy": "oldest",
+}
+
+
+class FunctionalUnit:
+    """One instance of an FU class: accepts an instruction every `ii` cycles, results after `latency`."""
+
+    def __init__(self, fu_class: str, index: int, latency: int, ii: int) -> None:
+        self.fu_class = fu_class
+        self.index = index
+        self.latency = latency
+        self.ii = ii
+        self.free_at = 0
+        self.issues = 0
+        self.busy_cycles = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.fu_class}{self.index}"
+
+
+class FUPoolStage(Stage):
+    """
+    Functional units between the operand collector and retire.
+
+    - behind_latch: collected Instructions, one per cycle, to the first free
+      unit of their intended_FSU class (unknown ops go to ADD). While every
+      unit of the class is busy the latch stalls; each such cycle counts as a
+      structural stall of the class.
+    - A unit takes a new instruction every `ii` cycles: 1 when pipelined, its
+      latency when iterative. fu_config["ops"] overrides latency and ii per
+      opcode name (e.g. a slower DIVU).
+    - Finished results compete for wb_ports writeback ports per cycle, one
+      candidate per class, granted by a memory-style arbiter (wb_policy: "oldest",
+      "rr", "priority", ...). Writeback releases the destination in the
+      scoreboard and hands the instruction to ahead_latch.
+    - report() gives issues, busy cycles and utilization per unit, plus the
+      structural and writeback stall cycles per class.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        scoreboard: Optional[Scoreboard] = None,
+        fu_config: Optional[Dict[str, Any]] = None,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        cfg = {**FU_DEFAULTS, **(fu_config or {})}
+        units = {**FU_DEFAULTS["units"], **cfg["units"]}
+        self.ops: Dict[str, Dict[str, int]] = dict(cfg["ops"])
+        self.scoreboard = scoreboard
+        self.wb_ports = int(cfg["wb_ports"])
+        if self.wb_ports < 1:
+            raise ValueError(f"[{name}] wb_ports must be at least 1, got {self.wb_ports}")
+
+        self.classes: List[str] = list(units)
+        self.units: Dict[str, List[FunctionalUnit]] = {}
+        for fu_class, spec in units.items():
+            latency = int(spec["latency"])
+            ii = int(spec.get("ii", 1 if spec.get("pipelined", True) else latency))
+            if spec["count"] < 1 or latency < 1 or ii < 1:
+                raise ValueError(f"[{name}] {fu_class} needs count, latency and ii of at least 1, got {spec}")
+            self.units[fu_class] = [FunctionalUnit(fu_class, i, latency, ii) for i in range(spec["count"])]
+        self.arbiter = make_arbiter(cfg["wb_policy"], len(self.classes))
+
+        self.results: Dict[str, list] = {c: [] for c in self.classes}  # heap of (ready cycle, seq, inst) per class
+        self.done: deque = deque()                                      # written back, waiting for ahead_latch
+        self._seq = 0
+        self.struct_stalls = {c: 0 for c in self.classes}
+        self.wb_stalls = {c: 0 for c in self.classes}
+        self.written_back = 0
+        self.cycle = 0
+
+    def _dispatch(self) -> None:
+        if not self.behind_latch.valid:
+            return
+        inst: Instruction = self.behind_latch.snoop()
+        fu_class = inst.intended_FSU if inst.intended_FSU in self.units else "ADD"
+        unit = next((u for u in self.units[fu_class] if u.free_at <= self.cycle), None)
+        if unit is None:
+            self.struct_stalls[fu_class] += 1
+            return
+        self.behind_latch.pop()
+        op = self.ops.get(getattr(inst.opcode, "name", None), {})
+        latency, ii = op.get("latency", unit.latency), op.get("ii", unit.ii)
+        unit.free_at = self.cycle + ii
+        unit.issues += 1
+        unit.busy_cycles += ii
+        inst.mark_stage_enter(self.name, self.cycle)
+        inst.mark_fu_enter(unit.name, self.cycle)
+        heapq.heappush(self.results[fu_class], (self.cycle + latency, self._seq, inst, unit.name))
+        self._seq += 1
+        _trace.trace("[%s] warp=%s pc=0x%X -> %s", self.name, inst.warp, inst.pc.uint, unit.name)
+
+    def _writeback(self) -> None:
+        ready = {}  # class index -> cycle its oldest result finished
+        for port, fu_class in enumerate(self.classes):
+            heap = self.results[fu_class]
+            if heap and heap[0][0] <= self.cycle:
+                ready[port] = heap[0][0]
+        for _ in range(self.wb_ports):
+            if not ready:
+                break
+            port = self.arbiter.grant(sorted(ready.items()))
+            del ready[port]
+            _, _, inst, unit_name = heapq.heappop(self.results[self.classes[port]])
+            inst.mark_fu_exit(unit_name, self.cycle)
+            inst.mark_writeback(self.cycle)
+            if self.scoreboard is not None:
+                self.scoreboard.release(inst)
+            self.done.append(inst)
+            self.written_back += 1
+        for port in ready:
+            self.wb_stalls[self.classes[port]] += 1
+
+    def compute(self, input_data: Optional[Any] = None):
+        if self.done and self.ahead_latch.ready_for_push():
+            inst = self.done.popleft()
+            inst.mark_stage_exit(self.name, self.cycle)
+            self.ahead_latch.push(inst)
+        self._writeback()
+        self._dispatch()
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        wake = [heap[0][0] for heap in self.results.values() if heap]
+        if self.behind_latch.valid or (self.done and self.ahead_latch.ready_for_push()):
+            wake.append(cycle + 1)
+        return max(cycle + 1, min(wake)) if wake else None
+
+    def report(self, cycles: Optional[int] = None) -> Dict[str, Any]:
+        """Per-unit utilization is busy cycles over `cycles` (default: up to the last tick)."""
+        cycles = cycles or self.cycle or 1
+        return {
+            "units": {u.name: {"issues": u.issues, "busy_cycles": u.busy_cycles,
+                               "utilization": min(1.0, u.busy_cycles / cycles)}
+                      for fu_class in self.classes for u in self.units[fu_class]},
+            "struct_stall_cycles": {c: n for c, n in self.struct_stalls.items() if n},
+            "wb_stall_cycles": {c: n for c, n in self.wb_stalls.items() if n},
+            "written_back": self.written_back,
+        }
@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+from base_class import LatchIF, Stage, Instruction
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from common import trace
+from scoreboard import HAZARDS, Scoreboard
+
+_trace = trace.channel("issue")
+
+
+class IssueStage(Stage):
+    """
+    In-order issue per warp, checked against the scoreboard.
+
+    - behind_latch: decoded Instructions, parked in a per-warp instruction
+      buffer of ibuffer_depth entries (the latch stalls while that warp's
+      buffer is full).
+    - Each cycle the oldest buffer head with no RAW or WAW hazard on a pending
+      register issues into ahead_latch and reserves its destination. A
+      dependent warp doesn't block the others.
+    - Every cycle a buffer head is held back counts one stall cycle of its
+      hazard type, for its warp.
+    - The scoreboard is shared with writeback, which releases the destination.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        scoreboard: Scoreboard,
+        num_warps: int = 1,
+        ibuffer_depth: int = 2,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        self.scoreboard = scoreboard
+        self.ibuffer_depth = int(ibuffer_depth)
+        self.ibuffers: List[Deque[Instruction]] = [deque() for _ in range(int(num_warps))]
+
+        self.issued = 0
+        self.stalls = {h: 0 for h in HAZARDS}
+        self.warp_stalls: Dict[int, Dict[str, int]] = {}
+        self.cycle = 0
+
+    def _buffer(self) -> None:
+        if not self.behind_latch.valid:
+            return
+        ibuf = self.ibuffers[self.behind_latch.snoop().warp or 0]
+        if len(ibuf) < self.ibuffer_depth:
+            inst = self.behind_latch.pop()
+            inst.mark_stage_enter(self.name, self.cycle)
+            ibuf.append(inst)
+
+    def _issue(self) -> None:
+        can_issue = self.ahead_latch.ready_for_push()
+        pick = None
+        for ibuf in self.ibuffers:
+            if not ibuf:
+                continue
+            head = ibuf[0]
+            hazard = self.scoreboard.hazard(head)
+            if hazard is None:
+                if can_issue and (pick is None or head.iid < pick[0].iid):
+                    pick = ibuf
+                continue
+            self.stalls[hazard] += 1
+            per_warp = self.warp_stalls.setdefault(head.warp or 0, {h: 0 for h in HAZARDS})
+            per_warp[hazard] += 1
+            _trace.trace("[%s] warp=%s pc=0x%X %s stall", self.name, head.warp, head.pc.uint, hazard)
+
+        if pick is not None:
+            inst = pick.popleft()
+            self.scoreboard.reserve(inst)
+            inst.issued_cycle = self.cycle
+            inst.mark_stage_exit(self.name, self.cycle)
+            self.ahead_latch.push(inst)
+            self.issued += 1
+
+    def compute(self, input_data: Optional[Any] = None):
+        self._issue()
+        self._buffer()
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        # a hazard clears on writeback, which only touches the scoreboard, so keep polling while anything is buffered
+        return cycle + 1 if any(self.ibuffers) else None
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "issued": self.issued,
+            "stall_cycles": dict(self.stalls),
+            "warp_stall_cycles": dict(sorted(self.warp_stalls.items())),
+        }
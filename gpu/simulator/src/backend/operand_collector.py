@@ -0,0 +1,151 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+sys.path.append(str(Path(__file__).resolve().parents[1] / "decode"))  # for the opcode table
+
+from base_class import LatchIF, Stage, Instruction
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from common import trace
+from decode_class import OP_INFO
+
+_trace = trace.channel("opcoll")
+
+RF_DEFAULTS = {"num_banks": 4, "ports_per_bank": 1, "collectors": 4}
+
+
+def rf_bank(warp: int, reg: int, num_banks: int) -> int:
+    """Bank of a warp's register; offset by the warp id so warps reading the same register spread out."""
+    return (reg + warp) % num_banks
+
+
+def source_regs(inst: Instruction) -> List[int]:
+    """Registers the instruction reads, without duplicates and without x0 (hardwired zero)."""
+    info = OP_INFO.get(inst.opcode)
+    if info is None:
+        return []
+    regs = []
+    for used, reg in ((info.reads_rs1, inst.rs1), (info.reads_rs2, inst.rs2), (info.reads_rd, inst.rd)):
+        if used and reg and reg not in regs:
+            regs.append(reg)
+    return regs
+
+
+@dataclass
+class CollectorUnit:
+    inst: Instruction
+    allocated: int
+    pending: List[Tuple[int, int]] = field(default_factory=list)  # (register, bank) still to read
+    ready_at: Optional[int] = None                                  # cycle all operands are in
+
+
+class OperandCollectorStage(Stage):
+    """
+    Operand collector in front of the functional units, over a banked register file.
+
+    - behind_latch: decoded Instructions. Each one takes a free collector unit,
+      and stalls in the latch while all of them are busy.
+    - Every cycle each bank serves ports_per_bank reads, oldest collector first.
+      An operand that loses its bank retries next cycle; a cycle in which a
+      collector lost a read counts as a bank-conflict stall for its warp.
+    - Register r of warp w lives in bank (r + w) % num_banks; target_bank is set
+      to the bank of rd for the writeback.
+    - ahead_latch: one collected Instruction per cycle, oldest first, the cycle
+      after its last operand was read.
+    - rf_config: {"num_banks": 4, "ports_per_bank": 1, "collectors": 4}. Only
+      the timing is modelled, register values stay with the emulator.
+    - report() gives reads per bank, conflict stall cycles per warp and the
+      average cycles an instruction spent collecting.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        rf_config: Optional[Dict[str, int]] = None,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        cfg = {**RF_DEFAULTS, **(rf_config or {})}
+        self.num_banks = cfg["num_banks"]
+        self.ports_per_bank = cfg["ports_per_bank"]
+        self.num_collectors = cfg["collectors"]
+        if min(self.num_banks, self.ports_per_bank, self.num_collectors) < 1:
+            raise ValueError(f"[{name}] num_banks, ports_per_bank and collectors must be at least 1, got {cfg}")
+
+        self.collectors: List[CollectorUnit] = []  # allocation order, oldest first
+        self.bank_reads = [0] * self.num_banks
+        self.conflict_cycles: Dict[int, int] = {}
+        self.dispatched = 0
+        self.collect_cycles = 0
+        self.cycle = 0
+
+    def _dispatch(self) -> None:
+        if not self.ahead_latch.ready_for_push():
+            return
+        for cu in self.collectors:
+            if not cu.pending and cu.ready_at <= self.cycle:
+                self.collectors.remove(cu)
+                cu.inst.mark_stage_exit(self.name, self.cycle)
+                self.ahead_latch.push(cu.inst)
+                self.dispatched += 1
+                self.collect_cycles += self.cycle - cu.allocated
+                return
+
+    def _allocate(self) -> None:
+        if not self.behind_latch.valid or len(self.collectors) >= self.num_collectors:
+            return
+        inst: Instruction = self.behind_latch.pop()
+        inst.mark_stage_enter(self.name, self.cycle)
+        warp = inst.warp or 0
+        if inst.rd is not None:
+            inst.target_bank = rf_bank(warp, inst.rd, self.num_banks)
+        cu = CollectorUnit(inst, self.cycle,
+                           pending=[(reg, rf_bank(warp, reg, self.num_banks)) for reg in source_regs(inst)])
+        if not cu.pending:
+            cu.ready_at = self.cycle + 1
+        self.collectors.append(cu)
+
+    def _read_operands(self) -> None:
+        ports = [self.ports_per_bank] * self.num_banks
+        for cu in self.collectors:
+            if not cu.pending:
+                continue
+            lost = []
+            for reg, bank in cu.pending:
+                if ports[bank]:
+                    ports[bank] -= 1
+                    self.bank_reads[bank] += 1
+                else:
+                    lost.append((reg, bank))
+            cu.pending = lost
+            if lost:
+                warp = cu.inst.warp or 0
+                self.conflict_cycles[warp] = self.conflict_cycles.get(warp, 0) + 1
+                _trace.trace("[%s] warp=%s pc=0x%X lost bank %d", self.name, cu.inst.warp, cu.inst.pc.uint, lost[0][1])
+            else:
+                cu.ready_at = self.cycle + 1
+
+    def compute(self, input_data: Optional[Any] = None):
+        self._dispatch()
+        self._allocate()
+        self._read_operands()
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        if any(cu.pending for cu in self.collectors):
+            return cycle + 1
+        if self.collectors and self.ahead_latch.ready_for_push():
+            return max(cycle + 1, min(cu.ready_at for cu in self.collectors))
+        return None  # empty, or every collected instruction waits for the next stage to take one
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "bank_reads": list(self.bank_reads),
+            "conflict_cycles": dict(sorted(self.conflict_cycles.items())),
+            "total_conflict_cycles": sum(self.conflict_cycles.values()),
+            "avg_collect_cycles": self.collect_cycles / self.dispatched if self.dispatched else 0.0,
+        }
@@ -0,0 +1,82 @@
+"""
+Per-warp scoreboard: the destination registers of every warp with a write in
+flight, one int bitmask per warp (bit r = register r).
+
+Issue reserves an instruction's destination and writeback releases it. The
+instruction's source and destination masks against the pending mask give the
+hazard it would cause:
+
+    Scoreboard(num_warps).hazard(inst) -> "RAW" | "WAW" | "DRAIN" | None
+
+It also counts each warp's instructions between issue and writeback, so a
+HALT waits for the warp to drain and nothing after it issues before it is
+written back ("DRAIN").
+"""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+sys.path.append(str(Path(__file__).resolve().parents[1] / "decode"))  # for the opcode table
+
+from typing import List, Optional
+from base_class import Instruction, DecodeType
+from decode_class import OP_INFO
+
+HAZARDS = ("RAW", "WAW", "DRAIN")
+
+
+def dest_reg(inst: Instruction) -> Optional[int]:
+    """Register the instruction writes, None for no destination or x0."""
+    info = OP_INFO.get(inst.opcode)
+    return inst.rd if info is not None and info.writes_rd and inst.rd else None
+
+
+def source_mask(inst: Instruction) -> int:
+    info = OP_INFO.get(inst.opcode)
+    if info is None:
+        return 0
+    mask = 0
+    for used, reg in ((info.reads_rs1, inst.rs1), (info.reads_rs2, inst.rs2), (info.reads_rd, inst.rd)):
+        if used and reg:
+            mask |= 1 << reg
+    return mask
+
+
+class Scoreboard:
+    def __init__(self, num_warps: int, num_regs: int = 64) -> None:
+        self.num_regs = num_regs
+        self.pending: List[int] = [0] * num_warps
+        self.inflight: List[int] = [0] * num_warps
+        self.draining = 0  # bit w set while warp w has a HALT in flight
+
+    def hazard(self, inst: Instruction) -> Optional[str]:
+        warp = inst.warp or 0
+        if self.inflight[warp] and (inst.type == DecodeType.halt or (self.draining >> warp) & 1):
+            return "DRAIN"
+        pending = self.pending[warp]
+        if not pending:
+            return None
+        if pending & source_mask(inst):
+            return "RAW"
+        rd = dest_reg(inst)
+        if rd is not None and (pending >> rd) & 1:
+            return "WAW"
+        return None
+
+    def reserve(self, inst: Instruction) -> None:
+        warp = inst.warp or 0
+        self.inflight[warp] += 1
+        if inst.type == DecodeType.halt:
+            self.draining |= 1 << warp
+        rd = dest_reg(inst)
+        if rd is not None:
+            self.pending[warp] |= 1 << rd
+
+    def release(self, inst: Instruction) -> None:
+        warp = inst.warp or 0
+        self.inflight[warp] -= 1
+        if inst.type == DecodeType.halt:
+            self.draining &= ~(1 << warp)
+        rd = dest_reg(inst)
+        if rd is not None:
+            self.pending[warp] &= ~(1 << rd)
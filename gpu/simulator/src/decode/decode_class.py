@@ -1,228 +1,271 @@
-from base import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
-from Memory import Mem
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
-from collections import deque
-from datetime import datetime
-from isa_packets import ISA_PACKETS
-from bitstring import Bits
-from custom_enums_multi import (
-    Op,
-    R_Op, I_Op, F_Op, S_Op, B_Op, U_Op, C_Op, J_Op, P_Op, H_Op,
-)
-
-global_cycle = 0
-
-
-# at top of the file, after imports / decode_opcode
-FUST_CLASSES = {"ADD", "SUB", "MUL", "DIV", "SQRT", "LDST", "BRANCH"}
-
-def classify_fust_unit(op) -> Optional[str]:
-    """
-    Map an Op (or R_Op/I_Op/F_Op/...) to a FUST class:
-    one of {"ADD", "SUB", "MUL", "DIV", "SQRT", "LDST", "BRANCH"} or None.
-    Adjust the name checks to match your actual enum names.
-    """
-    if op is None:
-        return None
-
-    name = getattr(op, "name", str(op))
-
-    # Branch unit
-    if isinstance(op, B_Op) or "BRANCH" in name or name.startswith("B"):
-        return "BRANCH"
-
-    # Load / Store
-    if isinstance(op, S_Op) or name.startswith("LD") or name.startswith("ST"):
-        return "LDST"
-
-    # Mul / Div / Sqrt (could be integer or FP)
-    if "MUL" in name:
-        return "MUL"
-    if "DIV" in name:
-        return "DIV"
-    if "SQRT" in name:
-        return "SQRT"
-
-    # Generic ALU: ADD/SUB or “everything else” mapped to ADD lane
-    if "SUB" in name:
-        return "SUB"
-    if "ADD" in name:
-        return "ADD"
-
-    # Fallback: treat as ADD-lane ALU
-    return "ADD"
-
-def decode_opcode(bits7: Bits):
-    """
-    Map a 7-bit opcode Bits to an Op enum (preferred) or the
-    underlying R_Op/I_Op/... enum as a fallback.
-    """
-    for enum_cls in (R_Op, I_Op, F_Op, S_Op, B_Op, U_Op, C_Op, J_Op, P_Op, H_Op):
-        for member in enum_cls:
-            if member.value == bits7:
-                # Prefer unified Op enum if it has the same name
-                try:
-                    return Op[member.name]
-                except KeyError:
-                    return member       # fallback: R_Op / I_Op / ...
-    # Default: NOP or None
-    try:
-        return Op.NOP
-    except Exception:
-        return None
-
-
-class DecodeStage(Stage):
-    """Decode stage that directly uses the Stage base class."""
-
-    def __init__(
-        self,
-        name: str,
-        behind_latch: Optional[LatchIF],
-        ahead_latch: Optional[LatchIF],
-        prf,
-        forward_ifs_read: Optional[Dict[str, ForwardingIF]] = None,
-        forward_ifs_write: Optional[Dict[str, ForwardingIF]] = None,
-    ):
-        super().__init__(
-            name=name,
-            behind_latch=behind_latch,
-            ahead_latch=ahead_latch,
-            forward_ifs_read=forward_ifs_read or {},
-            forward_ifs_write=forward_ifs_write or {},
-        )
-        self.prf = prf  # predicate register file reference
-        self.last_fwd_value = {}
-
-    def compute(self, input_data: Optional[Any] = None):
-        """Decode the raw instruction word coming from behind_latch."""
-
-        # If no input_data given, read from behind latch
-        if input_data is None:
-            if not self.behind_latch.valid:
-                return None
-            inst = self.behind_latch.snoop()
-        else:
-            inst = input_data
-
-        # ---------------------------------------------------------
-        # 1) Stall if any forwarding IF is explicitly in wait state
-        # ---------------------------------------------------------
-        for name, fwd_if in self.forward_ifs_read.items():
-            if fwd_if.wait:
-                print(f"[{self.name}] Stalled due to wait from next stage.")
-                return None
-
-        # ---------------------------------------------------------
-        # 2) EDGE-TRIGGER forwarding consumption
-        # ---------------------------------------------------------
-        fwd_values = {}
-        for name, f in self.forward_ifs_read.items():
-            payload = f.payload
-            if payload is None or payload == self.last_fwd_value.get(name):
-                continue
-            fwd_values[name] = payload
-            self.last_fwd_value[name] = payload
-
-        # ---------------------------------------------------------
-        # 3) Decode MUST stall on ihit=False (but only on new event)
-        # ---------------------------------------------------------
-        if "ICache_Decode_Ihit" in fwd_values and fwd_values["ICache_Decode_Ihit"] is False:
-            print(f"[{self.name}] Waiting on ICache ihit signal...")
-            return None
-
-        # ---------------------------------------------------------
-        # 4) Extract the raw instruction bits
-        # ---------------------------------------------------------
-        #print(f"[{self.name}] Decoding instruction raw {inst}")
-        raw_field = inst.packet 
-        print(raw_field)
-
-        if isinstance(raw_field, Bits):
-            raw = raw_field.uint & 0xFFFFFFFF
-        elif isinstance(raw_field, bytes):
-            raw = int.from_bytes(raw_field[:4], byteorder="little")
-        elif isinstance(raw_field, int):
-            raw = raw_field & 0xFFFFFFFF
-        elif isinstance(raw_field, str):
-            raw = int(raw_field, 0) & 0xFFFFFFFF
-        elif isinstance(raw_field, list):
-            raw = sum((byte & 0xFF) << (8 * i)
-                      for i, byte in enumerate(raw_field[:4])) & 0xFFFFFFFF
-        else:
-            raise TypeError(f"[{self.name}] Unsupported packet type: {type(raw_field)}")
-
-        # ---------------------------------------------------------
-        # 5) Bitfield decode
-        # ---------------------------------------------------------
-        opcode7 = raw & 0x7F
-        rd      = (raw >> 7)  & 0x3F
-        rs1     = (raw >> 13) & 0x3F
-        mid6    = (raw >> 19) & 0x3F
-        pred    = (raw >> 25) & 0x1F
-
-        opcode_bits = Bits(uint=opcode7, length=7)
-        inst.opcode = decode_opcode(opcode_bits)
-        inst.intended_FSU = classify_fust_unit(inst.opcode)
-        
-        # Match Instruction type: registers as Bits
-        inst.rs1 = Bits(uint=rs1,  length=6)
-        inst.rs2 = Bits(uint=mid6, length=6)
-        inst.rd  = Bits(uint=rd,   length=6)
-
-        # ---------------------------------------------------------
-        # 5b) Control-type (halt/EOP/MOP/Barrier)
-        # ---------------------------------------------------------
-        EOP_bit     = (raw >> 31) & 0x1
-        MOP_bit     = (raw >> 30) & 0x1
-        Barrier_bit = (raw >> 29) & 0x1
-
-        inst.type = None
-        if opcode_bits == H_Op.HALT.value or inst.opcode == getattr(Op, "HALT", None):
-            inst.type = DecodeType.halt
-        elif EOP_bit == 1:
-            inst.type = DecodeType.EOP
-        elif MOP_bit == 1:
-            inst.type = DecodeType.MOP
-        elif Barrier_bit == 1:
-            inst.type = DecodeType.Barrier
-
-        # ---------------------------------------------------------
-        # 6) Predicate register file lookup
-        # ---------------------------------------------------------
-        pred_mask = self.prf.read_predicate(
-            prf_rd_en=1,
-            prf_rd_wsel=inst.warp,
-            prf_rd_psel=pred,
-            prf_neg=0
-        )
-
-        if pred_mask is None:
-            pred_mask = [True] * 32
-
-        inst.pred = [Bits(uint=int(b), length=1) for b in pred_mask]
-
-        # ---------------------------------------------------------
-        # 7) Optional write-forwarding to next stage
-        # ---------------------------------------------------------
-        for name, f in self.forward_ifs_write.items():
-            f.push({
-                "decoded": True,
-                "type": inst.type,
-                "pc": inst.pc,
-                "warp": inst.warp,
-            })
-
-        # ---------------------------------------------------------
-        # 8) Bookkeeping + send result forward
-        # ---------------------------------------------------------
-        global global_cycle
-        inst.stage_entry.setdefault("Decode", global_cycle)
-        inst.stage_exit["Decode"] = global_cycle + 1
-        inst.issued_cycle = inst.issued_cycle or global_cycle
-
-        self.behind_latch.pop()
-        self.send_output(inst)
-        print(f"[{self.name}] Decoded instruction. Updated inst packed is {inst}")
-        return inst
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+from base_class import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional
+from collections import deque
+from datetime import datetime
+from bitstring import Bits
+from custom_enums_multi import (
+    Op,
+    R_Op, I_Op, F_Op, S_Op, B_Op, U_Op, C_Op, J_Op, P_Op, H_Op,
+)
+
+from common import trace
+
+global_cycle = 0
+_trace = trace.channel("decode")
+
+
+FUST_CLASSES = {"ADD", "SUB", "MUL", "DIV", "SQRT", "LDST", "BRANCH"}
+
+def classify_fust_unit(op) -> Optional[str]:
+    """
+    Map an Op (or R_Op/I_Op/F_Op/...) to a FUST class:
+    one of {"ADD", "SUB", "MUL", "DIV", "SQRT", "LDST", "BRANCH"} or None.
+    Only used to build OPCODE_TABLE, decode looks the class up there.
+    """
+    if op is None:
+        return None
+
+    name = getattr(op, "name", str(op))
+
+    # Branch unit
+    if isinstance(op, B_Op) or "BRANCH" in name or name.startswith("B"):
+        return "BRANCH"
+
+    # Load / Store
+    if isinstance(op, S_Op) or name in ("LW", "LH", "LB") or name.startswith("LD") or name.startswith("ST"):
+        return "LDST"
+
+    # Mul / Div / Sqrt (could be integer or FP)
+    if "MUL" in name:
+        return "MUL"
+    if "DIV" in name:
+        return "DIV"
+    if "SQRT" in name:
+        return "SQRT"
+
+    # Generic ALU: ADD/SUB or “everything else” mapped to ADD lane
+    if "SUB" in name:
+        return "SUB"
+    if "ADD" in name:
+        return "ADD"
+
+    # Fallback: treat as ADD-lane ALU
+    return "ADD"
+
+
+class OpInfo(NamedTuple):
+    """One row of OPCODE_TABLE: what decode needs to know about an opcode."""
+    op: Optional[Op]
+    fu: Optional[str]    # FUST class, see classify_fust_unit
+    fmt: Optional[str]   # encoding format: "R", "I", "F", "S", "B", "U", "C", "J", "P" or "H"
+    reads_rs1: bool
+    reads_rs2: bool
+    reads_rd: bool       # rd is a source too (partial immediate loads, csrw)
+    writes_rd: bool
+
+
+# format -> (reads rs1, reads rs2, writes rd); B writes a predicate, S and P have no destination
+_FORMATS = {
+    R_Op: ("R", True, True, True),
+    I_Op: ("I", True, False, True),
+    F_Op: ("F", True, False, True),
+    S_Op: ("S", True, True, False),
+    B_Op: ("B", True, True, False),
+    U_Op: ("U", False, False, True),
+    C_Op: ("C", False, False, True),
+    J_Op: ("J", False, False, True),
+    P_Op: ("P", False, True, False),  # rs1 names a predicate register
+    H_Op: ("H", False, False, False),
+}
+_READS_RD = {"LLI", "LMI", "LUI", "CSRW"}
+_NO_RD_WRITE = {"CSRW"}
+
+_UNKNOWN = OpInfo(None, None, None, False, False, False, False)
+
+
+def _build_opcode_table() -> List[OpInfo]:
+    table = [_UNKNOWN] * 128
+    for enum_cls, (fmt, rs1, rs2, rd) in _FORMATS.items():
+        for member in enum_cls:
+            table[member.value.uint] = OpInfo(
+                op=member, fu=classify_fust_unit(member), fmt=fmt, reads_rs1=rs1, reads_rs2=rs2,
+                reads_rd=member.name in _READS_RD, writes_rd=rd and member.name not in _NO_RD_WRITE,
+            )
+    return table
+
+
+# opcode7 -> OpInfo, built once; unknown opcodes decode to op=None
+OPCODE_TABLE: List[OpInfo] = _build_opcode_table()
+OP_INFO: Dict[Op, OpInfo] = {info.op: info for info in OPCODE_TABLE if info.op is not None}
+
+
+def decode_opcode(bits7):
+    """Map a 7-bit opcode (Bits or int) to its R_Op/I_Op/... member, None if unknown."""
+    return OPCODE_TABLE[bits7.uint if isinstance(bits7, Bits) else bits7 & 0x7F].op
+
+
+class DecodeStage(Stage):
+    """Decode stage that directly uses the Stage base class."""
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        prf,
+        forward_ifs_read: Optional[Dict[str, ForwardingIF]] = None,
+        forward_ifs_write: Optional[Dict[str, ForwardingIF]] = None,
+    ):
+        super().__init__(
+            name=name,
+            behind_latch=behind_latch,
+            ahead_latch=ahead_latch,
+            forward_ifs_read=forward_ifs_read or {},
+            forward_ifs_write=forward_ifs_write or {},
+        )
+        self.prf = prf  # predicate register file reference
+        self.last_fwd_value = {}
+
+    def compute(self, input_data: Optional[Any] = None):
+        """Decode the raw instruction word coming from behind_latch."""
+
+        # If no input_data given, read from behind latch
+        if input_data is None:
+            if not self.behind_latch.valid:
+                return None
+            inst = self.behind_latch.snoop()
+        else:
+            inst = input_data
+
+        # ---------------------------------------------------------
+        # 1) Stall if any forwarding IF is explicitly in wait state
+        # ---------------------------------------------------------
+        for name, fwd_if in self.forward_ifs_read.items():
+            if fwd_if.wait:
+                _trace.debug("[%s] Stalled due to wait from next stage.", self.name)
+                return None
+        if not self.ahead_latch.ready_for_push():
+            return None  # next stage hasn't taken the last one, hold this instruction in the latch
+
+        # ---------------------------------------------------------
+        # 2) EDGE-TRIGGER forwarding consumption
+        # ---------------------------------------------------------
+        fwd_values = {}
+        for name, f in self.forward_ifs_read.items():
+            payload = f.payload
+            if payload is None or payload == self.last_fwd_value.get(name):
+                continue
+            fwd_values[name] = payload
+            self.last_fwd_value[name] = payload
+
+        # ---------------------------------------------------------
+        # 3) Decode MUST stall on ihit=False (but only on new event)
+        # ---------------------------------------------------------
+        if "ICache_Decode_Ihit" in fwd_values and fwd_values["ICache_Decode_Ihit"] is False:
+            _trace.debug("[%s] Waiting on ICache ihit signal...", self.name)
+            return None
+
+        # ---------------------------------------------------------
+        # 4) Extract the raw instruction bits
+        # ---------------------------------------------------------
+        #print(f"[{self.name}] Decoding instruction raw {inst}")
+        raw_field = inst.packet 
+        _trace.trace("raw %s", raw_field)
+
+        if isinstance(raw_field, Bits):
+            raw = raw_field.uint & 0xFFFFFFFF
+        elif isinstance(raw_field, bytes):
+            raw = int.from_bytes(raw_field[:4], byteorder="little")
+        elif isinstance(raw_field, int):
+            raw = raw_field & 0xFFFFFFFF
+        elif isinstance(raw_field, str):
+            raw = int(raw_field, 0) & 0xFFFFFFFF
+        elif isinstance(raw_field, list):
+            raw = sum((byte & 0xFF) << (8 * i)
+                      for i, byte in enumerate(raw_field[:4])) & 0xFFFFFFFF
+        else:
+            raise TypeError(f"[{self.name}] Unsupported packet type: {type(raw_field)}")
+
+        # ---------------------------------------------------------
+        # 5) Bitfield decode
+        # ---------------------------------------------------------
+        opcode7 = raw & 0x7F
+        rd      = (raw >> 7)  & 0x3F
+        rs1     = (raw >> 13) & 0x3F
+        mid6    = (raw >> 19) & 0x3F
+        pred    = (raw >> 25) & 0x1F
+
+        info = OPCODE_TABLE[opcode7]
+        inst.opcode = info.op
+        inst.intended_FSU = info.fu
+
+        # register indices stay plain ints, no Bits on the decode path
+        inst.rs1 = rs1
+        inst.rs2 = mid6
+        inst.rd  = rd
+
+        # ---------------------------------------------------------
+        # 5b) Control-type (halt/EOP/MOP/Barrier)
+        # ---------------------------------------------------------
+        EOP_bit     = (raw >> 31) & 0x1
+        MOP_bit     = (raw >> 30) & 0x1
+        Barrier_bit = (raw >> 29) & 0x1
+
+        inst.type = None
+        if info.op is H_Op.HALT:
+            inst.type = DecodeType.halt
+        elif EOP_bit == 1:
+            inst.type = DecodeType.EOP
+        elif MOP_bit == 1:
+            inst.type = DecodeType.MOP
+        elif Barrier_bit == 1:
+            inst.type = DecodeType.Barrier
+
+        # ---------------------------------------------------------
+        # 6) Predicate register file lookup
+        # ---------------------------------------------------------
+        pred_mask = self.prf.read_predicate(
+            prf_rd_en=1,
+            prf_rd_wsel=inst.warp,
+            prf_rd_psel=pred,
+            prf_neg=0
+        )
+
+        if pred_mask is not None:
+            inst.pred &= pred_mask  # lanes of the warp's current SIMT split that are predicated on
+
+        # ---------------------------------------------------------
+        # 7) Optional write-forwarding to next stage
+        # ---------------------------------------------------------
+        for name, f in self.forward_ifs_write.items():
+            f.push({
+                "decoded": True,
+                "type": inst.type,
+                "pc": inst.pc,
+                "warp": inst.warp,
+            })
+
+        # ---------------------------------------------------------
+        # 8) Bookkeeping + send result forward
+        # ---------------------------------------------------------
+        global global_cycle
+        inst.stage_entry.setdefault("Decode", global_cycle)
+        inst.stage_exit["Decode"] = global_cycle + 1
+        inst.issued_cycle = inst.issued_cycle or global_cycle
+
+        self.behind_latch.pop()
+        self.send_output(inst)
+        _trace.debug("[%s] Decoded instruction. Updated inst packed is %s", self.name, inst)
+        return inst
+
+    def tick(self, cycle: int) -> Optional[int]:
+        global global_cycle
+        global_cycle = cycle
+        self.compute()
+        return cycle + 1 if self.behind_latch.valid else None  # nothing to decode until the I$ pushes
@@ -1,47 +1,57 @@
-from base import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
-from Memory import Mem
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+from base_class import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 from collections import deque
 from datetime import datetime
-from isa_packets import ISA_PACKETS
 from bitstring import Bits 
+from common import trace
 global_cycle = 0
 
+_trace = trace.channel("prf")
+
 class PredicateRegFile():
+    """
+    Predicates of every warp as 32-bit ints, bit i = lane i.
+
+    Only the positive mask is stored; a negated read (prf_neg=1) XORs it with
+    the all-lanes mask, so a write is a single int store.
+    """
     def __init__(self, num_preds_per_warp: int, num_warps: int):
         num_cols = num_preds_per_warp *2 # the number of 
         self.num_threads = 32
+        self.full_mask = (1 << self.num_threads) - 1
 
-        # 2D structure: warp -> predicate -> [bits per thread]
-        self.reg_file = [
-            [[[False] * self.num_threads, [False] * self.num_threads]
-              for _ in range(num_cols)]
-            for _ in range(num_warps)
-        ]
+        # 2D structure: warp -> predicate -> lane mask, every lane starts enabled as in the emulator
+        self.reg_file = [[self.full_mask] * num_cols for _ in range(num_warps)]
     
-    def read_predicate(self, prf_rd_en: int, prf_rd_wsel: int, prf_rd_psel: int, prf_neg: int):
+    def read_predicate(self, prf_rd_en: int, prf_rd_wsel: int, prf_rd_psel: int, prf_neg: int) -> Optional[int]:
         "Predicate register file reads by selecting a 1 from 32 warps, 1 from 16 predicates,"
         " and whether it wants the inverted version or not..."
 
         if (prf_rd_en):
-            print("Reading PRF: ", prf_rd_wsel, prf_rd_psel, prf_neg)
-            print("Max indices: ", len(self.reg_file), len(self.reg_file[0]), len(self.reg_file[0][0]))
-            return self.reg_file[prf_rd_wsel][prf_rd_psel][prf_neg]
+            _trace.trace("Reading PRF: %d %d %d", prf_rd_wsel, prf_rd_psel, prf_neg)
+            mask = self.reg_file[prf_rd_wsel][prf_rd_psel]
+            return mask ^ self.full_mask if prf_neg else mask
         else: 
             return None
     
     def write_predicate(self, prf_wr_en: int, prf_wr_wsel: int, prf_wr_psel: int, prf_wr_data):
-        # the write will autopopulate the negated version in the table)
+        # the negated version is derived on read
         if (prf_wr_en):
-                # Convert int to bit array if needed
-            if isinstance(prf_wr_data, int):
-                bits = [(prf_wr_data >> i) & 1 == 1 for i in range(self.num_threads)]
-            else:
-                bits = prf_wr_data  # assume already a list of bools
+            if not isinstance(prf_wr_data, int):
+                prf_wr_data = sum(1 << i for i, b in enumerate(prf_wr_data) if b)  # list of bools
+            self.reg_file[prf_wr_wsel][prf_wr_psel] = prf_wr_data & self.full_mask
+
+    def popcount(self, wsel: int, psel: int, neg: int = 0) -> int:
+        return bin(self.read_predicate(1, wsel, psel, neg)).count("1")
 
-            # Store positive version
-            self.reg_file[prf_wr_wsel][prf_wr_psel][0] = bits
-            # Store negated version
-            self.reg_file[prf_wr_wsel][prf_wr_psel][1] = [not b for b in bits]
+    def any(self, wsel: int, psel: int, neg: int = 0) -> bool:
+        return self.read_predicate(1, wsel, psel, neg) != 0
 
+    def all(self, wsel: int, psel: int, neg: int = 0) -> bool:
+        return self.read_predicate(1, wsel, psel, neg) == self.full_mask
@@ -4,9 +4,30 @@ from pathlib import Path
 import atexit
 from bitstring import Bits
 
+_PROJECT_ROOT = Path(__file__).resolve().parents[3]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from common import trace
+from common.mem_image import (Segment, is_image, load_image, open_dump_stream, segments_from_pages,
+                               write_dump_record, write_image)
+
+_trace = trace.channel("mem")
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT  # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+
 class Mem:
     def __init__(self, start_pc: int, input_file: str, fmt: str = "bin"):
-        self.memory: dict[int, int] = {}
+        # page number -> 4 KiB bytearray page, allocated on first write
+        self.pages: dict[int, memoryview] = {}
+        self.segments: list[Segment] = []  # set when loading a binary image
+        self._mappings = []  # image mmaps that pages may point into
+        self.dirty: set[int] = set()  # pages written since load / the last stream flush
+        self.dump_path = "memsim.hex"  # None disables the dump at exit
+        self.dump_fmt = "hex"
+        self._stream = None
         self.format = fmt
         self.start_pc = int(start_pc)
 
@@ -14,8 +35,15 @@ class Mem:
         if not p.exists():
             raise FileNotFoundError(f"Program file not found: {p}")
 
+        if is_image(p):
+            self.load_image(p)
+            self.dirty.clear()
+            atexit.register(self.dump_on_exit)
+            return
+
         addr = self.start_pc
         endianness = "little"
+        image = bytearray()
 
         with p.open("r", encoding="utf-8") as f:
             for line_no, raw in enumerate(f, start=1):
@@ -39,54 +67,116 @@ class Mem:
                 else:
                     raise ValueError("Unknown format type (use 'hex' or 'bin')")
 
-                if endianness == "little":
-                    b0 = (word >> 0) & 0xFF
-                    b1 = (word >> 8) & 0xFF
-                    b2 = (word >> 16) & 0xFF
-                    b3 = (word >> 24) & 0xFF
+                image += word.to_bytes(4, endianness)
+
+        self.write_block(addr, image)
+        self.dirty.clear()
+        atexit.register(self.dump_on_exit)
+
+    def _page(self, page_no: int) -> memoryview:
+        page = self.pages.get(page_no)
+        if page is None:
+            page = memoryview(bytearray(PAGE_SIZE))
+            self.pages[page_no] = page
+        return page
+
+    def load_image(self, path):
+        """Place the segments of a binary image; whole pages stay in the copy-on-write mapping."""
+        mapping, segments = load_image(path)
+        self._mappings.append(mapping)
+        self.segments.extend(segments)
+        for seg in segments:
+            pos = 0
+            while pos < len(seg.data):
+                off = (seg.addr + pos) & PAGE_MASK
+                chunk = min(len(seg.data) - pos, PAGE_SIZE - off)
+                if chunk == PAGE_SIZE:
+                    self.pages[(seg.addr + pos) >> PAGE_SHIFT] = seg.data[pos:pos + PAGE_SIZE]
                 else:
-                    b3 = (word >> 0) & 0xFF
-                    b2 = (word >> 8) & 0xFF
-                    b1 = (word >> 16) & 0xFF
-                    b0 = (word >> 24) & 0xFF
+                    self.write_block(seg.addr + pos, seg.data[pos:pos + chunk])
+                pos += chunk
 
-                self.memory[addr + 0] = b0
-                self.memory[addr + 1] = b1
-                self.memory[addr + 2] = b2
-                self.memory[addr + 3] = b3
-                addr += 4
+    def read_block(self, addr: int, n: int) -> bytes:
+        """Read n bytes starting at addr; bytes never written read as zero."""
+        addr, n = int(addr), int(n)
+        off = addr & PAGE_MASK
+        if off + n <= PAGE_SIZE:
+            page = self.pages.get(addr >> PAGE_SHIFT)
+            return bytes(n) if page is None else page[off:off + n].tobytes()
+        out = bytearray(n)
+        pos = 0
+        while pos < n:
+            off = (addr + pos) & PAGE_MASK
+            chunk = min(n - pos, PAGE_SIZE - off)
+            page = self.pages.get((addr + pos) >> PAGE_SHIFT)
+            if page is not None:
+                out[pos:pos + chunk] = page[off:off + chunk]
+            pos += chunk
+        return bytes(out)
 
-        atexit.register(self.dump_on_exit)
+    def write_block(self, addr: int, data: bytes):
+        """Write a run of bytes starting at addr, allocating pages as needed."""
+        addr = int(addr)
+        n = len(data)
+        pos = 0
+        while pos < n:
+            off = (addr + pos) & PAGE_MASK
+            chunk = min(n - pos, PAGE_SIZE - off)
+            page_no = (addr + pos) >> PAGE_SHIFT
+            self._page(page_no)[off:off + chunk] = data[pos:pos + chunk]
+            self.dirty.add(page_no)
+            pos += chunk
 
     def read(self, addr: int, size: int = 4) -> Bits:
-        byte_addr = int(addr)
-        data = bytes(self.memory.get(byte_addr + i, 0) & 0xFF for i in range(int(size)))
-        return Bits(bytes=data)
+        return Bits(bytes=self.read_block(addr, size))
 
     def write(self, addr: int, data: Bits, bytes_t: int):
-        byte_addr = int(addr)
-        b = data.tobytes()[:int(bytes_t)]
-        for i, val in enumerate(b):
-            self.memory[byte_addr + i] = val & 0xFF
+        self.write_block(addr, data.tobytes()[:int(bytes_t)])
+
+    def start_stream(self, path, every: int):
+        """Append pages dirtied since the last flush to `path` whenever checkpoint(cycle) is `every` cycles past it."""
+        self._stream = open_dump_stream(path)
+        self._stream_every = every
+        self._last_flush = 0
+
+    def checkpoint(self, cycle: int):
+        if self._stream is not None and cycle - self._last_flush >= self._stream_every:
+            self.flush_dirty(cycle)
+
+    def flush_dirty(self, cycle: int):
+        for page_no in sorted(self.dirty):
+            write_dump_record(self._stream, cycle, page_no << PAGE_SHIFT, self.pages[page_no])
+        self._stream.flush()
+        self.dirty.clear()
+        self._last_flush = cycle
 
     def dump_on_exit(self):
         try:
-            self.dump("memsim.hex")
-        except Exception:
-            print("[Mem] dump failed")
+            if self._stream is not None:
+                self.flush_dirty(self._last_flush + self._stream_every)
+                self._stream.close()
+            if self.dump_path is not None:
+                self.dump(self.dump_path, fmt=self.dump_fmt)
+        except Exception as exc:
+            _trace.error("dump failed: %s", exc)
 
-    def dump(self, path="memsim.hex"):
-        if not self.memory:
+    def dump(self, path="memsim.hex", fmt="hex", dirty_only=False):
+        """Text dump (one non-zero word per line) or, with fmt="bin", a loadable binary image."""
+        page_nos = sorted(self.dirty if dirty_only else self.pages)
+        if fmt == "bin":
+            write_image(path, segments_from_pages({p: self.pages[p] for p in page_nos}, PAGE_SHIFT))
+            return
+        if not page_nos:
             return
-        min_addr = min(self.memory.keys()) & ~0x3
-        max_addr = max(self.memory.keys())
+        zero_page = bytes(PAGE_SIZE)
         with open(path, "w", encoding="utf-8") as f:
-            for base in range(min_addr, max_addr + 1, 4):
-                b0 = self.memory.get(base + 0, 0)
-                b1 = self.memory.get(base + 1, 0)
-                b2 = self.memory.get(base + 2, 0)
-                b3 = self.memory.get(base + 3, 0)
-                if (b0 | b1 | b2 | b3) == 0:
+            for page_no in page_nos:
+                page = self.pages[page_no]
+                if page == zero_page:
                     continue
-                word = (b0 & 0xFF) | ((b1 & 0xFF) << 8) | ((b2 & 0xFF) << 16) | ((b3 & 0xFF) << 24)
-                f.write(f"{base:#010x} {word:#010x}\n")
+                base = page_no << PAGE_SHIFT
+                for off in range(0, PAGE_SIZE, 4):
+                    word = int.from_bytes(page[off:off + 4], "little")
+                    if word == 0:
+                        continue
+                    f.write(f"{base + off:#010x} {word:#010x}\n")
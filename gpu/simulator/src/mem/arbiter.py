@@ -0,0 +1,97 @@
+"""
+Request arbitration between the ports of a shared resource, picked by name:
+
+    {"policy": "rr" | "priority" | "oldest" | "wfq", "weights": [...], "priorities": [...]}
+
+Ports are numbered in registration order. Each cycle the owner passes the
+requesting ports as (port, valid_since) pairs, in port order, and grant()
+returns the winner. "icache_prio" is kept as an alias of "priority", which
+favours lower port numbers unless priorities are given.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+Candidates = Sequence[Tuple[int, int]]  # (port, cycle its head request became valid)
+
+
+class Arbiter:
+    def __init__(self, num_ports: int, **opts) -> None:
+        self.num_ports = num_ports
+
+    def grant(self, candidates: Candidates) -> int:
+        raise NotImplementedError
+
+
+class RoundRobin(Arbiter):
+    """The first requester after the last winner."""
+
+    def __init__(self, num_ports: int, **opts) -> None:
+        super().__init__(num_ports)
+        self.next = 0
+
+    def grant(self, candidates: Candidates) -> int:
+        port = min(candidates, key=lambda c: (c[0] - self.next) % self.num_ports)[0]
+        self.next = (port + 1) % self.num_ports
+        return port
+
+
+class FixedPriority(Arbiter):
+    """Highest priority wins; priorities default to port order (port 0 highest)."""
+
+    def __init__(self, num_ports: int, priorities: Optional[List[int]] = None, **opts) -> None:
+        super().__init__(num_ports)
+        if priorities is not None and len(priorities) != num_ports:
+            raise ValueError(f"need one priority per port, got {len(priorities)} for {num_ports} ports")
+        self.priorities = list(priorities) if priorities is not None else [-p for p in range(num_ports)]
+
+    def grant(self, candidates: Candidates) -> int:
+        return max(candidates, key=lambda c: (self.priorities[c[0]], -c[0]))[0]
+
+
+class OldestFirst(Arbiter):
+    """The request that has waited longest, ties to the lower port."""
+
+    def grant(self, candidates: Candidates) -> int:
+        return min(candidates, key=lambda c: (c[1], c[0]))[0]
+
+
+class WeightedFair(Arbiter):
+    """
+    Weighted fair share: every grant advances the port's virtual time by
+    1 / weight and the requester with the smallest virtual time wins. A port
+    that was idle restarts from the virtual time of the last grant, so it can't
+    bank credit.
+    """
+
+    def __init__(self, num_ports: int, weights: Optional[List[float]] = None, **opts) -> None:
+        super().__init__(num_ports)
+        weights = list(weights) if weights is not None else [1] * num_ports
+        if len(weights) != num_ports or min(weights) <= 0:
+            raise ValueError(f"need one positive weight per port, got {weights} for {num_ports} ports")
+        self.weights = weights
+        self.vtime = [0.0] * num_ports
+        self.now = 0.0  # virtual time of the last grant
+
+    def grant(self, candidates: Candidates) -> int:
+        for p, _ in candidates:
+            self.vtime[p] = max(self.vtime[p], self.now)
+        port = min(candidates, key=lambda c: (self.vtime[c[0]], c[0]))[0]
+        self.now = self.vtime[port]
+        self.vtime[port] += 1 / self.weights[port]
+        return port
+
+
+ARBITERS: Dict[str, Type[Arbiter]] = {
+    "rr": RoundRobin,
+    "priority": FixedPriority,
+    "icache_prio": FixedPriority,
+    "oldest": OldestFirst,
+    "wfq": WeightedFair,
+}
+
+
+def make_arbiter(name: str, num_ports: int, **opts) -> Arbiter:
+    try:
+        cls = ARBITERS[name.lower()]
+    except KeyError:
+        raise ValueError(f"unknown arbitration policy {name!r}, pick one of {sorted(ARBITERS)}") from None
+    return cls(num_ports, **opts)
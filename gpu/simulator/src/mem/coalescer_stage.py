@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+from base_class import LatchIF, Stage, Instruction, dCacheRequest
+from typing import Any, Dict, List, Optional, Tuple
+from bitstring import Bits
+from common import trace
+from common.coalesce import Coalescer
+
+_trace = trace.channel("coalesce")
+
+# opcode name -> (bytes per lane, dCacheRequest size, rw_mode)
+_MEM_OPS = {
+    "LW": (4, "word", "read"), "LH": (2, "half", "read"), "LB": (1, "byte", "read"),
+    "SW": (4, "word", "write"), "SH": (2, "half", "write"), "SB": (1, "byte", "write"),
+}
+
+
+def _int(v) -> int:
+    return v.int if isinstance(v, Bits) else int(v)
+
+
+def lane_accesses(inst: Instruction) -> Tuple[int, List[int], int, int, str, str]:
+    """(pc, lane addresses, active lane mask, bytes per lane, dCacheRequest size, rw_mode) of a warp load/store."""
+    name = getattr(inst.opcode, "name", None)
+    if name not in _MEM_OPS:
+        raise ValueError(f"{inst.opcode} is not a load or store")
+    nbytes, size, rw_mode = _MEM_OPS[name]
+    offset = _int(inst.imm) if inst.imm is not None else 0
+    addrs = [_int(base) + offset for base in inst.rdat1]
+    mask = inst.pred & ((1 << len(addrs)) - 1)
+    pc = inst.pc.uint if isinstance(inst.pc, Bits) else int(inst.pc)
+    return pc, addrs, mask, nbytes, size, rw_mode
+
+
+class CoalescerStage(Stage):
+    """
+    Coalescing unit in front of the D$.
+
+    - behind_latch: one warp memory Instruction (LW/LH/LB/SW/SH/SB). rdat1 holds
+      every lane's base address, imm the offset, pred the active lanes (bit i =
+      lane i) and rdat2 the store data.
+    - ahead_latch: the D$ batch for it, one dCacheRequest per aligned segment
+      (see common/coalesce.py) carrying the lanes it serves, uuid = inst.iid.
+    - One instruction per cycle. coalesce_config picks the segment sizes:
+      {"segment": 128, "min_segment": 32}; segments must not span D$ lines.
+    - report() gives per-PC transactions, efficiency and the transactions per
+      access histogram.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        coalesce_config: Optional[Dict[str, int]] = None,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        cfg = coalesce_config or {}
+        self.coalescer = Coalescer(cfg.get("segment", 128), cfg.get("min_segment", 32))
+        self.cycle = 0
+
+    def split(self, inst: Instruction) -> List[dCacheRequest]:
+        pc, addrs, mask, nbytes, size, rw_mode = lane_accesses(inst)
+        batch = []
+        for seg_addr, seg_bytes, lanes in self.coalescer.coalesce(pc, addrs, mask, nbytes):
+            served = [lane for lane in range(len(addrs)) if (lanes >> lane) & 1]
+            batch.append(dCacheRequest(
+                addr_val=seg_addr, rw_mode=rw_mode, size=size, uuid=inst.iid,
+                lanes=[(lane, addrs[lane], _int(inst.rdat2[lane]) if rw_mode == "write" else None)
+                       for lane in served],
+            ))
+            _trace.trace("[%s] pc=0x%X segment 0x%X+%d lanes=0x%08X", self.name, pc, seg_addr, seg_bytes, lanes)
+        return batch
+
+    def compute(self, input_data: Optional[Any] = None):
+        if self.behind_latch.valid and self.ahead_latch.ready_for_push():
+            inst = self.behind_latch.pop()
+            inst.mark_stage_enter(self.name, self.cycle)
+            batch = self.split(inst)
+            if batch:  # no active lane, nothing to send
+                self.ahead_latch.push(batch)
+            inst.mark_stage_exit(self.name, self.cycle)
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        return None  # wakes up on a new instruction or when the D$ takes the batch
+
+    def report(self) -> Dict[int, Dict]:
+        return self.coalescer.report()
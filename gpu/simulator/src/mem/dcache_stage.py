@@ -0,0 +1,285 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+import heapq
+from base_class import (LatchIF, Stage, Addr, dCacheRequest, dMemResponse, dCacheFrame, MSHREntry,
+                        NUM_BANKS, NUM_SETS_PER_BANK, NUM_WAYS, BLOCK_SIZE_WORDS, WORD_SIZE_BYTES,
+                        BYTE_OFF_BIT_LEN, MSHR_BUFFER_LEN, HIT_LATENCY)
+from collections import deque
+from typing import Any, Dict, List, Optional
+from bitstring import Bits
+from common import trace
+
+_trace = trace.channel("dcache")
+
+_SIZE_BYTES = {"word": 4, "half": 2, "byte": 1}
+
+
+class DCacheStage(Stage):
+    """
+    Lockup-free, banked, write-back / write-allocate data cache.
+
+    - behind_latch: a dCacheRequest, or a list of them issued together (e.g. the
+      segments of one coalesced warp access, each carrying its lanes and answered
+      with {lane: value} for loads). Each bank has one port: requests of
+      a batch that land on the same bank are served in later cycles (bank conflict)
+      and the latch is only popped once the whole batch has been accepted.
+    - Misses allocate an MSHREntry in the bank's MSHR buffer (MSHR_BUFFER_LEN per
+      bank); later misses to the same block merge into it. A full buffer stalls
+      the request.
+    - Fills and dirty-victim write-backs go to the MemController as request dicts
+      through mem_req_if; responses come back on mem_resp_if.
+    - ahead_latch: one dMemResponse per cycle. Hits are answered HIT_LATENCY cycles
+      after they are accepted, misses (replay=True) once their fill lands.
+    - A request with halt=True waits for outstanding misses, writes every dirty
+      line back and answers with flushed=True.
+
+    Standalone only: nothing in the default pipeline sends loads or stores here
+    (FUPoolStage's LDST unit is a fixed-latency stand-in), so the D$ is driven
+    directly through behind_latch, as the tests do.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        mem_req_if: LatchIF,
+        mem_resp_if: LatchIF,
+        cache_config: Optional[Dict[str, int]] = None,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        cfg = cache_config or {}
+        self.num_banks = cfg.get("num_banks", NUM_BANKS)
+        self.sets_per_bank = cfg.get("sets_per_bank", NUM_SETS_PER_BANK)
+        self.assoc = cfg.get("associativity", NUM_WAYS)
+        self.block_words = cfg.get("block_words", BLOCK_SIZE_WORDS)
+        self.mshr_entries = cfg.get("mshr_entries", MSHR_BUFFER_LEN)
+        self.hit_latency = cfg.get("hit_latency", HIT_LATENCY)
+        self.block_bytes = self.block_words * WORD_SIZE_BYTES
+        self.block_shift = BYTE_OFF_BIT_LEN + (self.block_words - 1).bit_length()
+
+        # banks[bank][set][way]; lru[bank][set] lists ways least recently used first
+        self.banks = [[[dCacheFrame(block=[0] * self.block_words) for _ in range(self.assoc)]
+                       for _ in range(self.sets_per_bank)] for _ in range(self.num_banks)]
+        self.lru = [[list(range(self.assoc)) for _ in range(self.sets_per_bank)] for _ in range(self.num_banks)]
+        self.mshrs: List[Dict[int, MSHREntry]] = [{} for _ in range(self.num_banks)]  # block addr -> entry
+
+        self.mem_req_if = mem_req_if
+        self.mem_resp_if = mem_resp_if
+        self.mem_out: deque = deque()  # fills and write-backs waiting for mem_req_if
+        self.responses: list = []       # heap of (ready cycle, seq, dMemResponse)
+        self.batch: List[dCacheRequest] = []  # requests of the current input still to be accepted
+        self.flushing: Optional[dCacheRequest] = None
+        self._seq = 0
+        self.cycle = 0
+
+        self.stats = [{"hits": 0, "misses": 0, "secondary_misses": 0, "bank_conflicts": 0,
+                       "mshr_stalls": 0, "writebacks": 0} for _ in range(self.num_banks)]
+
+    # ---------------- helpers ----------------
+    def _addr(self, addr_val: int) -> Addr:
+        return Addr(addr_val, self.num_banks, self.sets_per_bank, self.block_words)
+
+    def _respond(self, resp: dMemResponse, delay: int = 0) -> None:
+        heapq.heappush(self.responses, (self.cycle + delay, self._seq, resp))
+        self._seq += 1
+
+    def _lookup(self, a: Addr) -> Optional[int]:
+        for way, frame in enumerate(self.banks[a.bank_id][a.set_index]):
+            if frame.valid and frame.tag == a.tag:
+                return way
+        return None
+
+    def _touch(self, a: Addr, way: int) -> None:
+        order = self.lru[a.bank_id][a.set_index]
+        order.remove(way)
+        order.append(way)
+
+    def _access(self, req: dCacheRequest, a: Addr, frame: dCacheFrame) -> Any:
+        """
+        Read or write one word/half/byte of a resident line, returns the loaded value for reads.
+        A coalesced segment (req.lanes) accesses every lane in order and returns {lane: value}.
+        """
+        if req.lanes is not None:
+            values = {}
+            for lane, addr_val, store_value in req.lanes:
+                values[lane] = self._access_one(req.rw_mode, req.size, store_value, self._addr(addr_val), frame)
+            return None if req.rw_mode == "write" else values
+        return self._access_one(req.rw_mode, req.size, req.store_value, a, frame)
+
+    def _access_one(self, rw_mode: str, size: str, store_value: Optional[int], a: Addr, frame: dCacheFrame) -> Optional[int]:
+        nbytes = _SIZE_BYTES.get(size, 4)
+        shift = 8 * a.byte_offset
+        mask = ((1 << (8 * nbytes)) - 1) << shift
+        if rw_mode == "write":
+            value = (int(store_value or 0) << shift) & mask
+            frame.block[a.block_offset] = (frame.block[a.block_offset] & ~mask & 0xFFFFFFFF) | value
+            frame.dirty = True
+            return None
+        return (frame.block[a.block_offset] & mask) >> shift
+
+    def _mem_request(self, rw_mode: str, block_addr_val: int, data=None) -> None:
+        self.mem_out.append({
+            "addr": block_addr_val << self.block_shift,
+            "size": self.block_bytes,
+            "uuid": block_addr_val,
+            "pc": 0,
+            "rw_mode": rw_mode,
+            "data": data,
+        })
+
+    def _writeback(self, bank: int, set_index: int, frame: dCacheFrame) -> None:
+        block_addr_val = (((frame.tag * self.sets_per_bank) + set_index) * self.num_banks) + bank
+        data = b"".join(w.to_bytes(WORD_SIZE_BYTES, "little") for w in frame.block)
+        self._mem_request("write", block_addr_val, data)
+        self.stats[bank]["writebacks"] += 1
+        frame.dirty = False
+
+    # ---------------- fills ----------------
+    def _fill(self, resp: dict) -> None:
+        block_addr_val = int(resp["addr"]) >> self.block_shift
+        a = self._addr(int(resp["addr"]))
+        entry = self.mshrs[a.bank_id].pop(block_addr_val, None)
+        if entry is None:
+            _trace.warn("[%s] fill for block 0x%X without an MSHR", self.name, block_addr_val)
+            return
+
+        way = self.lru[a.bank_id][a.set_index][0]
+        victim = self.banks[a.bank_id][a.set_index][way]
+        if victim.valid and victim.dirty:
+            self._writeback(a.bank_id, a.set_index, victim)
+
+        raw = resp["data"].tobytes() if isinstance(resp["data"], Bits) else bytes(resp["data"])
+        victim.block = [int.from_bytes(raw[i:i + WORD_SIZE_BYTES], "little")
+                        for i in range(0, self.block_bytes, WORD_SIZE_BYTES)]
+        victim.tag = a.tag
+        victim.valid = True
+        victim.dirty = False
+        self._touch(a, way)
+        _trace.debug("[%s] FILL block=0x%X bank=%d set=%d way=%d", self.name, block_addr_val, a.bank_id, a.set_index, way)
+
+        # replay everything that merged into the miss, in order, so stores land before later loads
+        for i, req in enumerate(entry.waiting):
+            data = self._access(req, self._addr(req.addr_val), victim)
+            self._respond(dMemResponse(type="read" if req.rw_mode != "write" else "write", req=req,
+                                       address=req.addr_val, replay=True, is_secondary=i > 0,
+                                       data=data, miss=True, uuid=req.uuid))
+
+    # ---------------- requests ----------------
+    def _accept(self, req: dCacheRequest, busy_banks: set) -> bool:
+        """Try to serve one request this cycle, False if it has to wait."""
+        a = self._addr(req.addr_val)
+        bank = a.bank_id
+        stats = self.stats[bank]
+        if bank in busy_banks:
+            stats["bank_conflicts"] += 1
+            return False
+
+        way = self._lookup(a)
+        if way is not None:
+            busy_banks.add(bank)
+            frame = self.banks[bank][a.set_index][way]
+            data = self._access(req, a, frame)
+            self._touch(a, way)
+            stats["hits"] += 1
+            self._respond(dMemResponse(type="read" if req.rw_mode != "write" else "write", req=req,
+                                       address=req.addr_val, data=data, hit=True, uuid=req.uuid),
+                          self.hit_latency)
+            return True
+
+        mshrs = self.mshrs[bank]
+        entry = mshrs.get(a.block_addr_val)
+        if entry is not None:
+            busy_banks.add(bank)
+            entry.waiting.append(req)
+            if req.rw_mode == "write" and req.size == "word" and req.lanes is None:
+                entry.write_status[a.block_offset] = True
+                entry.write_block[a.block_offset] = int(req.store_value or 0)
+            stats["secondary_misses"] += 1
+            return True
+
+        if len(mshrs) >= self.mshr_entries:
+            stats["mshr_stalls"] += 1
+            return False
+
+        busy_banks.add(bank)
+        mshrs[a.block_addr_val] = MSHREntry(uuid=a.block_addr_val, block_addr_val=a.block_addr_val,
+                                            write_status=[False] * self.block_words,
+                                            write_block=[0] * self.block_words,
+                                            original_request=req, waiting=[req])
+        self._mem_request("read", a.block_addr_val)
+        stats["misses"] += 1
+        _trace.debug("[%s] MISS addr=0x%X bank=%d set=%d", self.name, req.addr_val, bank, a.set_index)
+        return True
+
+    def _flush(self) -> bool:
+        """Write back every dirty line once no miss is outstanding, True when the flush is done."""
+        if any(self.mshrs):
+            return False
+        for bank, sets in enumerate(self.banks):
+            for set_index, ways in enumerate(sets):
+                for frame in ways:
+                    if frame.valid and frame.dirty:
+                        self._writeback(bank, set_index, frame)
+        self._respond(dMemResponse(type="halt", req=self.flushing, flushed=True, uuid=self.flushing.uuid))
+        return True
+
+    # ---------------- Main compute ----------------
+    def compute(self, input_data: Optional[Any] = None):
+        # 1) one memory response per cycle: fills install a line, write-back acks are dropped
+        fill_bank = None
+        if self.mem_resp_if.valid:
+            resp = self.mem_resp_if.pop()
+            if resp.get("rw_mode") == "read":
+                self._fill(resp)
+                fill_bank = self._addr(int(resp["addr"])).bank_id
+
+        # 2) new requests, one per bank (the filled bank is busy this cycle)
+        if self.flushing is not None:
+            if self._flush():
+                self.flushing = None
+        elif self.batch or self.behind_latch.valid:
+            if not self.batch:
+                payload = self.behind_latch.snoop()
+                self.batch = list(payload) if isinstance(payload, (list, tuple)) else [payload]
+            busy_banks = {fill_bank} if fill_bank is not None else set()
+            waiting = []
+            for req in self.batch:
+                if req.halt:
+                    if waiting:
+                        waiting.append(req)  # a flush goes after the requests ahead of it
+                    else:
+                        self.flushing = req
+                elif not self._accept(req, busy_banks):
+                    waiting.append(req)
+            self.batch = waiting
+            if not self.batch:
+                self.behind_latch.pop()
+
+        # 3) one request to memory, one response to the LSU
+        if self.mem_out and self.mem_req_if.ready_for_push():
+            self.mem_req_if.push(self.mem_out.popleft())
+        if self.responses and self.responses[0][0] <= self.cycle and self.ahead_latch.ready_for_push():
+            self.ahead_latch.push(heapq.heappop(self.responses)[2])
+
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        if self.mem_resp_if.valid or self.batch or self.flushing is not None or self.mem_out \
+                or (self.behind_latch.valid and self.flushing is None):
+            return cycle + 1
+        if self.responses:
+            return max(cycle + 1, self.responses[0][0])
+        return None  # idle, or waiting on fills from the MemController
+
+    # ---------------- Counters ----------------
+    def report(self) -> Dict[str, Any]:
+        total = {k: sum(b[k] for b in self.stats) for k in self.stats[0]}
+        accesses = total["hits"] + total["misses"] + total["secondary_misses"]
+        total["hit_rate"] = total["hits"] / accesses if accesses else 0.0
+        return {"banks": self.stats, "total": total}
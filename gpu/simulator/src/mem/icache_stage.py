@@ -2,17 +2,19 @@
 import sys
 from pathlib import Path
 
-parent_dir = Path(__file__).resolve().parent.parent
-sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
 
-from base import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
+from base_class import ForwardingIF, LatchIF, Stage, Instruction, ICacheEntry, MemRequest, FetchRequest, DecodeType
 from Memory import Mem
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 from collections import deque
 from datetime import datetime
-from isa_packets import ISA_PACKETS
 from bitstring import Bits 
+from common import trace
+from replacement import make_policy
+
+_trace = trace.channel("icache")
 
 
 class ICacheStage(Stage):
@@ -39,25 +41,55 @@ class ICacheStage(Stage):
         self.assoc = cache_config.get("associativity", 4)
         self.num_sets = self.cache_size // (self.block_size * self.assoc)
 
-        self.cache = {i: [] for i in range(self.num_sets)}
+        # preallocated tag/data arrays per set, plus tag -> way for O(1) hit detection
+        self.tags: List[List[Optional[int]]] = [[None] * self.assoc for _ in range(self.num_sets)]
+        self.data: List[List[Optional[bytes]]] = [[None] * self.assoc for _ in range(self.num_sets)]
+        self.way_of: List[Dict[int, int]] = [{} for _ in range(self.num_sets)]
+        self.policy = make_policy(cache_config.get("replacement", "lru"), self.num_sets, self.assoc,
+                                  seed=cache_config.get("seed", 0))
+        self.hits = 0
+        self.misses = 0
 
         self.mem_req_if = mem_req_if
         self.mem_resp_if = mem_resp_if
 
-        self.pending_fetch: Optional[Instruction] = None
-        self.stalled = False
+        # non-blocking: misses park in MSHRs (block -> waiting fetches) while other warps keep hitting
+        self.mshr_entries = cache_config.get("mshr_entries", 4)
+        self.prefetch_lines = cache_config.get("prefetch_lines", 0)  # next-N-line prefetch on a demand miss
+        self.mshrs: Dict[int, List[Instruction]] = {}
+        self.mem_out: deque = deque()    # fill requests waiting for mem_req_if
+        self.ready_q: deque = deque()    # fetched instructions waiting for ahead_latch
+        self.prefetched: set = set()     # blocks filled by the prefetcher and not used yet
+        self.waiting_warps: frozenset = frozenset()
+        self.held = False                # the fetch in behind_latch is waiting for a free MSHR
+
+        self.hits_under_miss = 0
+        self.mshr_merges = 0
+        self.mshr_stalls = 0             # fetches that had to wait for a free MSHR
+        self.prefetches = 0
+        self.useful_prefetches = 0
         self.cycle = 0
 
+    @property
+    def stalled(self) -> bool:
+        """True while every MSHR is busy, no further miss can be taken."""
+        return len(self.mshrs) >= self.mshr_entries
+
     # ---------------- Cache helpers ----------------
     def _fill_cache_line(self, set_idx: int, tag: int, data_bits):
-        ways = self.cache[set_idx]
-        if len(ways) < self.assoc:
-            ways.append(ICacheEntry(tag, data_bits, valid=True))
+        way_of = self.way_of[set_idx]
+        tags = self.tags[set_idx]
+        if tag in way_of:
+            way = way_of[tag]
+        elif len(way_of) < self.assoc:
+            way = tags.index(None)  # cold set: fill the free ways first
         else:
-            victim = min(ways, key=lambda w: w.last_used)
-            victim.tag = tag
-            victim.data = data_bits
-            victim.valid = True
+            way = self.policy.victim(set_idx)
+            del way_of[tags[way]]
+        tags[way] = tag
+        way_of[tag] = way
+        self.data[set_idx][way] = data_bits.tobytes() if isinstance(data_bits, Bits) else bytes(data_bits)
+        self.policy.insert(set_idx, way)
 
     def _send_ihit(self, val: bool):
         if "ICache_Decode_Ihit" in self.forward_ifs_write:
@@ -71,98 +103,158 @@ class ICacheStage(Stage):
         tag = block // self.num_sets
         return set_idx, tag, block
 
-    def _lookup(self, pc_int: int):
+    def _lookup(self, pc_int: int) -> Optional[bytes]:
+        """The cached block holding pc_int (and a policy touch), or None on a miss."""
         set_idx, tag, _ = self._addr_decode(pc_int)
-        for line in self.cache[set_idx]:
-            if line.valid and line.tag == tag:
-                line.last_used = self.cycle
-                return line
-        return None
+        way = self.way_of[set_idx].get(tag)
+        if way is None:
+            return None
+        self.policy.touch(set_idx, way)
+        return self.data[set_idx][way]
+
+    def _word_at(self, block: bytes, pc_int: int) -> Bits:
+        """The 32-bit instruction word at pc_int out of a cached block (little endian in memory)."""
+        off = pc_int % self.block_size
+        return Bits(uint=int.from_bytes(block[off:off + 4], "little"), length=32)
 
     def _fill_from_response(self, pc_int: int, data_bits):
         set_idx, tag, _ = self._addr_decode(pc_int)
         self._fill_cache_line(set_idx, tag, data_bits)
-        print(f"[ICache] FILL complete: pc=0x{pc_int:X}")
+        _trace.debug("FILL complete: pc=0x%X", pc_int)
+
+    def _request_block(self, block: int, inst: Optional[Instruction] = None) -> None:
+        pc_int = inst.pc.uint if inst is not None else block * self.block_size
+        self.mem_out.append({
+            "addr": block * self.block_size,
+            "size": self.block_size,
+            "uuid": block,
+            "pc": pc_int,
+            "warp": inst.warp if inst is not None else 0,
+            "warpGroup": inst.warpGroup if inst is not None else None,
+            "inst": inst,
+        })
+
+    def _prefetch(self, block: int) -> None:
+        for nxt in range(block + 1, block + 1 + self.prefetch_lines):
+            if len(self.mshrs) >= self.mshr_entries:
+                return  # demand misses keep priority over prefetches
+            set_idx, tag = nxt % self.num_sets, nxt // self.num_sets
+            if nxt in self.mshrs or tag in self.way_of[set_idx]:
+                continue
+            self.mshrs[nxt] = []
+            self._request_block(nxt)
+            self.prefetches += 1
+            _trace.debug("PREFETCH block=0x%X", nxt)
+
+    def _update_waiting(self) -> None:
+        waiting = frozenset(i.warp for insts in self.mshrs.values() for i in insts)
+        if waiting != self.waiting_warps:
+            self.waiting_warps = waiting
+            if "ICache_Scheduler" in self.forward_ifs_write:
+                self.forward_ifs_write["ICache_Scheduler"].push(waiting)
+
+    def _deliver(self, inst: Instruction) -> None:
+        if not self.ready_q and self.ahead_latch.ready_for_push():
+            self.ahead_latch.push(inst)
+        else:
+            self.ready_q.append(inst)
 
     # ---------------- Main compute ----------------
     def compute(self, input_data=None):
-        print(f"\n[ICache] cycle={self.cycle} stalled={self.stalled}")
+        _trace.trace("cycle=%d mshrs=%d", self.cycle, len(self.mshrs))
 
         # STEP 1: Handle incoming memory response (dict FillResponse)
         if self.mem_resp_if.valid:
             resp = self.mem_resp_if.pop()
-            print("Got this in call:,", resp)
-            assert isinstance(resp, Instruction), f"Expected FillResponse dict, got {type(resp)}"
-            pc_int_resp = int(resp.pc)
-            data_bits = Bits(resp.packet)
+            _trace.trace("Got this in call: %s", resp)
+            if isinstance(resp, dict):  # response dict straight from the MemController
+                uuid, addr, data_bits = resp.get("uuid"), resp["addr"], resp.get("data")
+            else:
+                assert isinstance(resp, Instruction), f"Expected FillResponse dict, got {type(resp)}"
+                uuid, addr, data_bits = resp.iid, resp.pc, Bits(resp.packet)
+            addr = addr.uint if isinstance(addr, Bits) else int(addr)
 
-            print(f"[ICache] Received MemResp uuid={resp.iid} pc=0x{pc_int_resp:X}")
+            _trace.debug("Received MemResp uuid=%s addr=0x%X", uuid, addr)
 
             if data_bits is None:
-                print("[ICache] WARNING: MemResp has no data_bits!")
-
-            self._fill_from_response(pc_int_resp, data_bits)
-
-            # Unstall / notify scheduler
+                _trace.warn("MemResp has no data_bits!")
+
+            self._fill_from_response(addr, data_bits)
+            block = addr // self.block_size
+            waiting = self.mshrs.pop(block, [])
+            if not waiting:
+                self.prefetched.add(block)
+            # the parked fetches of this block go out in arrival order
+            for inst in waiting:
+                inst.packet = self._word_at(self._lookup(inst.pc.uint), inst.pc.uint)
+                self._deliver(inst)
             self._send_ihit(True)
-            self.stalled = False
-            self.pending_fetch = None
+            self._update_waiting()
 
-            # After fill we return this cycle (simple model)
-            self.cycle += 1
-            return
+        # STEP 2: drain fetched instructions, one per cycle
+        if self.ready_q and self.ahead_latch.ready_for_push():
+            self.ahead_latch.push(self.ready_q.popleft())
 
-        # STEP 2: Stall check
-        if self.stalled:
-            print("[ICache] Still stalled, skipping new fetch")
-            self.cycle += 1
-            return
+        # STEP 3: accept one fetch unless the output is backed up
+        if self.behind_latch.valid and not self.ready_q:
+            self._fetch(self.behind_latch.snoop())
 
-        # STEP 3: No new fetch request
-        if not self.behind_latch.valid:
-            self.cycle += 1
-            return
+        # STEP 4: one request to memory per cycle
+        if self.mem_out and self.mem_req_if.ready_for_push():
+            self.mem_req_if.push(self.mem_out.popleft())
 
-        # Instruction comes from previous stage
-        inst: Instruction = self.behind_latch.snoop()
-        pc_int = int(inst.pc) if isinstance(inst.pc, Bits) else int(inst.pc)
+        self.cycle += 1
 
-        # STEP 4: Lookup
+    def _fetch(self, inst: Instruction) -> None:
+        pc_int = inst.pc.uint if isinstance(inst.pc, Bits) else int(inst.pc)
+        set_idx, tag, block = self._addr_decode(pc_int)
+
+        # Lookup
         hit_line = self._lookup(pc_int)
-        if hit_line:
+        if hit_line is not None:
+            self.hits += 1
+            if self.mshrs:
+                self.hits_under_miss += 1
+            if block in self.prefetched:
+                self.prefetched.discard(block)
+                self.useful_prefetches += 1
             self.behind_latch.pop()
-            print(f"[ICache] HIT warp={inst.warp} group={inst.warpGroup} pc=0x{pc_int:X}")
+            self.held = False
+            _trace.debug("HIT warp=%s group=%s pc=0x%X", inst.warp, inst.warpGroup, pc_int)
             self._send_ihit(True)
-
-            inst.packet = hit_line.data
-
-            if self.ahead_latch.ready_for_push():
-                self.ahead_latch.push(inst)
-
-            self.cycle += 1
+            inst.packet = self._word_at(hit_line, pc_int)
+            self._deliver(inst)
             return
 
-        # STEP 5: MISS
-        print(f"[ICache] MISS warp={inst.warp} group={inst.warpGroup} pc=0x{pc_int:X}")
-        self._send_ihit(False)
-        self.stalled = True
-        self.pending_fetch = inst
+        # MISS: merge into an outstanding fill of the same block, or take a free MSHR
+        if block in self.mshrs:
+            self.mshr_merges += 1
+            if not self.mshrs[block]:
+                self.useful_prefetches += 1  # a prefetch in flight covers this demand miss
+        elif len(self.mshrs) >= self.mshr_entries:
+            if not self.held:  # count each held fetch once, however many cycles it waits
+                self.mshr_stalls += 1
+                _trace.trace("MSHRs full, holding pc=0x%X", pc_int)
+            self.held = True
+            return
+        else:
+            self.mshrs[block] = []
+            self._request_block(block, inst)
+            _trace.debug("→ MemReq issued for block=0x%X pc=0x%X", block, pc_int)
 
+        self.misses += 1
+        _trace.debug("MISS warp=%s group=%s pc=0x%X", inst.warp, inst.warpGroup, pc_int)
         self.behind_latch.pop()
-
-        set_idx, tag, block = self._addr_decode(pc_int)
-        block_base = block * self.block_size
-        # Send MemReq as dict (addr is BLOCK INDEX here)
-        self.mem_req_if.push({
-            "addr": block_base,
-            "size": self.block_size,
-            "uuid": block,
-            "pc": pc_int,
-            "warp": inst.warp,
-            "warpGroup": inst.warpGroup,
-            "inst": inst,
-        })
-
-        print(f"[ICache] → MemReq issued for block=0x{block:X} pc=0x{pc_int:X}")
-        self.cycle += 1
-        return
+        self.held = False
+        self.mshrs[block].append(inst)
+        self._send_ihit(False)
+        self._update_waiting()
+        self._prefetch(block)
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        if self.mem_resp_if.valid or self.ready_q or self.mem_out \
+                or (self.behind_latch.valid and not self.held):
+            return cycle + 1
+        return None  # waiting on a fill or on the next fetch, both arrive through a latch
@@ -1,13 +1,26 @@
 import sys
 from pathlib import Path
 
-parent_dir = Path(__file__).resolve().parent.parent
-sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
 
-from base import LatchIF, Stage, Instruction, MemRequest
+from base_class import LatchIF, Stage, Instruction, MemRequest, RAM_LATENCY_CYCLES
 from Memory import Mem
-from typing import Any, Dict, Optional, Deque, Tuple
+from typing import Any, Dict, List, Optional, Deque, Tuple
 from bitstring import Bits
+import heapq
+
+from arbiter import make_arbiter
+
+# DRAM timing used when a dram_config is given, any key can be overridden
+DRAM_DEFAULTS = {
+    "channels": 2,
+    "banks_per_channel": 8,
+    "interleave": 256,        # bytes mapped to one channel/bank before moving to the next
+    "row_size": 2048,         # bytes per row per bank
+    "row_hit_latency": 100,   # cycles for an access to the open row
+    "row_miss_latency": RAM_LATENCY_CYCLES,  # precharge + activate + access
+    "bytes_per_cycle": 32,    # data bus width per channel
+}
 
 
 class MemController(Stage):
@@ -20,10 +33,20 @@ class MemController(Stage):
       the request (capacity gate via max_inflight).
     - If controller is busy, it does NOT pop, so the input latch stays valid and
       upstream naturally stalls via LatchIF.ready_for_push() == False.
-    - Fixed latency model using inflight requests with countdown.
-    - Completes at most ONE request per cycle (pushes one response) to the correct
-      response latch (ic_serve_latch or dc_serve_latch).
-    - policy: "rr" or "icache_prio" controls arbitration when both latches valid.
+    - Every inflight request carries the cycle it is ready on and sits in a
+      deadline-ordered heap (max_inflight deep), so the event kernel can sleep the
+      controller until the next one finishes.
+    - Timing is a fixed `latency`, or with dram_config a DRAM model: requests map
+      to channels/banks, pay a row-buffer hit or miss latency and share a
+      per-channel data bus of bytes_per_cycle (see DRAM_DEFAULTS).
+    - Requests arrive on named ports, each a (request latch, response latch) pair:
+      "icache" and "dcache" from the positional latches, plus any extra `ports`.
+      Responses carry the port name as "src".
+    - Completes at most ONE request per response latch per cycle.
+    - policy picks the arbiter between requesting ports ("rr", "priority",
+      "oldest" or "wfq", see arbiter.py); weights/priorities are in port order.
+    - Per port it counts grants, cycles waited at the head of the request latch
+      and arbitration losses (cycles a valid request lost to another port).
     """
 
     def __init__(
@@ -37,6 +60,10 @@ class MemController(Stage):
         latency: int = 5,
         policy: str = "rr",
         max_inflight: int = 1,  # <= set to 1 for "no queueing" semantics
+        dram_config: Optional[Dict[str, int]] = None,
+        ports: Optional[Dict[str, Tuple[LatchIF, LatchIF]]] = None,
+        weights: Optional[List[float]] = None,
+        priorities: Optional[List[int]] = None,
     ):
         self.name = name
         self.ic_req_latch = ic_req_latch
@@ -49,11 +76,32 @@ class MemController(Stage):
         self.policy = str(policy)
         self.max_inflight = int(max_inflight)
 
-        # inflight requests being serviced by memory backend
-        self.inflight: list[MemRequest] = []
-
-        # RR toggle: 0 prefer I$, 1 prefer D$
-        self.rr = 0
+        # inflight requests being serviced by memory backend, a heap of (ready cycle, seq, MemRequest)
+        self.inflight: list[Tuple[int, int, MemRequest]] = []
+        self._seq = 0
+
+        # DRAM timing (None keeps the fixed `latency` model)
+        self.dram = {**DRAM_DEFAULTS, **dram_config} if dram_config is not None else None
+        if self.dram:
+            channels, banks = self.dram["channels"], self.dram["banks_per_channel"]
+            self.open_row = [[None] * banks for _ in range(channels)]
+            self.bank_free = [[0] * banks for _ in range(channels)]
+            self.bus_free = [0] * channels
+        self.stats = {"reads": 0, "writes": 0, "bytes": 0, "latency_sum": 0, "row_hits": 0, "row_misses": 0}
+
+        # request ports in arbitration order: name -> (request latch, response latch)
+        self.ports: Dict[str, Tuple[LatchIF, LatchIF]] = {
+            "icache": (ic_req_latch, ic_serve_latch),
+            "dcache": (dc_req_latch, dc_serve_latch),
+            **(ports or {}),
+        }
+        self.port_names = list(self.ports)
+        self.arbiter = make_arbiter(self.policy, len(self.port_names), weights=weights, priorities=priorities)
+        self.valid_since: List[Optional[int]] = [None] * len(self.port_names)  # cycle each head request showed up
+        self.port_stats = {name: {"grants": 0, "wait_sum": 0, "max_wait": 0, "lost": 0} for name in self.port_names}
+
+        # advanced once per compute() when stepped directly, set by tick() under the event kernel
+        self.cycle = 0
 
     # -----------------------------
     # Helpers
@@ -93,9 +141,9 @@ class MemController(Stage):
             warp=req_info.get("warp", req_info.get("warp_id", 0)),
             warpGroup=req_info.get("warpGroup", req_info.get("warp_group_id", None)),
             opcode=req_info.get("opcode", None),
-            rs1=req_info.get("rs1", Bits(uint=0, length=5)),
-            rs2=req_info.get("rs2", Bits(uint=0, length=5)),
-            rd=req_info.get("rd", Bits(uint=0, length=5)),
+            rs1=req_info.get("rs1", 0),
+            rs2=req_info.get("rs2", 0),
+            rd=req_info.get("rd", 0),
         )
 
     # compatibility fix for naming conventions used across tests
@@ -113,48 +161,70 @@ class MemController(Stage):
 
         return req
 
+    def _note_arrivals(self) -> None:
+        for i, name in enumerate(self.port_names):
+            req_latch = self.ports[name][0]
+            if req_latch is not None and req_latch.valid and self.valid_since[i] is None:
+                self.valid_since[i] = self.cycle
+
     def _pick_from_inputs(self) -> Optional[dict]:
         """
         Choose one request directly from input latches (no internal request queues).
         IMPORTANT: Only call this when you are ready to accept and start service
         this cycle, because it POPs the chosen latch.
         """
-        ic_valid = bool(self.ic_req_latch and self.ic_req_latch.valid)
-        dc_valid = bool(self.dc_req_latch and self.dc_req_latch.valid)
-
-        if not ic_valid and not dc_valid:
+        candidates = [(i, since) for i, since in enumerate(self.valid_since) if since is not None]
+        if not candidates:
             return None
 
-        if self.policy == "icache_prio":
-            if ic_valid:
-                raw = self.ic_req_latch.pop()
-                return self._normalize_req(raw, "icache")
-            raw = self.dc_req_latch.pop()
-            return self._normalize_req(raw, "dcache")
-
-        # Default: RR when both valid
-        if ic_valid and dc_valid:
-            if self.rr == 0:
-                raw = self.ic_req_latch.pop()
-                chosen = self._normalize_req(raw, "icache")
-            else:
-                raw = self.dc_req_latch.pop()
-                chosen = self._normalize_req(raw, "dcache")
-            self.rr ^= 1
-            return chosen
-
-        # Only one side valid
-        if ic_valid:
-            raw = self.ic_req_latch.pop()
-            return self._normalize_req(raw, "icache")
-        raw = self.dc_req_latch.pop()
-        return self._normalize_req(raw, "dcache")
+        port = self.arbiter.grant(candidates) if len(candidates) > 1 else candidates[0][0]
+        for i, since in candidates:
+            stats = self.port_stats[self.port_names[i]]
+            if i != port:
+                stats["lost"] += 1
+                continue
+            wait = self.cycle - since
+            stats["grants"] += 1
+            stats["wait_sum"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+        self.valid_since[port] = None
+        name = self.port_names[port]
+        return self._normalize_req(self.ports[name][0].pop(), name)
+
+    def _dram_schedule(self, addr: int, size: int) -> int:
+        """
+        Cycle the data of an access starting now has been transferred:
+        wait for the bank, pay a row-buffer hit or miss, then hold the
+        channel's data bus for size / bytes_per_cycle cycles.
+        """
+        d = self.dram
+        chunk = addr // d["interleave"]
+        channel = chunk % d["channels"]
+        bank = (chunk // d["channels"]) % d["banks_per_channel"]
+        row = addr // (d["row_size"] * d["channels"] * d["banks_per_channel"])
+
+        start = max(self.cycle, self.bank_free[channel][bank])
+        if self.open_row[channel][bank] == row:
+            latency = d["row_hit_latency"]
+            self.stats["row_hits"] += 1
+        else:
+            latency = d["row_miss_latency"]
+            self.stats["row_misses"] += 1
+            self.open_row[channel][bank] = row
+
+        burst = -(-size // d["bytes_per_cycle"])
+        data_start = max(start + latency, self.bus_free[channel])
+        self.bus_free[channel] = data_start + burst
+        # column accesses to an open row pipeline, one per burst, once the activate is done
+        self.bank_free[channel][bank] = start + latency - d["row_hit_latency"] + burst
+        return data_start + burst
 
     def _try_start_one_request(self) -> None:
         """
         Start at most one new request per cycle.
         Backpressure is implemented by refusing to POP input latches when
-        inflight capacity is full.
+        the queue (max_inflight requests) is full.
         """
         if len(self.inflight) >= self.max_inflight:
             return  # busy => do not pop => latch stays valid => upstream stalls
@@ -168,47 +238,51 @@ class MemController(Stage):
         pc_int = inst.pc.int if isinstance(inst.pc, Bits) else int(inst.pc)
         warp_id = req_info.get("warp_id", getattr(inst, "warp", 0))
 
+        addr = int(req_info["addr"])
+        size = int(req_info.get("size", 4))
+        ready = self._dram_schedule(addr, size) if self.dram else self.cycle + self.latency
+
         mem_req = MemRequest(
-            addr=int(req_info["addr"]),
-            size=int(req_info.get("size", 4)),
+            addr=addr,
+            size=size,
             uuid=int(req_info.get("uuid", getattr(inst, "iid", 0) or 0)),
             warp_id=int(warp_id),
             pc=int(req_info.get("pc", pc_int)),
             data=req_info.get("data", None),
             rw_mode=req_info.get("rw_mode", "read"),
-            remaining=self.latency,
+            remaining=ready - self.cycle,
+            ready_cycle=ready,
         )
 
         mem_req.inst = inst
         mem_req.src = req_info.get("src", None)
+        mem_req.issued_cycle = self.cycle
 
-        self.inflight.append(mem_req)
+        heapq.heappush(self.inflight, (ready, self._seq, mem_req))
+        self._seq += 1
 
-    def _age_inflight(self) -> None:
-        for req in self.inflight:
-            req.remaining -= 1
-
-    def _complete_one_if_ready(self) -> None:
+    def _complete_ready(self) -> None:
         """
-        Complete at most one ready request (remaining <= 0) and push its response.
-        If the corresponding response latch is not ready, we do NOT complete this cycle
-        (keeps request inflight), which naturally backpressures completion.
+        Complete the requests whose deadline has passed, at most one per response
+        latch per cycle. A request whose response latch is full stays inflight,
+        which naturally backpressures completion.
         """
-        for req in list(self.inflight):
-            if req.remaining > 0:
-                continue
+        held = []
+        used = set()
+        while self.inflight and self.inflight[0][0] <= self.cycle:
+            entry = heapq.heappop(self.inflight)
+            req = entry[2]
 
             inst = getattr(req, "inst", None)
             src = getattr(req, "src", None)
 
-            if src == "icache":
-                if not self.ic_serve_latch.ready_for_push():
-                    break
-            elif src == "dcache":
-                if not self.dc_serve_latch.ready_for_push():
-                    break
-            else:
+            if src not in self.ports:
                 raise KeyError(f"[MemController] Missing/invalid src: {src}")
+            latch = self.ports[src][1]
+            if src in used or not latch.ready_for_push():
+                held.append(entry)
+                continue
+            used.add(src)
 
             if inst is None:
                 inst = self._build_min_inst({"pc": req.pc, "uuid": req.uuid, "warp_id": req.warp_id})
@@ -216,6 +290,7 @@ class MemController(Stage):
             if req.rw_mode == "write":
                 data_bits, nbytes = self._payload_to_bits(req.data, req.size)
                 self.mem_backend.write(req.addr, data_bits, nbytes)
+                self.stats["writes"] += 1
                 resp = {
                     "src": src,
                     "rw_mode": "write",
@@ -229,6 +304,7 @@ class MemController(Stage):
                 }
             else:
                 data_bits = self.mem_backend.read(req.addr, req.size)
+                self.stats["reads"] += 1
                 resp = {
                     "src": src,
                     "rw_mode": "read",
@@ -241,23 +317,49 @@ class MemController(Stage):
                     "inst": inst,
                 }
 
-            if src == "icache":
-                self.ic_serve_latch.push(resp)
-            elif src == "dcache":
-                self.dc_serve_latch.push(resp)
+            self.stats["bytes"] += req.size
+            self.stats["latency_sum"] += self.cycle - req.issued_cycle
+            latch.push(resp)
 
-            self.inflight.remove(req)
-            break  # ONE completion per cycle
+        for entry in held:
+            heapq.heappush(self.inflight, entry)
 
     # -----------------------------
     # Main compute
     # -----------------------------
     def compute(self, input_data=None):
-        # 1) progress outstanding work
-        self._age_inflight()
+        # 1) complete what is due (if the response latches allow)
+        self._complete_ready()
+        self._note_arrivals()
 
-        # 2) complete at most one (if response latch allows)
-        self._complete_one_if_ready()
-
-        # 3) accept/start at most one new request, ONLY if capacity allows
+        # 2) accept/start at most one new request, ONLY if capacity allows
         self._try_start_one_request()
+
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        if len(self.inflight) < self.max_inflight and any(
+            req is not None and req.valid for req, _ in self.ports.values()
+        ):
+            return cycle + 1
+        if self.inflight:
+            # a finished request blocked on a full response latch retries every cycle
+            return max(cycle + 1, self.inflight[0][0])
+        return None  # idle until a request latch is pushed
+
+    def report(self) -> Dict[str, Any]:
+        """Request counts, row-buffer hit rate, average latency, delivered bytes per cycle and per-port waits."""
+        done = self.stats["reads"] + self.stats["writes"]
+        rows = self.stats["row_hits"] + self.stats["row_misses"]
+        return {
+            **self.stats,
+            "avg_latency": self.stats["latency_sum"] / done if done else 0.0,
+            "row_hit_rate": self.stats["row_hits"] / rows if rows else 0.0,
+            "bytes_per_cycle": self.stats["bytes"] / self.cycle if self.cycle else 0.0,
+            "ports": {
+                name: {**st, "avg_wait": st["wait_sum"] / st["grants"] if st["grants"] else 0.0}
+                for name, st in self.port_stats.items()
+            },
+        }
@@ -0,0 +1,143 @@
+"""
+Cache replacement policies, picked by name from a cache_config:
+
+    {"replacement": "lru" | "plru" | "fifo" | "random" | "srrip", "seed": 0}
+
+A policy tracks every set of one cache. The cache calls touch() on a hit,
+insert() after filling a way and victim() to choose the way a fill replaces
+once the set is full. touch/insert are O(1) for every policy; victim is O(1)
+except for SRRIP, which may age the set.
+"""
+import random
+from collections import OrderedDict
+from typing import Dict, Type
+
+
+class ReplacementPolicy:
+    def __init__(self, num_sets: int, assoc: int, **opts) -> None:
+        self.num_sets = num_sets
+        self.assoc = assoc
+
+    def touch(self, set_idx: int, way: int) -> None:
+        pass
+
+    def insert(self, set_idx: int, way: int) -> None:
+        self.touch(set_idx, way)
+
+    def victim(self, set_idx: int) -> int:
+        raise NotImplementedError
+
+
+class LRU(ReplacementPolicy):
+    """True LRU: one ordered dict per set, least recently used way first."""
+
+    def __init__(self, num_sets: int, assoc: int, **opts) -> None:
+        super().__init__(num_sets, assoc)
+        self.order = [OrderedDict.fromkeys(range(assoc)) for _ in range(num_sets)]
+
+    def touch(self, set_idx: int, way: int) -> None:
+        self.order[set_idx].move_to_end(way)
+
+    def victim(self, set_idx: int) -> int:
+        return next(iter(self.order[set_idx]))
+
+
+class TreePLRU(ReplacementPolicy):
+    """
+    Tree pseudo-LRU: assoc - 1 direction bits per set, stored as one int.
+    Node i has children 2i+1 and 2i+2; a bit of 1 means the victim is on the right.
+    """
+
+    def __init__(self, num_sets: int, assoc: int, **opts) -> None:
+        if assoc & (assoc - 1):
+            raise ValueError(f"tree-PLRU needs a power of two associativity, got {assoc}")
+        super().__init__(num_sets, assoc)
+        self.levels = assoc.bit_length() - 1
+        self.bits = [0] * num_sets
+
+    def touch(self, set_idx: int, way: int) -> None:
+        bits = self.bits[set_idx]
+        node = 0
+        for level in range(self.levels - 1, -1, -1):
+            right = (way >> level) & 1
+            # point the node away from the way just used
+            bits = bits & ~(1 << node) if right else bits | (1 << node)
+            node = 2 * node + 1 + right
+        self.bits[set_idx] = bits
+
+    def victim(self, set_idx: int) -> int:
+        bits = self.bits[set_idx]
+        node = way = 0
+        for _ in range(self.levels):
+            right = (bits >> node) & 1
+            way = (way << 1) | right
+            node = 2 * node + 1 + right
+        return way
+
+
+class FIFO(ReplacementPolicy):
+    """Replace ways in the order they were filled, hits don't matter."""
+
+    def __init__(self, num_sets: int, assoc: int, **opts) -> None:
+        super().__init__(num_sets, assoc)
+        self.next = [0] * num_sets
+
+    def insert(self, set_idx: int, way: int) -> None:
+        self.next[set_idx] = (way + 1) % self.assoc
+
+    def victim(self, set_idx: int) -> int:
+        return self.next[set_idx]
+
+
+class Random(ReplacementPolicy):
+    def __init__(self, num_sets: int, assoc: int, seed: int = 0, **opts) -> None:
+        super().__init__(num_sets, assoc)
+        self.rng = random.Random(seed)
+
+    def victim(self, set_idx: int) -> int:
+        return self.rng.randrange(self.assoc)
+
+
+class SRRIP(ReplacementPolicy):
+    """
+    Static re-reference interval prediction (2-bit RRPV): hits predict near
+    re-reference (0), fills predict a long one (max - 1), the victim is a way
+    with a distant prediction (max), aging the whole set until one exists.
+    """
+
+    def __init__(self, num_sets: int, assoc: int, rrpv_bits: int = 2, **opts) -> None:
+        super().__init__(num_sets, assoc)
+        self.max_rrpv = (1 << rrpv_bits) - 1
+        self.rrpv = [[self.max_rrpv] * assoc for _ in range(num_sets)]
+
+    def touch(self, set_idx: int, way: int) -> None:
+        self.rrpv[set_idx][way] = 0
+
+    def insert(self, set_idx: int, way: int) -> None:
+        self.rrpv[set_idx][way] = self.max_rrpv - 1
+
+    def victim(self, set_idx: int) -> int:
+        rrpv = self.rrpv[set_idx]
+        oldest = max(rrpv)
+        if oldest < self.max_rrpv:
+            age = self.max_rrpv - oldest
+            for way in range(self.assoc):
+                rrpv[way] += age
+        return rrpv.index(self.max_rrpv)
+
+
+POLICIES: Dict[str, Type[ReplacementPolicy]] = {
+    "lru": LRU,
+    "plru": TreePLRU,
+    "fifo": FIFO,
+    "random": Random,
+    "srrip": SRRIP,
+}
+
+
+def make_policy(name: str, num_sets: int, assoc: int, **opts) -> ReplacementPolicy:
+    try:
+        cls = POLICIES[name.lower()]
+    except KeyError:
+        raise ValueError(f"unknown replacement policy {name!r}, pick one of {sorted(POLICIES)}") from None
+    return cls(num_sets, assoc, **opts)
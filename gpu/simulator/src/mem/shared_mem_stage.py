@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+import heapq
+from base_class import LatchIF, Stage, Instruction, dMemResponse
+from typing import Any, Dict, Optional
+from bitstring import Bits
+from common import trace
+from common.shared_mem import BankConflicts, SHARED_BASE, SHARED_SIZE, NUM_BANKS, BANK_BYTES
+from coalescer_stage import lane_accesses
+
+_trace = trace.channel("smem")
+
+
+class SharedMemStage(Stage):
+    """
+    Banked shared memory (scratchpad) of the SM, next to the D$.
+
+    - behind_latch: one warp load/store into the shared window (common/shared_mem.py),
+      with lanes encoded as for the CoalescerStage.
+    - The access is split across NUM_BANKS banks. One pass serves at most one word
+      per bank, so it takes conflict-degree cycles. The next instruction is accepted
+      once those passes are done.
+    - ahead_latch: a dMemResponse with {lane: value} for loads. It arrives `latency`
+      cycles after the last pass.
+    - report() gives the per-PC conflict degree (average, worst, histogram) and the
+      cycles lost to conflicts.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        behind_latch: Optional[LatchIF],
+        ahead_latch: Optional[LatchIF],
+        shared_config: Optional[Dict[str, int]] = None,
+    ):
+        super().__init__(name=name, behind_latch=behind_latch, ahead_latch=ahead_latch)
+        cfg = shared_config or {}
+        self.banks = BankConflicts(cfg.get("num_banks", NUM_BANKS), cfg.get("bank_bytes", BANK_BYTES))
+        self.latency = cfg.get("latency", 1)
+        self.data = bytearray(cfg.get("size", SHARED_SIZE))
+
+        self.busy_until = 0
+        self.responses: list = []  # heap of (ready cycle, seq, dMemResponse)
+        self._seq = 0
+        self.conflict_cycles = 0
+        self.cycle = 0
+
+    def _access(self, inst: Instruction) -> Any:
+        pc, addrs, mask, nbytes, _, rw_mode = lane_accesses(inst)
+        degree = self.banks.access(pc, addrs, mask, nbytes)
+        values = {}
+        for lane, addr in enumerate(addrs):  # lane order, so the last lane wins on a store conflict
+            if not (mask >> lane) & 1:
+                continue
+            off = addr - SHARED_BASE
+            if off < 0 or off + nbytes > len(self.data):
+                raise IndexError(f"[{self.name}] lane {lane} address 0x{addr:X} is outside shared memory")
+            if rw_mode == "write":
+                raw = inst.rdat2[lane]
+                value = raw.uint if isinstance(raw, Bits) else int(raw)
+                self.data[off:off + nbytes] = (value & ((1 << (8 * nbytes)) - 1)).to_bytes(nbytes, "little")
+            else:
+                values[lane] = int.from_bytes(self.data[off:off + nbytes], "little")
+        return degree, (values if rw_mode != "write" else None), rw_mode
+
+    def compute(self, input_data: Optional[Any] = None):
+        if self.behind_latch.valid and self.cycle >= self.busy_until:
+            inst = self.behind_latch.pop()
+            inst.mark_stage_enter(self.name, self.cycle)
+            degree, data, rw_mode = self._access(inst)
+            passes = max(degree, 1)
+            self.busy_until = self.cycle + passes
+            self.conflict_cycles += passes - 1
+            resp = dMemResponse(type=rw_mode, data=data, hit=True, uuid=inst.iid)
+            heapq.heappush(self.responses, (self.cycle + passes - 1 + self.latency, self._seq, resp))
+            self._seq += 1
+            inst.mark_stage_exit(self.name, self.busy_until - 1)
+            _trace.debug("[%s] warp=%s pc=0x%X conflict degree %d", self.name, inst.warp, inst.pc.uint, degree)
+
+        if self.responses and self.responses[0][0] <= self.cycle and self.ahead_latch.ready_for_push():
+            self.ahead_latch.push(heapq.heappop(self.responses)[2])
+        self.cycle += 1
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        wake = []
+        if self.behind_latch.valid:
+            wake.append(max(cycle + 1, self.busy_until))
+        if self.responses:
+            wake.append(max(cycle + 1, self.responses[0][0]))
+        return min(wake) if wake else None
+
+    def report(self) -> Dict[str, Any]:
+        return {"per_pc": self.banks.report(), "conflict_cycles": self.conflict_cycles}
@@ -0,0 +1,104 @@
+"""
+Warp scheduling policies, picked by name:
+
+    {"policy": "lrr" | "gto" | "two_level", "active_warps": 4}
+
+The scheduler keeps the READY warps as a bitmask (bit w = warp w) and each
+cycle asks pick() for one of them. A pick is a few word operations on that
+mask whatever the number of warps. Lower warp ids were launched first, so
+"oldest" means the lowest set bit.
+"""
+from typing import Dict, Type
+
+
+def lowest(mask: int) -> int:
+    """Index of the lowest set bit of a non-zero mask."""
+    return (mask & -mask).bit_length() - 1
+
+
+def first_from(mask: int, start: int) -> int:
+    """Lowest set bit at or above `start`, wrapping around to bit 0."""
+    upper = mask >> start << start
+    return lowest(upper or mask)
+
+
+class SchedPolicy:
+    def __init__(self, num_warps: int, **opts) -> None:
+        self.num_warps = num_warps
+
+    def pick(self, ready: int) -> int:
+        """One warp out of a non-zero ready mask."""
+        raise NotImplementedError
+
+
+class LooseRoundRobin(SchedPolicy):
+    """The first ready warp after the last one issued."""
+
+    def __init__(self, num_warps: int, **opts) -> None:
+        super().__init__(num_warps)
+        self.next = 0
+
+    def pick(self, ready: int) -> int:
+        warp = first_from(ready, self.next)
+        self.next = (warp + 1) % self.num_warps
+        return warp
+
+
+class GreedyThenOldest(SchedPolicy):
+    """Keep issuing from the same warp until it stops being ready, then switch to the oldest ready one."""
+
+    def __init__(self, num_warps: int, **opts) -> None:
+        super().__init__(num_warps)
+        self.last = -1
+
+    def pick(self, ready: int) -> int:
+        if self.last < 0 or not (ready >> self.last) & 1:
+            self.last = lowest(ready)
+        return self.last
+
+
+class TwoLevel(SchedPolicy):
+    """
+    Two-level scheduling: round-robin over a small active pool. A warp that
+    stops being ready (fill, barrier, halt) leaves the pool and the oldest
+    ready pending warps take its place, so the pool holds warps that can
+    issue while the others wait out their latency.
+    """
+
+    def __init__(self, num_warps: int, active_warps: int = 4, **opts) -> None:
+        super().__init__(num_warps)
+        if active_warps < 1:
+            raise ValueError(f"active_warps must be at least 1, got {active_warps}")
+        self.active_warps = active_warps
+        self.active = 0
+        self.next = 0
+        self.promotions = 0
+
+    def pick(self, ready: int) -> int:
+        self.active &= ready
+        room = self.active_warps - bin(self.active).count("1")
+        pending = ready & ~self.active
+        while room > 0 and pending:
+            bit = pending & -pending
+            self.active |= bit
+            pending ^= bit
+            room -= 1
+            self.promotions += 1
+        warp = first_from(self.active, self.next)
+        self.next = (warp + 1) % self.num_warps
+        return warp
+
+
+SCHED_POLICIES: Dict[str, Type[SchedPolicy]] = {
+    "lrr": LooseRoundRobin,
+    "gto": GreedyThenOldest,
+    "two_level": TwoLevel,
+}
+
+
+def make_sched_policy(name: str, num_warps: int, **opts) -> SchedPolicy:
+    try:
+        cls = SCHED_POLICIES[name.lower()]
+    except KeyError:
+        raise ValueError(f"unknown scheduling policy {name!r}, pick one of {sorted(SCHED_POLICIES)}") from None
+    return cls(num_warps, **opts)
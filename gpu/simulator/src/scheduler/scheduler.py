@@ -0,0 +1,188 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # simulator root, for base_class
+
+from base_class import ForwardingIF, LatchIF, Stage, Instruction, DecodeType, WarpGroup, WarpState
+from typing import Any, Dict, List, Optional
+from bitstring import Bits
+from common import trace
+from common.simt_stack import SIMTStack
+from policies import make_sched_policy
+
+_trace = trace.channel("sched")
+
+
+class WarpScheduler(Stage):
+    """
+    Fetch scheduler at the head of the SM pipeline.
+
+    - Issues at most one fetch per cycle into ahead_latch (towards the I$).
+      `policy` picks the warp among the READY ones: "lrr", "gto" or "two_level"
+      (see policies.py; active_warps sizes the two-level pool).
+    - Every warp is READY, STALL, BARRIER or HALT. The READY warps are kept as
+      a bitmask, so picking one does not scan the warps. Each WarpGroup's state
+      follows its warps: READY if any of them is, else BARRIER, STALL or HALT.
+    - Every warp fetches sequentially from start_pc; nothing past decode is
+      modelled yet, so fetches past a HALT are squashed at the end of the pipe.
+    - Each warp has a SIMT reconvergence stack (common/simt_stack.py). Fetch
+      follows its top split and tags the instruction with the split's lanes
+      (inst.pred, decode ANDs the predicate in). A branch outcome reported on
+      "Branch_Scheduler" as {"warp": w, "next": {pc: lanes}} moves those lanes
+      to their targets; instructions already fetched down the old path are not
+      squashed, so the reporting unit has to hold the warp until then.
+    - A warp with a fetch parked in an I$ MSHR ("ICache_Scheduler" carries the
+      set of those warps) is STALL until its fill lands, so it stays in order
+      while the other warps keep fetching.
+    - A HALT reported by decode ("Decode_Scheduler") stops fetching for that warp.
+      A barrier parks the warp until every warp that has not halted reaches one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ahead_latch: LatchIF,
+        num_warps: int = 1,
+        start_pc: int = 0,
+        warps_per_group: int = 2,
+        policy: str = "lrr",
+        active_warps: int = 4,
+        lanes: int = 32,
+        forward_ifs_read: Optional[Dict[str, ForwardingIF]] = None,
+    ):
+        super().__init__(
+            name=name,
+            ahead_latch=ahead_latch,
+            forward_ifs_read=forward_ifs_read or {},
+        )
+        self.num_warps = int(num_warps)
+        self.warps_per_group = int(warps_per_group)
+        self.full_mask = (1 << lanes) - 1
+        self.stacks = [SIMTStack(int(start_pc), self.full_mask) for _ in range(self.num_warps)]
+        self.policy_name = policy
+        self.policy = make_sched_policy(policy, self.num_warps, active_warps=active_warps)
+
+        self.state: List[WarpState] = [WarpState.READY] * self.num_warps
+        self.ready = (1 << self.num_warps) - 1  # bit w set while warp w is READY
+        self.groups = [WarpGroup(pc=int(start_pc), group_id=g)
+                       for g in range(-(-self.num_warps // self.warps_per_group))]
+        self._waiting: frozenset = frozenset()
+        self._last_decoded = None
+        self._last_branch = None
+        self.next_iid = 0
+
+        self.fetched = 0
+        self.issued = [0] * self.num_warps
+        self.barrier_releases = 0
+        self.cycle = 0
+
+    def _set_state(self, warp: int, state: WarpState) -> None:
+        if self.state[warp] is state:
+            return
+        _trace.trace("[%s] warp %d %s -> %s", self.name, warp, self.state[warp].value, state.value)
+        self.state[warp] = state
+        if state is WarpState.READY:
+            self.ready |= 1 << warp
+        else:
+            self.ready &= ~(1 << warp)
+
+        group = warp // self.warps_per_group
+        first = group * self.warps_per_group
+        states = self.state[first:first + self.warps_per_group]
+        for candidate in (WarpState.READY, WarpState.BARRIER, WarpState.STALL):
+            if candidate in states:
+                self.groups[group].state = candidate
+                break
+        else:
+            self.groups[group].state = WarpState.HALT
+
+    def _settle(self, warp: int) -> None:
+        """READY or STALL for a warp that is neither halted nor at a barrier."""
+        self._set_state(warp, WarpState.STALL if warp in self._waiting else WarpState.READY)
+
+    def _observe(self) -> None:
+        miss = self.forward_ifs_read.get("ICache_Scheduler")
+        waiting = miss.payload if miss is not None and miss.payload is not None else frozenset()
+        if waiting != self._waiting:
+            changed = waiting ^ self._waiting
+            self._waiting = waiting
+            for warp in changed:
+                if self.state[warp] in (WarpState.READY, WarpState.STALL):
+                    self._settle(warp)
+
+        branch = self.forward_ifs_read.get("Branch_Scheduler")
+        outcome = branch.payload if branch is not None else None
+        if outcome and outcome is not self._last_branch:
+            self._last_branch = outcome
+            self.stacks[outcome["warp"]].redirect(outcome["next"])
+            _trace.debug("[%s] warp %d branch -> %s", self.name, outcome["warp"], outcome["next"])
+
+        decoded = self.forward_ifs_read.get("Decode_Scheduler")
+        payload = decoded.payload if decoded is not None else None
+        if not payload or payload is self._last_decoded:
+            return
+        self._last_decoded = payload
+        warp = payload["warp"]
+        if payload.get("type") == DecodeType.halt:
+            if self.state[warp] is not WarpState.HALT:
+                _trace.debug("[%s] warp %d halted", self.name, warp)
+            self._set_state(warp, WarpState.HALT)
+        elif payload.get("type") == DecodeType.Barrier and self.state[warp] is not WarpState.HALT:
+            self._set_state(warp, WarpState.BARRIER)
+        else:
+            return
+        self._release_barrier()
+
+    def _release_barrier(self) -> None:
+        live = [w for w in range(self.num_warps) if self.state[w] is not WarpState.HALT]
+        if live and all(self.state[w] is WarpState.BARRIER for w in live):
+            _trace.debug("[%s] barrier released for %d warps", self.name, len(live))
+            self.barrier_releases += 1
+            for warp in live:
+                self._settle(warp)
+
+    def compute(self, input_data: Optional[Any] = None):
+        self._observe()
+        if not self.ahead_latch.ready_for_push() or not self.ready:
+            return None
+
+        warp = self.policy.pick(self.ready)
+        stack = self.stacks[warp]
+        pc, lanes = stack.pc, stack.mask
+        inst = Instruction(
+            iid=self.next_iid,
+            pc=Bits(uint=pc, length=32),
+            warp=warp,
+            warpGroup=warp // self.warps_per_group,
+            pred=lanes,
+        )
+        self.next_iid += 1
+        group = self.groups[inst.warpGroup]
+        group.pc = pc
+        group.last_issue_even = warp % 2 == 0
+        stack.advance({pc + 4: lanes})
+
+        inst.mark_stage_enter(self.name, self.cycle)
+        self.ahead_latch.push(inst)
+        self.fetched += 1
+        self.issued[warp] += 1
+        _trace.trace("[%s] fetch warp=%d pc=0x%X", self.name, inst.warp, inst.pc.uint)
+        return inst
+
+    def tick(self, cycle: int) -> Optional[int]:
+        self.cycle = cycle
+        self.compute()
+        if not self.ready:
+            return None  # every warp halted, parked or waiting on a fill, all of which end through a forwarding interface
+        return cycle + 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy_name,
+            "issued": list(self.issued),
+            "warp_states": [s.value for s in self.state],
+            "group_states": [g.state.value for g in self.groups],
+            "barrier_releases": self.barrier_releases,
+            "divergences": [s.divergences for s in self.stacks],
+            "max_stack_depth": [s.max_depth for s in self.stacks],
+        }
@@ -0,0 +1,256 @@
+"""
+Per-instruction pipeline timeline: the stage_entry/stage_exit/fu_entries/wb_cycle
+of every instruction, streamed to a compact binary log while the simulator runs
+and converted offline to Chrome trace-event JSON or a Konata log.
+
+RetireStage hands every instruction leaving the pipe (retired or squashed) to
+TimelineWriter.record(), which writes one record and keeps no reference, so a
+run of any length only holds the instructions in flight:
+
+    GPU_model(program, {**config, "timeline": "run.tl"})   # or main.py --timeline run.tl
+    python timeline.py run.tl --chrome run.json            # chrome://tracing or Perfetto, 1 cycle = 1 us
+    python timeline.py run.tl --konata run.log             # Konata pipeline viewer
+
+Stages only mark what they see, so spans are completed when written: a stage
+without an exit ends where the next one starts, one without an entry starts
+where the previous one ended. Spans are [enter, exit) in cycles.
+"""
+import argparse
+import heapq
+import json
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from base_class import Instruction
+
+# file:   magic "TWTL", u16 version, then a stream of items, each starting with a u8 tag
+# string: tag 0, u16 id, u16 length, utf-8 (stage, unit and opcode names, written on first use)
+# record: tag 1, u32 iid, u32 pc, u16 warp, u16 opcode string id, u32 lane mask,
+#         u32 writeback cycle (0xFFFFFFFF: none), u8 flags (bit 0: squashed), u8 span count
+# span:   u8 kind (0 stage, 1 functional unit), u16 name string id, u32 enter, u32 exit
+TIMELINE_MAGIC = b"TWTL"
+TIMELINE_VERSION = 1
+STAGE, UNIT = 0, 1
+SQUASHED = 0x1
+_NONE = 0xFFFFFFFF
+_HEADER = struct.Struct("<4sH")
+_STRING = struct.Struct("<BHH")
+_RECORD = struct.Struct("<BIIHHIIBB")
+_SPAN = struct.Struct("<BHII")
+_TAG_STRING, _TAG_RECORD = 0, 1
+
+
+class Span(NamedTuple):
+    kind: int   # STAGE or UNIT
+    name: str
+    enter: int
+    exit: int
+
+
+class TimelineRecord(NamedTuple):
+    iid: int
+    pc: int
+    warp: int
+    op: str
+    pred: int
+    wb_cycle: Optional[int]
+    squashed: bool
+    spans: List[Span]
+
+    @property
+    def first_cycle(self) -> int:
+        return min(s.enter for s in self.spans)
+
+    @property
+    def last_cycle(self) -> int:
+        return max(s.exit for s in self.spans)
+
+
+def stage_spans(inst: Instruction) -> List[Tuple[str, int, int]]:
+    """(stage, enter, exit) in pipeline order, with missing ends filled in from the neighbours."""
+    names = list(dict.fromkeys([*inst.stage_entry, *inst.stage_exit]))
+    names.sort(key=lambda n: inst.stage_entry.get(n, inst.stage_exit.get(n)))
+    spans = []
+    for i, name in enumerate(names):
+        enter, exit = inst.stage_entry.get(name), inst.stage_exit.get(name)
+        if enter is None:
+            enter = spans[-1][2] if spans else exit
+        if exit is None:
+            later = names[i + 1] if i + 1 < len(names) else None
+            exit = inst.stage_entry.get(later, inst.stage_exit.get(later, enter)) if later else enter
+        spans.append((name, enter, max(enter, exit)))
+    return spans
+
+
+class TimelineWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.f = open(path, "wb", buffering=1 << 16)
+        self.f.write(_HEADER.pack(TIMELINE_MAGIC, TIMELINE_VERSION))
+        self.strings: Dict[str, int] = {}
+        self.records = 0
+
+    def _intern(self, s: str) -> int:
+        sid = self.strings.get(s)
+        if sid is None:
+            sid = self.strings[s] = len(self.strings)
+            data = s.encode("utf-8")
+            self.f.write(_STRING.pack(_TAG_STRING, sid, len(data)))
+            self.f.write(data)
+        return sid
+
+    def record(self, inst: Instruction, squashed: bool = False) -> None:
+        spans = [(STAGE, self._intern(name), enter, exit) for name, enter, exit in stage_spans(inst)]
+        spans += [(UNIT, self._intern(e["fu"]), e["enter"], e["enter"] if e["exit"] is None else e["exit"])
+                  for e in inst.fu_entries]
+        op = self._intern(getattr(inst.opcode, "name", None) or "?")
+        self.f.write(_RECORD.pack(_TAG_RECORD, (inst.iid or 0) & _NONE, inst.pc.uint, inst.warp or 0, op,
+                                  inst.pred & _NONE, _NONE if inst.wb_cycle is None else inst.wb_cycle,
+                                  SQUASHED if squashed else 0, len(spans)))
+        for span in spans:
+            self.f.write(_SPAN.pack(*span))
+        self.records += 1
+
+    def close(self) -> None:
+        if not self.f.closed:
+            self.f.close()
+
+
+def read_timeline(path: str) -> Iterator[TimelineRecord]:
+    """Yield the records of a timeline log in the order they were written (retire order)."""
+    with open(path, "rb") as f:
+        magic, version = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != TIMELINE_MAGIC or version != TIMELINE_VERSION:
+            raise ValueError(f"{path}: not a version {TIMELINE_VERSION} timeline log")
+        strings: List[str] = []
+        while True:
+            tag = f.read(1)
+            if not tag:
+                return
+            if tag[0] == _TAG_STRING:
+                _, sid, length = _STRING.unpack(tag + f.read(_STRING.size - 1))
+                strings.append(f.read(length).decode("utf-8"))
+                continue
+            _, iid, pc, warp, op, pred, wb, flags, count = _RECORD.unpack(tag + f.read(_RECORD.size - 1))
+            spans = []
+            for _ in range(count):
+                kind, name, enter, exit = _SPAN.unpack(f.read(_SPAN.size))
+                spans.append(Span(kind, strings[name], enter, exit))
+            yield TimelineRecord(iid, pc, warp, strings[op], pred, None if wb == _NONE else wb,
+                                 bool(flags & SQUASHED), spans)
+
+
+def to_chrome(path: str, out: str) -> int:
+    """
+    Chrome trace-event JSON: one process per warp, one row per instruction,
+    a complete event per stage with the unit it ran on nested inside.
+    Written event by event; returns the number of records.
+    """
+    count = 0
+    warps = set()
+    with open(out, "w") as f:
+        f.write('{"traceEvents": [\n')
+        sep = ""
+        for rec in read_timeline(path):
+            label = f"{rec.op} pc=0x{rec.pc:X}" + (" (squashed)" if rec.squashed else "")
+            events = []
+            if rec.warp not in warps:
+                warps.add(rec.warp)
+                events.append({"name": "process_name", "ph": "M", "pid": rec.warp, "args": {"name": f"warp {rec.warp}"}})
+            events.append({"name": "thread_name", "ph": "M", "pid": rec.warp, "tid": rec.iid,
+                           "args": {"name": f"#{rec.iid} {label}"}})
+            for span in rec.spans:
+                events.append({"name": span.name, "cat": "unit" if span.kind == UNIT else "stage", "ph": "X",
+                               "ts": span.enter, "dur": max(1, span.exit - span.enter), "pid": rec.warp,
+                               "tid": rec.iid, "args": {"iid": rec.iid, "op": rec.op, "pc": rec.pc}})
+            for event in events:
+                f.write(sep + json.dumps(event, separators=(",", ":")))
+                sep = ",\n"
+            count += 1
+        f.write("\n]}\n")
+    return count
+
+
+# within a cycle: introduce, label, end stages, start stages, retire
+_I, _L, _E, _S, _R = range(5)
+
+
+def to_konata(path: str, out: str, window: int = 1 << 16) -> int:
+    """
+    Konata (Kanata 0004) log. Konata wants commands in cycle order but records
+    arrive in retire order, so events wait in a heap until no record still to
+    come can start before them: anything older than `window` cycles before the
+    latest retire is written out. Returns the number of records.
+    """
+    heap: list = []
+    seq = 0
+    flushed = None     # every event before this cycle has been written
+    cycle = None
+    next_id = next_retire = 0
+    count = 0
+
+    with open(out, "w") as f:
+        f.write("Kanata\t0004\n")
+
+        def emit(until: Optional[int]) -> None:
+            nonlocal cycle, next_id, next_retire
+            while heap and (until is None or heap[0][0] < until):
+                at, rank, _, handle, text = heapq.heappop(heap)
+                if cycle is None:
+                    f.write(f"C=\t{at}\n")
+                elif at > cycle:
+                    f.write(f"C\t{at - cycle}\n")
+                cycle = at
+                if rank == _I:
+                    handle[0] = next_id
+                    next_id += 1
+                    f.write(f"I\t{handle[0]}\t{text}\n")
+                elif rank == _R:
+                    f.write(f"R\t{handle[0]}\t{next_retire}\t{text}\n")
+                    next_retire += 1
+                else:
+                    f.write(f"{'LES'[rank - _L]}\t{handle[0]}\t{text}\n")
+
+        for rec in read_timeline(path):
+            if flushed is not None and rec.first_cycle < flushed:
+                raise ValueError(f"instruction {rec.iid} was in flight for more than {window} cycles, "
+                                 "convert with a larger window")
+            handle = [None]  # Konata id, assigned when the I command is written
+            events = [(rec.first_cycle, _I, f"{rec.iid}\t{rec.warp}"),
+                      (rec.first_cycle, _L, f"0\t{rec.op} pc=0x{rec.pc:X}"),
+                      (rec.last_cycle, _R, "1" if rec.squashed else "0")]
+            for span in rec.spans:
+                lane = 1 if span.kind == UNIT else 0
+                events.append((span.enter, _S, f"{lane}\t{span.name}"))
+                if span.exit > span.enter:  # a zero-length stage is ended by the next S on its lane
+                    events.append((span.exit, _E, f"{lane}\t{span.name}"))
+            for at, rank, text in events:
+                heapq.heappush(heap, (at, rank, seq, handle, text))
+                seq += 1
+            count += 1
+            horizon = rec.last_cycle - window
+            if flushed is None or horizon > flushed:
+                emit(horizon)
+                flushed = horizon
+        emit(None)
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a simulator timeline log")
+    parser.add_argument("log", help="binary timeline log written with --timeline")
+    parser.add_argument("--chrome", metavar="OUT", help="write Chrome trace-event JSON")
+    parser.add_argument("--konata", metavar="OUT", help="write a Konata log")
+    parser.add_argument("--window", type=int, default=1 << 16,
+                        help="Konata reorder window in cycles (longest fetch-to-retire time)")
+    args = parser.parse_args()
+    if not args.chrome and not args.konata:
+        parser.error("nothing to do, give --chrome and/or --konata")
+    if args.chrome:
+        print(f"{to_chrome(args.log, args.chrome)} instructions -> {args.chrome}")
+    if args.konata:
+        print(f"{to_konata(args.log, args.konata, args.window)} instructions -> {args.konata}")
+
+
+if __name__ == "__main__":
+    main()
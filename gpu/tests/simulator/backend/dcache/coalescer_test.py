@@ -0,0 +1,100 @@
+# coalescer_test.py — warp accesses split into aligned segments in front of the D$
+
+import sys
+from pathlib import Path
+
+import pytest
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[4] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from base_class import LatchIF, Instruction
+from custom_enums_multi import I_Op, S_Op
+from common.coalesce import Coalescer, coalesce
+from dcache_stage import DCacheStage
+from coalescer_stage import CoalescerStage
+
+ALL = (1 << 32) - 1
+
+
+def test_unit_stride_is_one_transaction():
+    assert coalesce([0x100 + 4 * i for i in range(32)], ALL) == [(0x100, 128, ALL)]
+
+
+def test_partial_warp_shrinks_the_segment():
+    assert coalesce([0x100 + 4 * i for i in range(32)], 0xFF) == [(0x100, 32, 0xFF)]
+    assert coalesce([0x100 + 4 * i for i in range(32)], 0xFF << 8) == [(0x120, 32, 0xFF << 8)]
+    assert coalesce([0x100 + 4 * i for i in range(32)], 0xFFFF << 16) == [(0x140, 64, 0xFFFF << 16)]
+
+
+def test_stride_and_broadcast():
+    strided = coalesce([0x1000 + 8 * i for i in range(32)], ALL)
+    assert [(a, n) for a, n, _ in strided] == [(0x1000, 128), (0x1080, 128)]
+    assert coalesce([0x40] * 32, ALL) == [(0x40, 32, ALL)]
+
+
+def test_unaligned_lane_straddles_two_segments():
+    out = coalesce([0x7E], 1, size=4, segment=128, min_segment=32)
+    assert out == [(0x60, 32, 1), (0x80, 32, 1)]
+
+
+def test_efficiency_histogram_per_pc():
+    c = Coalescer(segment=64)
+    c.coalesce(8, [4 * i for i in range(32)], ALL)            # 2 x 64B, fully used
+    c.coalesce(8, [128 * i for i in range(32)], [True] * 32)  # 32 x 32B, 4 of them used
+    st = c.report()[8]
+    assert st["hist"] == {2: 1, 32: 1}
+    assert st["requested"] == 256 and st["transferred"] == 128 + 32 * 32
+    assert c.efficiency(8) == 256 / (128 + 1024)
+    with pytest.raises(ValueError):
+        Coalescer(segment=96)
+
+
+def warp_access(op, bases, imm=0, pred=ALL, data=None, iid=0, pc=0x40):
+    return Instruction(pc=Bits(uint=pc, length=32), iid=iid, opcode=op, imm=Bits(int=imm, length=12),
+                       rdat1=[Bits(uint=b, length=32) for b in bases],
+                       rdat2=[Bits(uint=d, length=32) for d in (data or [0] * len(bases))],
+                       pred=pred)
+
+
+def build(bench, insts):
+    lsu = bench.driver(insts)
+    co_dc = LatchIF(name="coalescer_dcache")
+    dc_req, dc_resp = LatchIF(name="dc_req"), LatchIF(name="dc_resp")
+    co = bench.add(CoalescerStage("Coalescer", lsu.req, co_dc))
+    dcache = bench.add(DCacheStage("DCache", co_dc, lsu.resp, dc_req, dc_resp))
+    bench.connect(lsu.req, lsu, co)
+    bench.connect(co_dc, co, dcache)
+    bench.connect(lsu.resp, dcache, lsu)
+    bench.mem_controller(dc=(dcache, dc_req, dc_resp), latency=20, max_inflight=4)  # word i holds 0x1000 + i
+    return lsu, co, dcache
+
+
+def test_warp_load_through_the_dcache(bench):
+    bases = [8 * i for i in range(32)]  # every other word, two 128B segments
+    b = bench()
+    lsu, co, dcache = build(b, [warp_access(I_Op.LW, bases, imm=4)])
+    b.run_until(lsu, 2, max_cycles=2_000)
+
+    values = {}
+    for _, resp in lsu.got:
+        values.update(resp.data)
+    assert values == {lane: 0x1000 + 2 * lane + 1 for lane in range(32)}
+    assert dcache.report()["total"]["misses"] == 2
+    assert co.report()[0x40]["hist"] == {2: 1}
+
+
+def test_masked_store_then_load(bench):
+    bases = [0x200 + 4 * i for i in range(32)]
+    pred = 0xAAAA_AAAA  # odd lanes
+    insts = [warp_access(S_Op.SW, bases, pred=pred, data=list(range(32)), iid=1),
+             warp_access(I_Op.LW, bases, iid=2, pc=0x44)]
+    b = bench()
+    lsu, co, _ = build(b, insts)
+    b.run_until(lsu, 2, max_cycles=2_000)
+
+    loaded = lsu.got[1][1].data
+    assert all(loaded[lane] == (lane if lane % 2 else 0x1000 + 0x80 + lane) for lane in range(32))
+    assert co.report()[0x40]["efficiency"] == 0.5
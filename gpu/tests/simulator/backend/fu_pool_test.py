@@ -0,0 +1,94 @@
+# fu_pool_test.py — functional units, initiation intervals and the writeback port
+
+import sys
+from pathlib import Path
+
+import pytest
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "backend"))
+
+from base_class import LatchIF, Instruction
+from custom_enums_multi import R_Op
+from scoreboard import Scoreboard
+from fu_pool import FUPoolStage
+
+ADD, DIV, MUL = R_Op.ADD, R_Op.DIV, R_Op.MUL
+
+
+def inst(op, fu, rd=1, iid=0, warp=0):
+    return Instruction(pc=Bits(uint=4 * iid, length=32), iid=iid, warp=warp, opcode=op, intended_FSU=fu, rd=rd)
+
+
+def run(bench, insts, scoreboard=None, **fu_config):
+    pipe = bench.driver(insts, name="opcoll_fu")
+    fu = bench.add(FUPoolStage("FU", pipe.req, pipe.resp, scoreboard, fu_config))
+    bench.connect(pipe.req, pipe, fu)
+    bench.connect(pipe.resp, fu, pipe)
+    bench.run_until(pipe, len(insts), max_cycles=1_000)
+    return pipe, fu
+
+
+def test_pipelined_unit_takes_one_per_cycle(bench):
+    units = {"MUL": {"count": 1, "latency": 6, "pipelined": True}}
+    pipe, fu = run(bench(), [inst(MUL, "MUL", iid=i) for i in range(4)], units=units)
+    done = [c for c, _ in pipe.got]
+    assert [b - a for a, b in zip(done, done[1:])] == [1, 1, 1]
+    assert fu.report()["units"]["MUL0"]["issues"] == 4
+    assert "MUL" not in fu.report()["struct_stall_cycles"]
+
+
+def test_iterative_unit_blocks_until_done(bench):
+    units = {"DIV": {"count": 1, "latency": 10, "pipelined": False}}
+    pipe, fu = run(bench(), [inst(DIV, "DIV", iid=i) for i in range(3)], units=units)
+    done = [c for c, _ in pipe.got]
+    assert [b - a for a, b in zip(done, done[1:])] == [10, 10]
+    assert fu.report()["struct_stall_cycles"]["DIV"] >= 18
+    assert fu.report()["units"]["DIV0"]["busy_cycles"] == 30
+
+    pipe, fu = run(bench(), [inst(DIV, "DIV", iid=i) for i in range(3)],
+                   units={"DIV": {"count": 3, "latency": 10, "pipelined": False}})
+    assert [fu.report()["units"][f"DIV{i}"]["issues"] for i in range(3)] == [1, 1, 1]
+
+
+def test_per_op_latency_override(bench):
+    pipe, _ = run(bench(), [inst(MUL, "MUL", iid=0)], ops={"MUL": {"latency": 2}})
+    fast = pipe.got[0][0]
+    pipe, _ = run(bench(), [inst(MUL, "MUL", iid=0)])
+    assert pipe.got[0][0] - fast == 4    # default MUL latency is 6
+
+
+def test_writeback_port_is_arbitrated(bench):
+    units = {"ADD": {"count": 1, "latency": 3, "pipelined": True},
+             "MUL": {"count": 1, "latency": 2, "pipelined": True}}
+    insts = [inst(ADD, "ADD", iid=0), inst(MUL, "MUL", iid=1)]   # both finish on the same cycle
+    _, fu = run(bench(), insts, units=units, wb_ports=1)
+    assert fu.report()["wb_stall_cycles"] == {"MUL": 1}          # oldest-first: ADD was issued first
+    _, fu = run(bench(), [inst(ADD, "ADD", iid=0), inst(MUL, "MUL", iid=1)], units=units, wb_ports=2)
+    assert fu.report()["wb_stall_cycles"] == {}
+
+
+def test_writeback_releases_the_scoreboard(bench):
+    sb = Scoreboard(num_warps=1)
+    insts = [inst(ADD, "ADD", rd=5, iid=0)]
+    sb.reserve(insts[0])
+    run(bench(), insts, scoreboard=sb)
+    assert sb.pending == [0] and sb.inflight == [0]
+
+
+def test_event_run_matches_stepping(make_bench):
+    mix = [(ADD, "ADD"), (MUL, "MUL"), (DIV, "DIV"), (ADD, "ADD"), (ADD, "SUB")]
+    got = {}
+    for stepped in (True, False):
+        pipe, fu = run(make_bench(stepped), [inst(*mix[i % len(mix)], iid=i) for i in range(40)])
+        got[stepped] = [(c, i.iid) for c, i in pipe.got], fu.report()
+    assert got[False] == got[True]
+
+
+def test_rejects_bad_units():
+    with pytest.raises(ValueError):
+        FUPoolStage("FU", LatchIF(), LatchIF(), fu_config={"units": {"ADD": {"count": 0, "latency": 4}}})
+    with pytest.raises(ValueError, match="arbitration"):
+        FUPoolStage("FU", LatchIF(), LatchIF(), fu_config={"wb_policy": "lottery"})
@@ -0,0 +1,76 @@
+# operand_collector_test.py — banked register file reads through collector units
+
+import sys
+from pathlib import Path
+
+import pytest
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "backend"))
+
+from base_class import LatchIF, Instruction
+from custom_enums_multi import R_Op, I_Op, U_Op, H_Op
+from operand_collector import OperandCollectorStage, rf_bank, source_regs
+
+
+def inst(op, rd=0, rs1=0, rs2=0, warp=0, iid=0):
+    return Instruction(pc=Bits(uint=4 * iid, length=32), iid=iid, warp=warp, opcode=op, rd=rd, rs1=rs1, rs2=rs2)
+
+
+def test_banks_are_swizzled_by_warp():
+    assert [rf_bank(0, r, 4) for r in range(5)] == [0, 1, 2, 3, 0]
+    assert rf_bank(1, 3, 4) == 0
+
+
+def test_source_registers_follow_the_opcode_table():
+    assert source_regs(inst(R_Op.ADD, rd=3, rs1=1, rs2=2)) == [1, 2]
+    assert source_regs(inst(R_Op.ADD, rd=3, rs1=5, rs2=5)) == [5]     # one read for a repeated register
+    assert source_regs(inst(I_Op.ADDI, rd=3, rs1=0, rs2=9)) == []      # x0 is never read, rs2 is the immediate
+    assert source_regs(inst(U_Op.LLI, rd=7, rs1=1, rs2=2)) == [7]      # partial immediate loads merge into rd
+    assert source_regs(inst(H_Op.HALT)) == []
+
+
+def run(bench, insts, **rf_config):
+    pipe = bench.driver(insts, name="decode_opcoll")
+    oc = bench.add(OperandCollectorStage("OpColl", pipe.req, pipe.resp, rf_config))
+    bench.connect(pipe.req, pipe, oc)
+    bench.connect(pipe.resp, oc, pipe)
+    bench.run_until(pipe, len(insts), max_cycles=500)
+    return pipe, oc
+
+
+def test_same_bank_operands_take_two_cycles(bench):
+    _, oc = run(bench(), [inst(R_Op.ADD, rd=3, rs1=1, rs2=5)])              # r1 and r5 share bank 1
+    assert oc.report()["conflict_cycles"] == {0: 1}
+    assert oc.report()["avg_collect_cycles"] == 2
+
+    _, oc = run(bench(), [inst(R_Op.ADD, rd=3, rs1=1, rs2=5)], ports_per_bank=2)
+    assert oc.report()["total_conflict_cycles"] == 0
+    assert oc.report()["avg_collect_cycles"] == 1
+
+
+def test_older_collector_wins_the_bank(bench):
+    insts = [inst(R_Op.ADD, rd=4, rs1=1, rs2=5, warp=0, iid=0),  # both in bank 1, second read a cycle later
+             inst(R_Op.ADD, rd=4, rs1=4, rs2=2, warp=1, iid=1)]  # r4 of warp 1 is bank 1 as well
+    pipe, oc = run(bench(), insts)
+    report = oc.report()
+    assert [i.iid for _, i in pipe.got] == [0, 1]
+    assert report["conflict_cycles"] == {0: 1, 1: 1}
+    assert report["bank_reads"] == [0, 3, 0, 1]
+    assert [i.target_bank for _, i in pipe.got] == [0, 1]
+
+
+def test_event_run_matches_stepping(make_bench):
+    got = {}
+    for stepped in (True, False):
+        insts = [inst(R_Op.ADD, rd=1 + i % 7, rs1=i % 5, rs2=(3 * i) % 8, warp=i % 3, iid=i) for i in range(40)]
+        pipe, oc = run(make_bench(stepped), insts, collectors=2)
+        got[stepped] = [(c, i.iid) for c, i in pipe.got], oc.report()
+    assert got[False] == got[True]
+
+
+def test_rejects_empty_geometry():
+    with pytest.raises(ValueError):
+        OperandCollectorStage("OpColl", LatchIF(), LatchIF(), {"collectors": 0})
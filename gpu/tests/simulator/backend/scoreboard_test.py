@@ -0,0 +1,126 @@
+# scoreboard_test.py — pending-register bitmasks and hazard stalls at issue
+
+import sys
+from collections import deque
+from pathlib import Path
+
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "backend"))
+
+from base_class import LatchIF, Instruction, DecodeType
+from custom_enums_multi import R_Op, I_Op, S_Op, H_Op
+from event_kernel import EventKernel
+from scoreboard import Scoreboard
+from issue_stage import IssueStage
+
+
+def inst(op, rd=0, rs1=0, rs2=0, warp=0, iid=0):
+    return Instruction(pc=Bits(uint=4 * iid, length=32), iid=iid, warp=warp, opcode=op, rd=rd, rs1=rs1, rs2=rs2)
+
+
+def test_hazards_against_pending_registers():
+    sb = Scoreboard(num_warps=2)
+    sb.reserve(inst(R_Op.ADD, rd=5, rs1=1, rs2=2))
+    assert sb.pending == [1 << 5, 0]
+    assert sb.hazard(inst(R_Op.ADD, rd=6, rs1=5, rs2=1)) == "RAW"
+    assert sb.hazard(inst(I_Op.ADDI, rd=5, rs1=1)) == "WAW"
+    assert sb.hazard(inst(S_Op.SW, rd=5, rs1=1, rs2=2)) is None   # a store's rd slot is its offset
+    assert sb.hazard(inst(R_Op.ADD, rd=5, rs1=5, warp=1)) is None  # other warps are independent
+    sb.release(inst(R_Op.ADD, rd=5))
+    assert sb.pending == [0, 0]
+
+
+def test_x0_is_never_reserved():
+    sb = Scoreboard(num_warps=1)
+    sb.reserve(inst(R_Op.ADD, rd=0, rs1=1, rs2=2))
+    assert sb.pending == [0]
+
+
+def test_halt_drains_the_warp():
+    sb = Scoreboard(num_warps=2)
+    add = inst(R_Op.ADD, rd=3, rs1=1, rs2=2)
+    halt = Instruction(pc=Bits(uint=8, length=32), warp=0, opcode=H_Op.HALT, type=DecodeType.halt)
+    sb.reserve(add)
+    assert sb.hazard(halt) == "DRAIN"
+    sb.release(add)
+    assert sb.hazard(halt) is None
+    sb.reserve(halt)
+    assert sb.hazard(inst(R_Op.ADD, rd=4, rs1=1, rs2=2)) == "DRAIN"     # fetched past the HALT
+    assert sb.hazard(inst(R_Op.ADD, rd=4, rs1=1, rs2=2, warp=1)) is None
+    sb.release(halt)
+    assert sb.draining == 0 and sb.inflight == [0, 0]
+
+
+class Feeder:
+    def __init__(self, req: LatchIF, insts):
+        self.req = req
+        self.insts = deque(insts)
+
+    def tick(self, cycle):
+        if self.insts and self.req.ready_for_push():
+            self.req.push(self.insts.popleft())
+        return cycle + 1 if self.insts else None
+
+
+class Writeback:
+    """Takes issued instructions and releases their destination `latency` cycles later."""
+
+    def __init__(self, resp: LatchIF, scoreboard: Scoreboard, latency: int):
+        self.resp = resp
+        self.scoreboard = scoreboard
+        self.latency = latency
+        self.inflight = deque()
+        self.done = []
+
+    def tick(self, cycle):
+        while self.inflight and self.inflight[0][0] <= cycle:
+            _, i = self.inflight.popleft()
+            self.scoreboard.release(i)
+            self.done.append((cycle, i.iid))
+        if self.resp.valid:
+            self.inflight.append((cycle + self.latency, self.resp.pop()))
+        return self.inflight[0][0] if self.inflight else None
+
+
+def run(insts, num_warps=2, latency=5, stepped=False):
+    req, resp = LatchIF(name="decode_issue"), LatchIF(name="issue_opcoll")
+    sb = Scoreboard(num_warps)
+    kernel = EventKernel()
+    feeder = kernel.add(Feeder(req, insts))
+    issue = kernel.add(IssueStage("Issue", req, resp, sb, num_warps=num_warps))
+    wb = kernel.add(Writeback(resp, sb, latency))
+    kernel.connect(req, feeder, issue)
+    kernel.connect(resp, issue, wb)
+    (kernel.run_stepped if stepped else kernel.run)(until=lambda: len(wb.done) == len(insts), max_cycles=500)
+    return issue, wb
+
+
+def test_dependent_instruction_waits_for_writeback():
+    issue, wb = run([inst(R_Op.ADD, rd=3, rs1=1, rs2=2, iid=0), inst(R_Op.ADD, rd=4, rs1=3, rs2=3, iid=1)])
+    (t0, _), (t1, _) = wb.done
+    assert t1 - t0 >= 5
+    report = issue.report()
+    assert report["stall_cycles"]["RAW"] >= 4 and report["stall_cycles"]["WAW"] == 0
+    assert set(report["warp_stall_cycles"]) == {0}
+
+
+def test_stalled_warp_does_not_block_the_other():
+    insts = [inst(R_Op.ADD, rd=3, rs1=1, rs2=2, warp=0, iid=0),
+             inst(R_Op.ADD, rd=3, rs1=1, rs2=2, warp=0, iid=1),   # WAW on r3
+             inst(R_Op.ADD, rd=3, rs1=1, rs2=2, warp=1, iid=2)]
+    issue, wb = run(insts)
+    assert [iid for _, iid in wb.done] == [0, 2, 1]
+    assert issue.report()["warp_stall_cycles"][0]["WAW"] > 0
+
+
+def test_event_run_matches_stepping():
+    insts = [inst(R_Op.ADD, rd=1 + i % 4, rs1=1 + (i + 1) % 4, rs2=1 + (i + 2) % 4, warp=i % 2, iid=i)
+             for i in range(30)]
+    copy = [inst(i.opcode, i.rd, i.rs1, i.rs2, i.warp, i.iid) for i in insts]
+    event_issue, event_wb = run(insts, latency=3)
+    stepped_issue, stepped_wb = run(copy, latency=3, stepped=True)
+    assert event_wb.done == stepped_wb.done
+    assert event_issue.report() == stepped_issue.report()
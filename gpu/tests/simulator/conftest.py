@@ -0,0 +1,121 @@
+# conftest.py — bench shared by the stage tests: a driver in front of the stage, memory behind it
+
+import sys
+from collections import deque
+from pathlib import Path
+
+import pytest
+
+sim_dir = Path(__file__).resolve().parents[2] / "simulator"
+emu_src = Path(__file__).resolve().parents[2] / "emulator" / "src"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from base_class import LatchIF
+from event_kernel import EventKernel
+from Memory import Mem
+from mem_controller import MemController
+
+
+class Driver:
+    """Pushes one payload per cycle (whenever `req` has room) and collects (cycle, response) from `resp`."""
+
+    def __init__(self, req: LatchIF, resp: LatchIF, payloads):
+        self.req = req
+        self.resp = resp
+        self.payloads = deque(payloads)
+        self.got = []
+
+    def tick(self, cycle):
+        if self.resp.valid:
+            self.got.append((cycle, self.resp.pop()))
+        if self.payloads and self.req.ready_for_push():
+            self.req.push(self.payloads.popleft())
+        return cycle + 1 if self.payloads else None
+
+    def feed(self, kernel: EventKernel, payloads) -> None:
+        self.payloads.extend(payloads)
+        kernel.wake(self)
+
+
+class Bench:
+    """
+    An EventKernel holding the stage under test. Components tick in the order
+    they are added, so add the driver first and the MemController last, as
+    the pipeline does. run() is event-driven, or ticks every component every
+    cycle when the bench is stepped.
+    """
+
+    def __init__(self, tmp_path: Path, stepped: bool = False):
+        self.tmp_path = tmp_path
+        self.stepped = stepped
+        self.kernel = EventKernel()
+
+    def add(self, component):
+        return self.kernel.add(component)
+
+    def connect(self, latch, producer, consumer) -> None:
+        self.kernel.connect(latch, producer, consumer)
+
+    def driver(self, payloads, name: str = "lsu") -> Driver:
+        return self.add(Driver(LatchIF(name=f"{name}_req"), LatchIF(name=f"{name}_resp"), payloads))
+
+    def memory(self, words: int = 1024, base: int = 0x1000) -> Mem:
+        """Backing memory whose word i holds base + i."""
+        image = self.tmp_path / "mem.hex"
+        image.write_text("".join(f"{base + i:08X}\n" for i in range(words)))
+        mem = Mem(start_pc=0, input_file=str(image), fmt="hex")
+        mem.dump_path = None
+        return mem
+
+    def mem_controller(self, mem: Mem = None, ic=None, dc=None, **kw) -> MemController:
+        """
+        A MemController behind the I$ and D$ ports, each given as (client, req latch,
+        resp latch) and connected to its client. A port left out gets idle latches.
+        """
+        ports = [port or (None, LatchIF(name=f"{side}_req"), LatchIF(name=f"{side}_resp"))
+                 for side, port in (("ic", ic), ("dc", dc))]
+        (_, ic_req, ic_resp), (_, dc_req, dc_resp) = ports
+        memc = self.add(MemController("MemController", ic_req, dc_req, ic_resp, dc_resp,
+                                      self.memory() if mem is None else mem, **kw))
+        for client, req, resp in ports:
+            if client is not None:
+                self.connect(req, client, memc)
+                self.connect(resp, memc, client)
+        return memc
+
+    def run(self, until=None, max_cycles: int = 10_000) -> int:
+        runner = self.kernel.run_stepped if self.stepped else self.kernel.run
+        return runner(until=until, max_cycles=max_cycles)
+
+    def run_until(self, driver: Driver, n: int, max_cycles: int = 10_000) -> int:
+        return self.run(until=lambda: len(driver.got) == n, max_cycles=max_cycles)
+
+
+def pytest_collect_file(file_path, parent):
+    """Collected after gpu/emulator/tests: forget the emulator's modules that share a name with ours."""
+    if str(emu_src) not in sys.path:
+        return
+    sys.path.remove(str(emu_src))
+    ours = {p.stem for p in sim_dir.rglob("*.py")}
+    for name in ours & {p.stem for p in emu_src.glob("*.py")}:
+        module = sys.modules.get(name)
+        if module is not None and Path(getattr(module, "__file__", None) or "").parent == emu_src:
+            del sys.modules[name]
+
+
+@pytest.fixture(params=[False, True], ids=["event", "stepped"])
+def stepped(request):
+    return request.param
+
+
+@pytest.fixture
+def bench(tmp_path, stepped):
+    """Bench factory; every test using it runs once event-driven and once stepped."""
+    return lambda: Bench(tmp_path, stepped)
+
+
+@pytest.fixture
+def make_bench(tmp_path):
+    """make_bench(stepped): a bench of the given kind, for tests comparing the two kernels directly."""
+    return lambda stepped: Bench(tmp_path, stepped)
@@ -0,0 +1,89 @@
+# event_kernel_test.py — event-driven kernel vs. stepping every cycle
+
+import sys
+from collections import deque
+from pathlib import Path
+
+sim_dir = Path(__file__).resolve().parents[2] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from base_class import LatchIF, ForwardingIF, Instruction, RAM_LATENCY_CYCLES
+from event_kernel import EventKernel
+from Memory import Mem
+from mem_controller import MemController
+from icache_stage import ICacheStage
+from bitstring import Bits
+
+
+class Fetcher:
+    """Pushes one pc per cycle into the I$, holding off while warp 0 has a fetch parked in an MSHR."""
+
+    def __init__(self, latch: LatchIF, waiting: ForwardingIF, pcs):
+        self.latch = latch
+        self.waiting = waiting
+        self.pcs = deque(pcs)
+
+    def tick(self, cycle):
+        if self.waiting.payload:
+            return None  # the fill clears the waiting set
+        if self.latch.ready_for_push() and self.pcs:
+            self.latch.push(Instruction(pc=Bits(uint=self.pcs.popleft(), length=32), warp=0, warpGroup=0))
+        return cycle + 1 if self.pcs else None
+
+
+class Sink:
+    def __init__(self, latch: LatchIF):
+        self.latch = latch
+        self.got = []
+
+    def tick(self, cycle):
+        if self.latch.valid:
+            self.got.append((self.latch.pop().pc.uint, cycle))
+        return None
+
+
+def build(tmp_path, pcs):
+    prog = tmp_path / "prog.hex"
+    prog.write_text("".join(f"{i:08X}\n" for i in range(64)))
+    mem = Mem(start_pc=0, input_file=str(prog), fmt="hex")
+    mem.dump_path = None
+
+    fetch_if, decode_if = LatchIF(name="fetch_icache"), LatchIF(name="icache_decode")
+    ic_req, dc_req = LatchIF(name="ic_req"), LatchIF(name="dc_req")
+    ic_resp, dc_resp = LatchIF(name="ic_resp"), LatchIF(name="dc_resp")
+    waiting = ForwardingIF(name="ICache_Scheduler")
+
+    kernel = EventKernel()
+    fetcher = kernel.add(Fetcher(fetch_if, waiting, pcs))
+    icache = kernel.add(ICacheStage("ICache", fetch_if, decode_if, ic_req, ic_resp,
+                                    {"cache_size": 1024, "block_size": 64, "associativity": 2},
+                                    {"ICache_Scheduler": waiting}))
+    memc = kernel.add(MemController("MemController", ic_req, dc_req, ic_resp, dc_resp, mem,
+                                    latency=RAM_LATENCY_CYCLES))
+    sink = kernel.add(Sink(decode_if))
+
+    kernel.connect(fetch_if, fetcher, icache)
+    kernel.connect(waiting, fetcher)
+    kernel.connect(ic_req, icache, memc)
+    kernel.connect(ic_resp, memc, icache)
+    kernel.connect(decode_if, icache, sink)
+    return kernel, sink
+
+
+def test_skip_ahead_matches_stepping(tmp_path):
+    pcs = list(range(0, 128, 4)) + [0, 4, 64]  # two cold misses, then hits
+    done = lambda: len(sink.got) == len(pcs)
+
+    kernel, sink = build(tmp_path, pcs)
+    stepped_cycles = kernel.run_stepped(until=done, max_cycles=10_000)
+    stepped_got, stepped_ticks = sink.got, kernel.ticks
+
+    kernel, sink = build(tmp_path, pcs)
+    event_cycles = kernel.run(until=done, max_cycles=10_000)
+
+    assert [pc for pc, _ in sink.got] == pcs
+    assert event_cycles == stepped_cycles
+    assert sink.got == stepped_got
+    assert event_cycles > 2 * RAM_LATENCY_CYCLES
+    assert kernel.ticks * 4 < stepped_ticks  # the miss stalls are skipped, not ticked through
@@ -0,0 +1,68 @@
+# decode_table_test.py — opcode table and integer register fields in DecodeStage
+
+import sys
+from pathlib import Path
+
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "decode"))
+
+from base_class import LatchIF, Instruction, DecodeType
+from custom_enums_multi import R_Op, I_Op, S_Op, B_Op, U_Op, P_Op, H_Op
+from predicate_reg_file import PredicateRegFile
+from decode_class import DecodeStage, OPCODE_TABLE, OP_INFO, decode_opcode
+
+
+def encode(opcode, rd=0, rs1=0, rs2=0, pred=0):
+    return opcode | (rd << 7) | (rs1 << 13) | (rs2 << 19) | (pred << 25)
+
+
+def test_table_covers_every_opcode_once():
+    assert len(OPCODE_TABLE) == 128
+    for op, info in OP_INFO.items():
+        assert OPCODE_TABLE[op.value.uint] is info and info.op is op
+
+
+def test_operand_use_flags_per_format():
+    add = OP_INFO[R_Op.ADD]
+    assert (add.fmt, add.reads_rs1, add.reads_rs2, add.writes_rd) == ("R", True, True, True)
+    sw = OP_INFO[S_Op.SW]
+    assert (sw.fmt, sw.reads_rs2, sw.writes_rd, sw.fu) == ("S", True, False, "LDST")
+    assert OP_INFO[B_Op.BEQ].fu == "BRANCH" and not OP_INFO[B_Op.BEQ].writes_rd
+    assert OP_INFO[U_Op.LLI].reads_rd and OP_INFO[U_Op.LLI].writes_rd
+    assert OP_INFO[P_Op.JPNZ].reads_rs2 and not OP_INFO[P_Op.JPNZ].reads_rs1
+
+
+def test_loads_go_to_the_ldst_unit():
+    assert {OP_INFO[op].fu for op in (I_Op.LW, I_Op.LH, I_Op.LB)} == {"LDST"}
+
+
+def test_decode_opcode_accepts_bits_and_ints():
+    assert decode_opcode(Bits(uint=R_Op.ADD.value.uint, length=7)) is R_Op.ADD
+    assert decode_opcode(H_Op.HALT.value.uint) is H_Op.HALT
+    unused = next(code for code, info in enumerate(OPCODE_TABLE) if info.op is None)
+    assert decode_opcode(unused) is None
+
+
+def decode(raw):
+    behind, ahead = LatchIF(name="icache_decode"), LatchIF(name="decode_issue")
+    stage = DecodeStage("Decode", behind, ahead, PredicateRegFile(num_preds_per_warp=16, num_warps=32))
+    behind.push(Instruction(pc=Bits(uint=0, length=32), iid=0, warp=0, packet=raw))
+    stage.compute()
+    return ahead.pop()
+
+
+def test_register_fields_are_ints():
+    out = decode(encode(R_Op.ADD.value.uint, rd=63, rs1=62, rs2=61))
+    assert (out.rd, out.rs1, out.rs2) == (63, 62, 61)
+    assert all(type(f) is int for f in (out.rd, out.rs1, out.rs2))
+    assert out.opcode is R_Op.ADD and out.intended_FSU == "ADD"
+
+
+def test_halt_and_unknown_opcodes():
+    assert decode(encode(H_Op.HALT.value.uint)).type is DecodeType.halt
+    unused = next(code for code, info in enumerate(OPCODE_TABLE) if info.op is None)
+    out = decode(encode(unused, rd=5))
+    assert out.opcode is None and out.intended_FSU is None and out.rd == 5
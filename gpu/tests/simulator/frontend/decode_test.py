@@ -165,9 +165,9 @@ def test_decode_stage_full():
     ihit_if.push(True)
 
     out = run_stage(decode, fetch_dec, dec_exec)
-    assert out.rd.uint == 63
-    assert out.rs1.uint == 62
-    assert out.rs2.uint == 61
+    assert out.rd == 63
+    assert out.rs1 == 62
+    assert out.rs2 == 61
 
     print(f"[OK] rd={out.rd}, rs1={out.rs1}, rs2={out.rs2} decoded correctly.\n")
 
@@ -277,7 +277,7 @@ def test_decode_stage_full():
     fetch_dec.push(inst); ihit_if.push(True)
     out = run_stage(decode, fetch_dec, dec_exec)
 
-    print(f"  pred[0]={out.pred[0]} ...")
+    print(f"  pred=0x{out.pred:08X}")
 
     print("[OK] Predicate mask matched PRF.\n")
 
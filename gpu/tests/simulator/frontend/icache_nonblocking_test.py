@@ -0,0 +1,83 @@
+# icache_nonblocking_test.py — hit-under-miss, MSHR merging and next-N-line prefetch
+
+import sys
+from pathlib import Path
+
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from base_class import LatchIF, ForwardingIF, Instruction
+from icache_stage import ICacheStage
+
+LAT = 50
+
+
+def fetches(*warp_pcs):
+    return [Instruction(pc=Bits(uint=pc, length=32), warp=warp, warpGroup=0) for warp, pc in warp_pcs]
+
+
+def build(bench, warp_pcs, **cache):
+    fetch = bench.driver(fetches(*warp_pcs), name="fetch")
+    ic_req, ic_resp = LatchIF(name="ic_req"), LatchIF(name="ic_resp")
+    waiting = ForwardingIF(name="ICache_Scheduler")
+    icache = bench.add(ICacheStage("ICache", fetch.req, fetch.resp, ic_req, ic_resp,
+                                   {"cache_size": 4096, "block_size": 64, "associativity": 4, **cache},
+                                   {"ICache_Scheduler": waiting}))
+    bench.connect(fetch.req, fetch, icache)
+    bench.connect(fetch.resp, icache, fetch)
+    bench.mem_controller(bench.memory(base=0), ic=(icache, ic_req, ic_resp),  # word at pc holds pc // 4
+                         latency=LAT, max_inflight=4)
+    return fetch, icache, waiting
+
+
+def got(fetch):
+    """(warp, pc, packet, cycle) of every instruction the I$ handed on."""
+    return [(inst.warp, inst.pc.uint, inst.packet.uint, cycle) for cycle, inst in fetch.got]
+
+
+def test_hit_under_miss(bench):
+    b = bench()
+    fetch, icache, waiting = build(b, [(0, 0x000), (1, 0x400)])
+    icache._fill_from_response(0x400, Bits(bytes=bytes(range(64))))
+    b.run_until(fetch, 2, max_cycles=5_000)
+
+    out = got(fetch)
+    assert [(w, pc) for w, pc, _, _ in out] == [(1, 0x400), (0, 0x000)]
+    assert out[0][3] < LAT <= out[1][3]
+    assert icache.hits_under_miss == 1
+    assert out[1][2] == 0  # word 0 of the program
+    assert waiting.payload == frozenset()
+
+
+def test_duplicate_misses_merge(bench):
+    b = bench()
+    fetch, icache, _ = build(b, [(0, 0x000), (1, 0x004)])
+    b.run_until(fetch, 2, max_cycles=5_000)
+
+    assert icache.misses == 2 and icache.mshr_merges == 1
+    assert [pc for _, pc, _, _ in got(fetch)] == [0x000, 0x004]
+    assert [packet for _, _, packet, _ in got(fetch)] == [0, 1]
+
+
+def test_full_mshrs_hold_the_fetch(bench):
+    b = bench()
+    fetch, icache, _ = build(b, [(0, 0x000), (1, 0x400), (2, 0x800)], mshr_entries=1)
+    b.run_until(fetch, 3, max_cycles=5_000)
+
+    assert icache.mshr_stalls == 2  # one per held fetch, not per cycle spent waiting
+    assert [w for w, _, _, _ in got(fetch)] == [0, 1, 2]
+
+
+def test_next_line_prefetch(bench):
+    b = bench()
+    fetch, icache, _ = build(b, [(0, 0x000)], prefetch_lines=2)
+    b.run_until(fetch, 1, max_cycles=5_000)
+    b.run(max_cycles=b.kernel.cycle + 3 * LAT)  # let the prefetches land
+    assert icache.prefetches == 2
+
+    fetch.feed(b.kernel, fetches((0, 0x040), (0, 0x080)))
+    b.run_until(fetch, 3, max_cycles=5_000)
+    assert icache.misses == 1 and icache.useful_prefetches == 2
@@ -0,0 +1,77 @@
+# icache_replacement_test.py — replacement policies and the I$ tag arrays
+
+import sys
+from pathlib import Path
+
+import pytest
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from base_class import LatchIF
+from replacement import make_policy
+from icache_stage import ICacheStage
+
+
+def test_lru_evicts_least_recently_used():
+    p = make_policy("lru", 1, 4)
+    for way in range(4):
+        p.insert(0, way)
+    p.touch(0, 0)
+    assert p.victim(0) == 1
+
+
+def test_tree_plru_points_away_from_recent_ways():
+    p = make_policy("plru", 1, 4)
+    for way in (0, 1, 2, 3):
+        p.insert(0, way)
+    assert p.victim(0) == 0
+    p.touch(0, 0)
+    assert p.victim(0) == 2
+    with pytest.raises(ValueError):
+        make_policy("plru", 1, 3)
+
+
+def test_fifo_ignores_hits():
+    p = make_policy("fifo", 1, 2)
+    p.insert(0, 0)
+    p.insert(0, 1)
+    p.touch(0, 0)
+    assert p.victim(0) == 0
+
+
+def test_srrip_prefers_lines_without_hits():
+    p = make_policy("srrip", 1, 2)
+    p.insert(0, 0)
+    p.insert(0, 1)
+    p.touch(0, 0)
+    assert p.victim(0) == 1
+
+
+def test_random_is_seeded():
+    a, b = make_policy("random", 1, 8, seed=3), make_policy("random", 1, 8, seed=3)
+    assert [a.victim(0) for _ in range(10)] == [b.victim(0) for _ in range(10)]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match="replacement"):
+        make_policy("mru", 1, 2)
+
+
+@pytest.mark.parametrize("policy", ["lru", "plru", "fifo", "random", "srrip"])
+def test_icache_fill_and_lookup(policy):
+    ic = ICacheStage("ICache", LatchIF(), LatchIF(), LatchIF(), LatchIF(),
+                     {"cache_size": 4 * 64, "block_size": 64, "associativity": 4, "replacement": policy})
+    assert ic.num_sets == 1
+    blocks = [bytes([i]) * 64 for i in range(5)]
+    for i in range(4):
+        ic._fill_from_response(i * 64, Bits(bytes=blocks[i]))
+    assert all(ic._lookup(i * 64) == blocks[i] for i in range(4))
+
+    ic._fill_from_response(4 * 64, Bits(bytes=blocks[4]))  # set is full, one way gets replaced
+    resident = [i for i in range(5) if ic._lookup(i * 64) is not None]
+    assert len(resident) == 4 and 4 in resident
+    assert len(ic.way_of[0]) == 4
+    assert ic._word_at(ic._lookup(4 * 64), 4 * 64 + 8) == Bits(uint=0x04040404, length=32)
@@ -0,0 +1,52 @@
+# predicate_reg_file_test.py — bit-packed predicates and the lane mask decode hands on
+
+import sys
+from pathlib import Path
+
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "decode"))
+
+from base_class import LatchIF, Instruction
+from predicate_reg_file import PredicateRegFile
+from decode_class import DecodeStage
+
+FULL = 0xFFFF_FFFF
+
+
+def test_negated_read_is_the_complement():
+    prf = PredicateRegFile(num_preds_per_warp=16, num_warps=4)
+    prf.write_predicate(1, 2, 7, 0x0000_03FF)
+    assert prf.read_predicate(1, 2, 7, 0) == 0x0000_03FF
+    assert prf.read_predicate(1, 2, 7, 1) == FULL ^ 0x3FF
+    assert prf.read_predicate(0, 2, 7, 0) is None
+    assert prf.read_predicate(1, 3, 7, 0) == FULL  # other warps untouched, every lane starts enabled
+
+
+def test_bool_lists_and_wide_ints_are_packed():
+    prf = PredicateRegFile(num_preds_per_warp=16, num_warps=1)
+    prf.write_predicate(1, 0, 1, [True] * 10 + [False] * 22)
+    assert prf.read_predicate(1, 0, 1, 0) == 0x3FF
+    prf.write_predicate(1, 0, 2, 1 << 40 | 0b101)
+    assert prf.read_predicate(1, 0, 2, 0) == 0b101
+
+
+def test_popcount_any_all():
+    prf = PredicateRegFile(num_preds_per_warp=16, num_warps=1)
+    prf.write_predicate(1, 0, 3, 0xF0F0_0000)
+    assert prf.popcount(0, 3) == 8 and prf.popcount(0, 3, neg=1) == 24
+    assert prf.any(0, 3) and not prf.all(0, 3)
+    prf.write_predicate(1, 0, 3, FULL)
+    assert prf.all(0, 3) and not prf.any(0, 3, neg=1)
+
+
+def test_decode_carries_one_int_mask():
+    prf = PredicateRegFile(num_preds_per_warp=16, num_warps=4)
+    prf.write_predicate(1, 3, 5, 0x8000_0001)
+    behind, ahead = LatchIF(name="icache_decode"), LatchIF(name="decode_issue")
+    decode = DecodeStage("Decode", behind, ahead, prf)
+    behind.push(Instruction(pc=Bits(uint=0, length=32), iid=0, warp=3, packet=5 << 25))
+    decode.compute()
+    assert ahead.pop().pred == 0x8000_0001
@@ -0,0 +1,100 @@
+# simt_stack_test.py — reconvergence stack, per-PC SIMD efficiency and the scheduler's splits
+
+import sys
+from pathlib import Path
+
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "scheduler"))
+sys.path.append(str(sim_dir / "src" / "decode"))
+
+from base_class import ForwardingIF, LatchIF, Instruction
+from common.simt_stack import SIMTStack, SimdEfficiency
+from scheduler import WarpScheduler
+from decode_class import DecodeStage
+from predicate_reg_file import PredicateRegFile
+
+FULL = 0xFFFF_FFFF
+LOW = 0x0000_FFFF
+
+
+def test_if_else_runs_the_lower_pc_first_and_reconverges():
+    stack = SIMTStack(pc=0, mask=FULL)
+    stack.advance({4: LOW, 16: FULL ^ LOW})          # upper half jumps to the else path at 16
+    assert (stack.pc, stack.mask) == (4, LOW)
+    stack.advance({8: LOW})
+    stack.advance({24: LOW})                          # then path jumps over the else path
+    assert (stack.pc, stack.mask) == (16, FULL ^ LOW)
+    stack.advance({20: FULL ^ LOW})
+    stack.advance({24: FULL ^ LOW})                   # falls into the join
+    assert (stack.pc, stack.mask) == (24, FULL)
+    assert len(stack.splits) == 1 and stack.max_depth == 2 and stack.divergences == 1
+
+
+def test_loop_exits_wait_for_the_last_iteration():
+    stack = SIMTStack(pc=0, mask=0b1111)
+    trips = {0: 1, 1: 2, 2: 2, 3: 3}                 # lane -> iterations of a loop at pc 0..4
+    for i in range(1, 4):
+        leaving = sum(1 << lane for lane, n in trips.items() if n == i)
+        stack.advance({0: stack.mask & ~leaving, 8: leaving})
+        assert stack.pc == (0 if i < 3 else 8)
+    assert stack.mask == 0b1111
+
+
+def test_exited_lanes_leave_the_stack():
+    stack = SIMTStack(pc=0, mask=FULL)
+    stack.advance({4: LOW})                           # upper half halted
+    assert stack.mask == LOW
+    stack.advance({})
+    assert stack.empty
+
+
+def test_redirect_moves_lanes_wherever_they_are():
+    stack = SIMTStack(pc=12, mask=FULL)               # fetch already went past the branch at 8
+    stack.redirect({12: LOW, 40: FULL ^ LOW})
+    assert stack.splits == [[40, FULL ^ LOW], [12, LOW]]
+    stack.redirect({40: LOW})
+    assert stack.splits == [[40, FULL]]
+
+
+def test_simd_efficiency_per_pc():
+    eff = SimdEfficiency()
+    eff.record(0, FULL, 32)
+    eff.record(4, LOW, 32)
+    eff.record(4, 0b1, 32)
+    eff.record(8, [True] * 8 + [False] * 24, 32)
+    report = eff.report()
+    assert list(report) == [0, 4, 8]
+    assert report[0]["efficiency"] == 1.0
+    assert report[4]["issues"] == 2 and report[4]["active_lanes"] == 17
+    assert report[8]["efficiency"] == 0.25
+    assert eff.overall() == (32 + 17 + 8) / 128
+
+
+def test_scheduler_fetches_the_top_split():
+    out, branch = LatchIF(name="sched_icache"), ForwardingIF(name="Branch_Scheduler")
+    sched = WarpScheduler("scheduler", out, num_warps=1, forward_ifs_read={"Branch_Scheduler": branch})
+    sched.tick(0)
+    first = out.pop()
+    assert (first.pc.uint, first.pred) == (0, FULL)
+    branch.push({"warp": 0, "next": {4: LOW, 32: FULL ^ LOW}})
+    got = []
+    for cycle in range(1, 9):
+        sched.tick(cycle)
+        inst = out.pop()
+        got.append((inst.pc.uint, inst.pred))
+    assert got[:2] == [(4, LOW), (8, LOW)]
+    assert got[6:] == [(28, LOW), (32, FULL)]         # reconverged at 32
+    assert sched.report()["divergences"] == [1] and sched.report()["max_stack_depth"] == [2]
+
+
+def test_decode_keeps_only_the_split_lanes():
+    prf = PredicateRegFile(num_preds_per_warp=16, num_warps=1)
+    prf.write_predicate(1, 0, 2, 0x0000_00FF)
+    behind, ahead = LatchIF(name="icache_decode"), LatchIF(name="decode_issue")
+    decode = DecodeStage("Decode", behind, ahead, prf)
+    behind.push(Instruction(pc=Bits(uint=0, length=32), iid=0, warp=0, packet=2 << 25, pred=0x0000_0F0F))
+    decode.compute()
+    assert ahead.pop().pred == 0x0000_000F
@@ -0,0 +1,110 @@
+# warp_scheduler_test.py — warp states, bitmask selection and the scheduling policies
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "scheduler"))
+
+from base_class import ForwardingIF, LatchIF, DecodeType, WarpState
+from policies import make_sched_policy, first_from
+from scheduler import WarpScheduler
+from gpu_model import GPU_model, load_config
+
+HALT = 0xFFFFFFFF
+ADDI = 0x10             # addi r0, r0, 0
+BARRIER = 1 << 29
+
+
+def picks(policy, masks):
+    return [policy.pick(m) for m in masks]
+
+
+def test_first_from_wraps_around():
+    assert first_from(0b1010, 2) == 3
+    assert first_from(0b0011, 2) == 0
+
+
+def test_lrr_rotates_over_ready_warps():
+    assert picks(make_sched_policy("lrr", 4), [0b1111] * 5) == [0, 1, 2, 3, 0]
+    assert picks(make_sched_policy("lrr", 4), [0b1010, 0b1010, 0b0110]) == [1, 3, 1]
+
+
+def test_gto_sticks_with_a_warp_until_it_stalls():
+    gto = make_sched_policy("gto", 4)
+    assert picks(gto, [0b1110, 0b1111, 0b1101, 0b1101, 0b1000]) == [1, 1, 0, 0, 3]
+
+
+def test_two_level_refills_the_active_pool():
+    two = make_sched_policy("two_level", 8, active_warps=2)
+    assert picks(two, [0xFF] * 3) == [0, 1, 0]
+    assert two.pick(0xFE) == 1        # warp 0 stalls, warp 2 joins the pool
+    assert two.active == 0b110 and two.promotions == 3
+    with pytest.raises(ValueError, match="scheduling policy"):
+        make_sched_policy("random", 4)
+
+
+def build(num_warps=4, **kwargs):
+    out = LatchIF(name="sched_icache")
+    miss, dec = ForwardingIF(name="ICache_Scheduler"), ForwardingIF(name="Decode_Scheduler")
+    sched = WarpScheduler("scheduler", out, num_warps=num_warps,
+                          forward_ifs_read={"ICache_Scheduler": miss, "Decode_Scheduler": dec}, **kwargs)
+    return sched, out, miss, dec
+
+
+def fetch(sched, out, cycle):
+    sched.tick(cycle)
+    return out.pop().warp if out.valid else None
+
+
+def test_stalled_and_halted_warps_are_skipped():
+    sched, out, miss, dec = build()
+    miss.push(frozenset({1}))
+    dec.push({"type": DecodeType.halt, "warp": 2})
+    assert [fetch(sched, out, c) for c in range(3)] == [0, 3, 0]
+    assert sched.state == [WarpState.READY, WarpState.STALL, WarpState.HALT, WarpState.READY]
+    assert [g.state for g in sched.groups] == [WarpState.READY, WarpState.READY]
+
+    miss.push(frozenset())
+    assert fetch(sched, out, 3) == 1
+    assert sched.ready == 0b1011
+
+
+def test_barrier_waits_for_every_live_warp():
+    sched, out, miss, dec = build(num_warps=2)
+    dec.push({"type": DecodeType.halt, "warp": 1})
+    sched.tick(0)
+    dec.push({"type": DecodeType.Barrier, "warp": 0})
+    sched.tick(1)  # warp 1 halted, so warp 0 is the last live warp and goes straight through
+    assert sched.state[0] is WarpState.READY and sched.barrier_releases == 1
+
+    sched, out, miss, dec = build(num_warps=2)
+    dec.push({"type": DecodeType.Barrier, "warp": 0})
+    sched.tick(0)
+    out.pop()
+    assert sched.groups[0].state is WarpState.READY  # warp 1 still runs
+    assert fetch(sched, out, 1) == 1
+    dec.push({"type": DecodeType.Barrier, "warp": 1})
+    sched.tick(2)
+    assert sched.state == [WarpState.READY, WarpState.READY] and sched.barrier_releases == 1
+
+
+@pytest.mark.parametrize("policy", ["lrr", "gto", "two_level"])
+def test_policies_run_the_sm_to_halt(tmp_path, policy):
+    prog = tmp_path / "prog.hex"
+    prog.write_text("".join(f"{w:08X}\n" for w in [ADDI] * 8 + [ADDI | BARRIER] + [ADDI] * 8 + [HALT]))
+    config = load_config()
+    config["num_warps"] = 4
+    config["stages"] = [dict(s, policy=policy, active_warps=2) if s["type"] == "WarpScheduler" else s
+                        for s in config["stages"]]
+
+    model = GPU_model(str(prog), config, fmt="hex")
+    event = model.run()
+    stepped = GPU_model(str(prog), config, fmt="hex").run(stepped=True)
+    assert event["halted"] and event == stepped
+    report = model.stages["scheduler"].report()
+    assert report["policy"] == policy and report["barrier_releases"] == 1
+    assert report["group_states"] == ["halt", "halt"]
@@ -0,0 +1,48 @@
+# gpu_model_test.py — SM pipeline built from the declarative config
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sim_dir = Path(__file__).resolve().parents[2] / "simulator"
+sys.path.append(str(sim_dir))
+
+from gpu_model import GPU_model, load_config
+
+HALT = 0xFFFFFFFF
+ADDI = 0x10  # addi r0, r0, 0
+
+
+def write_program(tmp_path, words):
+    prog = tmp_path / "prog.hex"
+    prog.write_text("".join(f"{w:08X}\n" for w in words))
+    return str(prog)
+
+
+def test_runs_to_halt_and_matches_stepping(tmp_path):
+    prog = write_program(tmp_path, [ADDI] * 20 + [HALT])
+    config = load_config()
+    config["num_warps"] = 2
+
+    event = GPU_model(prog, config, fmt="hex").run()
+    stepped = GPU_model(prog, config, fmt="hex").run(stepped=True)
+
+    assert event["halted"]
+    assert event["instructions"] == 2 * 21
+    assert event == stepped
+    assert 0 < event["ipc"] < 1
+
+
+def test_tick_order_is_reverse_topological(tmp_path):
+    model = GPU_model(write_program(tmp_path, [HALT]), fmt="hex")
+    order = model.order
+    assert order[0] == "retire" and order[-1] == "scheduler"
+    assert order.index("decode") < order.index("icache")
+
+
+def test_latch_loop_without_feedback_is_rejected(tmp_path):
+    config = load_config()
+    config["latches"] = [dict(e, feedback=False) for e in config["latches"]]
+    with pytest.raises(ValueError, match="feedback"):
+        GPU_model(write_program(tmp_path, [HALT]), config, fmt="hex")
@@ -0,0 +1,92 @@
+# mem_controller_arbiter_test.py — request ports, arbitration policies and per-port wait counters
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+from arbiter import make_arbiter
+
+
+def test_round_robin_rotates_past_the_winner():
+    arb = make_arbiter("rr", 3)
+    everyone = [(0, 0), (1, 0), (2, 0)]
+    assert [arb.grant(everyone) for _ in range(4)] == [0, 1, 2, 0]
+    assert arb.grant([(0, 0), (2, 0)]) == 2
+
+
+def test_fixed_priority():
+    assert make_arbiter("priority", 3).grant([(1, 0), (2, 0)]) == 1
+    assert make_arbiter("priority", 3, priorities=[0, 1, 5]).grant([(0, 0), (1, 0), (2, 0)]) == 2
+    with pytest.raises(ValueError):
+        make_arbiter("priority", 3, priorities=[1, 2])
+
+
+def test_oldest_first():
+    assert make_arbiter("oldest", 3).grant([(0, 7), (1, 3), (2, 3)]) == 1
+
+
+def test_weighted_fair_share():
+    arb = make_arbiter("wfq", 2, weights=[3, 1])
+    grants = [arb.grant([(0, 0), (1, 0)]) for _ in range(40)]
+    assert grants.count(0) == 30
+
+    for _ in range(20):
+        arb.grant([(1, 0)])  # port 0 idle: it must not bank those turns
+    grants = [arb.grant([(0, 0), (1, 0)]) for _ in range(16)]
+    assert grants.count(1) >= 3
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match="arbitration"):
+        make_arbiter("lottery", 2)
+
+
+def build(bench, n, **kw):
+    """One driver per port (I$, D$ and an extra tex port), each keeping its request latch full with n reads."""
+    reads = [{"addr": 0x100 * (n - i), "size": 4, "rw_mode": "read", "pc": 0} for i in range(n)]
+    ic, dc, tex = (bench.driver(list(reads), name=name) for name in ("ic", "dc", "tex"))
+    memc = bench.mem_controller(bench.memory(base=0), ic=(ic, ic.req, ic.resp), dc=(dc, dc.req, dc.resp),
+                                ports={"tex": (tex.req, tex.resp)}, **kw)
+    bench.connect(tex.req, tex, memc)
+    bench.connect(tex.resp, memc, tex)
+    return [ic, dc, tex], memc
+
+
+def run(bench, clients, n):
+    return bench.run(until=lambda: all(len(c.got) == n for c in clients))
+
+
+def test_extra_port_is_served(bench):
+    b = bench()
+    clients, memc = build(b, 4, latency=3, max_inflight=1)
+    run(b, clients, 4)
+
+    ports = memc.report()["ports"]
+    assert list(ports) == ["icache", "dcache", "tex"]
+    assert all(p["grants"] == 4 for p in ports.values())
+    assert all(p["avg_wait"] > 0 and p["lost"] > 0 for p in ports.values())
+
+
+def test_priority_starves_the_low_port(bench):
+    b = bench()
+    clients, memc = build(b, 6, latency=3, max_inflight=1, policy="priority")
+    b.run_until(clients[0], 6)
+
+    ports = memc.report()["ports"]
+    assert not clients[2].got
+    assert ports["tex"]["grants"] == 0 and ports["tex"]["lost"] > 0
+
+
+@pytest.mark.parametrize("policy", ["rr", "oldest", "wfq"])
+def test_event_run_matches_stepping(make_bench, policy):
+    got = {}
+    for stepped in (True, False):
+        b = make_bench(stepped)
+        clients, memc = build(b, 5, latency=4, max_inflight=2, policy=policy)
+        got[stepped] = run(b, clients, 5), memc.report()["ports"]
+    assert got[False] == got[True]
@@ -0,0 +1,73 @@
+# mem_controller_dram_test.py — DRAM row buffers, channel bandwidth and queue depth in the MemController
+
+import sys
+from pathlib import Path
+
+sim_dir = Path(__file__).resolve().parents[3] / "simulator"
+sys.path.append(str(sim_dir))
+sys.path.append(str(sim_dir / "src" / "mem"))
+
+DRAM = {"channels": 1, "banks_per_channel": 2, "interleave": 256, "row_size": 1024,
+        "row_hit_latency": 10, "row_miss_latency": 40, "bytes_per_cycle": 16}
+
+
+def build(bench, addrs, size=64, **kw):
+    """A driver pushing dcache-style reads straight into the MemController's D$ port."""
+    user = bench.driver([{"addr": a, "size": size, "rw_mode": "read", "pc": 0} for a in addrs], name="dc")
+    memc = bench.mem_controller(bench.memory(words=4096, base=0), dc=(user, user.req, user.resp), **kw)
+    return user, memc
+
+
+def arrivals(user):
+    return [(r["addr"], cycle) for cycle, r in user.got]
+
+
+def test_row_hits_are_faster_than_misses(bench):
+    b = bench()
+    user, memc = build(b, [0x000, 0x040, 0x2000], max_inflight=1, dram_config=DRAM)
+    b.run_until(user, 3)
+
+    assert memc.stats["row_misses"] == 2 and memc.stats["row_hits"] == 1
+    (_, t0), (_, t1), (_, t2) = arrivals(user)
+    assert t2 - t1 > t1 - t0  # the third access closes the open row of bank 0
+    assert memc.report()["row_hit_rate"] == 1 / 3
+
+
+def test_channel_bandwidth_spaces_completions(bench):
+    # same row, all queued at once: one 64B burst (4 cycles at 16B/cycle) after another
+    addrs = [i * 64 for i in range(4)]
+    b = bench()
+    user, memc = build(b, addrs, max_inflight=4, dram_config=DRAM)
+    b.run_until(user, 4)
+
+    cycles = [c for _, c in arrivals(user)]
+    assert [b - a for a, b in zip(cycles, cycles[1:])] == [4, 4, 4]
+    assert memc.report()["bytes"] == 4 * 64
+
+
+def test_queue_depth_backpressures(bench):
+    b = bench()
+    user, memc = build(b, [0x000, 0x100, 0x200], max_inflight=2, latency=30)
+    b.run(max_cycles=5)
+
+    assert len(memc.inflight) == 2
+    assert memc.dc_req_latch.valid  # the third request waits in the latch
+    b.run_until(user, 3)
+    assert [a for a, _ in arrivals(user)] == [0x000, 0x100, 0x200]
+
+
+def test_fixed_latency_without_dram_config(bench):
+    b = bench()
+    user, memc = build(b, [0x000], latency=25)
+    b.run_until(user, 1)
+    assert memc.report()["avg_latency"] == 25
+
+
+def test_event_run_matches_stepping(make_bench):
+    addrs = [0x000, 0x100, 0x040, 0x1000, 0x140, 0x080, 0x2000, 0x000]
+    got = {}
+    for stepped in (True, False):
+        b = make_bench(stepped)
+        user, _ = build(b, addrs, max_inflight=4, dram_config=DRAM)
+        got[stepped] = b.run_until(user, len(addrs)), arrivals(user)
+    assert got[False] == got[True]
@@ -0,0 +1,125 @@
+# timeline_test.py — streamed per-instruction timeline log and its Chrome/Konata converters
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from bitstring import Bits
+
+sim_dir = Path(__file__).resolve().parents[2] / "simulator"
+sys.path.append(str(sim_dir))
+
+from base_class import Instruction
+from custom_enums_multi import R_Op
+from gpu_model import GPU_model, load_config
+from timeline import TimelineWriter, read_timeline, stage_spans, to_chrome, to_konata, STAGE, UNIT
+
+HALT = 0xFFFFFFFF
+ADDI = 0x10  # addi r0, r0, 0
+
+
+def inst(iid, fetch, warp=0, fu_latency=4):
+    """An instruction as the pipeline leaves it: fetched at `fetch`, then decode, fu, retire."""
+    i = Instruction(pc=Bits(uint=4 * iid, length=32), iid=iid, warp=warp, opcode=R_Op.ADD)
+    i.mark_stage_enter("scheduler", fetch)
+    i.mark_stage_enter("decode", fetch + 3)
+    i.mark_stage_exit("decode", fetch + 4)
+    i.mark_stage_enter("fu", fetch + 5)
+    i.mark_fu_enter("ADD0", fetch + 5)
+    i.mark_fu_exit("ADD0", fetch + 5 + fu_latency)
+    i.mark_writeback(fetch + 5 + fu_latency)
+    i.mark_stage_exit("fu", fetch + 6 + fu_latency)
+    i.mark_stage_exit("retire", fetch + 7 + fu_latency)
+    return i
+
+
+def write(path, insts, squashed=()):
+    writer = TimelineWriter(str(path))
+    for i in insts:
+        writer.record(i, squashed=i.iid in squashed)
+    writer.close()
+    return str(path)
+
+
+def test_missing_span_ends_come_from_the_neighbours():
+    assert stage_spans(inst(0, fetch=10)) == [("scheduler", 10, 13), ("decode", 13, 14),
+                                              ("fu", 15, 20), ("retire", 20, 21)]
+
+
+def test_log_round_trips(tmp_path):
+    log = write(tmp_path / "run.tl", [inst(0, 0), inst(1, 1, warp=3)], squashed={1})
+    first, second = read_timeline(log)
+    assert (first.iid, first.pc, first.op, first.wb_cycle, first.squashed) == (0, 0, "ADD", 9, False)
+    assert first.spans[-1] == (UNIT, "ADD0", 5, 9)
+    assert [s.name for s in first.spans if s.kind == STAGE] == ["scheduler", "decode", "fu", "retire"]
+    assert (second.warp, second.squashed, second.first_cycle, second.last_cycle) == (3, True, 1, 12)
+
+
+def test_rejects_other_files(tmp_path):
+    bad = tmp_path / "bad.tl"
+    bad.write_bytes(b"TWTR\x01\x00")
+    with pytest.raises(ValueError, match="timeline"):
+        list(read_timeline(str(bad)))
+
+
+def test_chrome_nests_units_in_their_stage(tmp_path):
+    log = write(tmp_path / "run.tl", [inst(0, 0), inst(1, 1)])
+    assert to_chrome(log, str(tmp_path / "run.json")) == 2
+    events = json.loads((tmp_path / "run.json").read_text())["traceEvents"]
+    spans = {(e["tid"], e["name"]): e for e in events if e["ph"] == "X"}
+    fu, add = spans[(0, "fu")], spans[(0, "ADD0")]
+    assert fu["ts"] <= add["ts"] and add["ts"] + add["dur"] <= fu["ts"] + fu["dur"]
+    assert {e["args"]["name"] for e in events if e["name"] == "process_name"} == {"warp 0"}
+
+
+def konata_commands(path):
+    cycle, out = None, []
+    for line in Path(path).read_text().splitlines()[1:]:
+        cmd, *args = line.split("\t")
+        if cmd == "C=":
+            cycle = int(args[0])
+        elif cmd == "C":
+            assert int(args[0]) > 0
+            cycle += int(args[0])
+        else:
+            out.append((cycle, cmd, args))
+    return out
+
+
+def test_konata_is_in_cycle_order_across_out_of_order_retires(tmp_path):
+    # the long-latency instruction 0 retires after 1 and 2, which were fetched later
+    log = write(tmp_path / "run.tl", [inst(1, 1), inst(2, 2), inst(0, 0, fu_latency=30)])
+    assert to_konata(log, str(tmp_path / "run.log")) == 3
+    commands = konata_commands(tmp_path / "run.log")
+    introduced = [args[1] for _, cmd, args in commands if cmd == "I"]
+    assert introduced == ["0", "1", "2"]          # Konata ids in fetch order
+    retired = [(c, args[0]) for c, cmd, args in commands if cmd == "R"]
+    assert [kid for _, kid in retired] == ["1", "2", "0"] and retired[-1][0] == 37
+    seen = set()
+    for _, cmd, args in commands:
+        if cmd == "I":
+            seen.add(args[0])
+        else:
+            assert args[0] in seen                 # nothing before its I command
+
+
+def test_konata_window_bounds_the_reorder(tmp_path):
+    log = write(tmp_path / "run.tl", [inst(1, 100), inst(0, 0, fu_latency=200)])
+    with pytest.raises(ValueError, match="window"):
+        to_konata(log, str(tmp_path / "run.log"), window=16)
+    assert to_konata(log, str(tmp_path / "run.log"), window=512) == 2
+
+
+def test_model_streams_every_instruction(tmp_path):
+    prog = tmp_path / "prog.hex"
+    prog.write_text("".join(f"{w:08X}\n" for w in [ADDI] * 8 + [HALT]))
+    config = load_config()
+    config["num_warps"] = 2
+    config["timeline"] = str(tmp_path / "run.tl")
+    model = GPU_model(str(prog), config, fmt="hex")
+    stats = model.run()
+    records = list(read_timeline(config["timeline"]))
+    assert len(records) == stats["instructions"] + stats["squashed"] == model.timeline.records
+    assert {r.warp for r in records} == {0, 1}
+    assert all(r.first_cycle <= r.last_cycle for r in records)